@@ -25,6 +25,10 @@ class GeodataCLI:
         # Create the parsor for the "createdb" command
         createdb_parser = subparsers.add_parser('createdb', aliases=['c'])
         createdb_parser.add_argument('path', help='path to data files')
+        createdb_parser.add_argument('-j', '--jobs', type=int, default=1, help='number of processes for parsing files (each holds a whole file in memory)')
+        createdb_parser.add_argument('--cache', dest='cache_dir', default=None, help='directory for a build cache, so that rebuilds only reprocess changed inputs')
+        createdb_parser.add_argument('--sqlite', action='store_true', help='also write an on-disk SQLite database (bin/default.sqlite)')
+        createdb_parser.add_argument('--bulk', action='store_true', help='tune SQLite for bulk loading and create indexes after loading')
         createdb_parser.set_defaults(func=self.create_data_products)
 
         # Create the parser for the "view" command
@@ -99,6 +103,27 @@ class GeodataCLI:
         cg_parsor.add_argument('-n', type=int, default=15, help='number of rows to display')
         cg_parsor.set_defaults(func=self.closest_geographies)
 
+        # Within a radius #####################################################
+        wr_parsor = view_subparsers.add_parser('wr',
+            description='View geographies within a radius of the one specified by display_label')
+        wr_parsor.add_argument('display_label', help='the exact place name')
+        wr_parsor.add_argument('radius', type=float, help='the radius in miles (or kilometers with -k)')
+        wr_parsor.add_argument('-k', '--kilometers', action='store_true', help='Use kilometers.')
+        wr_parsor.add_argument('-f', '--geofilter', help='filter by criteria')
+        wr_parsor.add_argument('-c', '--context', help='group of geographies to display')
+        wr_parsor.add_argument('-n', type=int, default=0, help='number of rows to display (0 for all)')
+        wr_parsor.set_defaults(func=self.within_radius)
+
+        # Within a bounding box ###############################################
+        wb_parsor = view_subparsers.add_parser('wb',
+            description='View geographies within a bounding box')
+        wb_parsor.add_argument('bbox', type=float, nargs=4,
+            metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'), help='bounds in degrees')
+        wb_parsor.add_argument('-f', '--geofilter', help='filter by criteria')
+        wb_parsor.add_argument('-c', '--context', help='group of geographies to display')
+        wb_parsor.add_argument('-n', type=int, default=0, help='number of rows to display (0 for all)')
+        wb_parsor.set_defaults(func=self.within_bbox)
+
         # Distance ############################################################
         d_parsor = view_subparsers.add_parser('d',
             description='Get the distance between two places')
@@ -124,12 +149,24 @@ class GeodataCLI:
         csv_dp_parsor.add_argument('display_label', help='the exact place name')
         csv_dp_parsor.set_defaults(func=self.get_csv_dp)
 
+        # Similar GeoVectors ##################################################
+        csv_gvs_parsor = tocsv_subparsers.add_parser('gvs',
+            description='Output the most demographically similar geographies for every geography')
+        csv_gvs_parsor.add_argument('-c', '--context', help='geographies to compare with each other')
+        csv_gvs_parsor.add_argument('-k', type=int, default=25, help='number of similar geographies per geography')
+        csv_gvs_parsor.add_argument('-a', '--appearance', action='store_true', help='use appearance mode')
+        csv_gvs_parsor.add_argument('-j', '--jobs', type=int, default=1, help='number of processes to use')
+        csv_gvs_parsor.add_argument('--chunk_size', type=int, default=256, help='geographies compared per block')
+        csv_gvs_parsor.add_argument('-o', '--output', default='', help='output file (.csv or .parquet); stdout by default')
+        csv_gvs_parsor.set_defaults(func=self.all_similar_geovectors)
+
         # Parse arguments
         args = parser.parse_args()
         args.func(args)
 
     def create_data_products(self, args):
-        self.engine.create_data_products(args.path)
+        self.engine.create_data_products(args.path, jobs=args.jobs,
+            cache_dir=args.cache_dir, sqlite=args.sqlite, bulk=args.bulk)
 
     def display_label_search(self, args):
         search_results = self.engine.display_label_search(**vars(args))
@@ -287,6 +324,14 @@ class GeodataCLI:
 
     def closest_geographies(self, args):
         cgs = self.engine.closest_geographies(**vars(args))
+        self.print_distances(args.context, cgs[:args.n])
+
+    def print_distances(self, context, cgs, kilometers=False):
+        '''Print (DemographicProfile, distance) rows.'''
+        if kilometers:
+            distance_header = 'Distance (km)'
+        else:
+            distance_header = 'Distance (mi)'
 
         # Helper methods for printing cg rows #################################
 
@@ -331,10 +376,10 @@ class GeodataCLI:
                 # Output '<UNIVERSE GEOGRAPHY> in <GROUP NAME>'
                 out_str = iam + (universe + ' in ' \
                     + group_name).ljust(45)[:45] + iam \
-                    + 'Distance (mi)'.rjust(20)
+                    + distance_header.rjust(20)
             else:
                 out_str = iam + universe.ljust(45)[:45] + iam \
-                    + 'Distance (mi)'.rjust(20)
+                    + distance_header.rjust(20)
 
             return out_str
 
@@ -347,7 +392,7 @@ class GeodataCLI:
 
         # Printing ############################################################
 
-        universe_sl, group_sl, group = self.slt.unpack_context(args.context)
+        universe_sl, group_sl, group = self.slt.unpack_context(context)
 
         if len(cgs) == 0:
             print("Sorry, no geographies match your criteria.")
@@ -356,10 +401,43 @@ class GeodataCLI:
             print(divider())
             print(cg_print_headers(universe_sl, group_sl, group))
             print(divider())
-            for cg in cgs[:args.n]:
+            for cg in cgs:
                 print(cg_print_row(*cg))
             print(divider())
 
+    def within_radius(self, args):
+        wrs = self.engine.within_radius(**vars(args))
+
+        if args.n:
+            wrs = wrs[:args.n]
+
+        self.print_distances(args.context, wrs, kilometers=args.kilometers)
+
+    def within_bbox(self, args):
+        wbs = self.engine.within_bbox(*args.bbox, **vars(args))
+
+        if args.n:
+            wbs = wbs[:args.n]
+
+        # The inter-area margin to divide display sections
+        iam = ' '
+
+        def divider():
+            '''Print a divider for DemographicProfiles'''
+            return '-' * 68
+
+        if len(wbs) == 0:
+            print("Sorry, no geographies match your criteria.")
+        else:
+            print(divider())
+            print(iam + 'Geography'.ljust(45)[:45] + iam \
+                + 'Total population'.rjust(20))
+            print(divider())
+            for dpi in wbs:
+                print(iam + dpi.name.ljust(45)[:45] + iam \
+                    + dpi.fc['population'].rjust(20))
+            print(divider())
+
     def distance(self, args):
         print(self.engine.distance(**vars(args)))
 
@@ -369,4 +447,16 @@ class GeodataCLI:
     def get_csv_dp(self, args):
         self.engine.get_csv_dp(**vars(args))
 
-gcli = GeodataCLI()
+    def all_similar_geovectors(self, args):
+        if args.appearance:
+            mode = 'app'
+        else:
+            mode = 'std'
+
+        self.engine.all_similar_geovectors_tofile(**vars(args), mode=mode)
+
+# createdb --jobs and tocsv gvs --jobs start worker processes, which import
+# this module again where they are spawned rather than forked, so the CLI
+# only runs when this is the main module.
+if __name__ == '__main__':
+    gcli = GeodataCLI()
@@ -0,0 +1,104 @@
+'''
+A cache of the intermediate products of a Database build, so that a rebuild
+only reprocesses stages whose inputs changed.
+
+Each stage result is stored under a key made from the stage name, its
+configuration, and the contents of its input files. Results are written
+atomically once a stage completes, so a build that stops partway through
+resumes from the last completed stage.
+'''
+
+import hashlib
+import os
+import pickle
+
+from pathlib import Path
+
+class BuildCache:
+    '''Content-hashed storage for build stage results.'''
+    # Change this whenever the format of a stage result changes.
+    version = 4
+
+    def __init__(self, path):
+        self.path = Path(path).expanduser().resolve()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        # Hashes of input files, keyed by path. Files are only hashed again
+        # if their size or modification time changes.
+        self.hashes_path = self.path / 'file_hashes.pickle'
+        self.hashes = self.load(self.hashes_path) or dict()
+        # Whether hashes has changed since it was last saved
+        self.dirty = False
+
+    def load(self, this_path):
+        '''Unpickle a file, or return None if it is missing or unreadable.'''
+        try:
+            with open(this_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def dump(self, this_path, value):
+        '''Pickle value to a file atomically.'''
+        tmp_path = this_path.with_name(this_path.name + '.tmp')
+
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        os.replace(tmp_path, this_path)
+
+    def file_hash(self, this_path):
+        '''Get the SHA-1 digest of a file's contents.'''
+        stat = os.stat(this_path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        cached = self.hashes.get(str(this_path))
+
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        digest = hashlib.sha1()
+
+        with open(this_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+
+        # New hashes are saved by flush(), once per stage.
+        self.hashes[str(this_path)] = (signature, digest.hexdigest())
+        self.dirty = True
+
+        return digest.hexdigest()
+
+    def flush(self):
+        '''Save file hashes if any have changed.'''
+        if self.dirty:
+            self.dump(self.hashes_path, self.hashes)
+            self.dirty = False
+
+    def key(self, stage, paths, config):
+        '''Key for a stage with input files paths and configuration config.'''
+        digest = hashlib.sha1()
+        digest.update(repr((self.version, stage, config)).encode())
+
+        for this_path in paths:
+            digest.update(Path(this_path).name.encode())
+            digest.update(self.file_hash(this_path).encode())
+
+        self.flush()
+
+        return digest.hexdigest()
+
+    def stage_path(self, stage, key):
+        return self.path / f'{stage}.{key}.pickle'
+
+    def get(self, stage, key):
+        '''Get a stage result, or None if there isn't one for key.'''
+        return self.load(self.stage_path(stage, key))
+
+    def put(self, stage, key, value):
+        '''Store a stage result, replacing results for other keys.'''
+        this_path = self.stage_path(stage, key)
+        self.dump(this_path, value)
+
+        for old_path in self.path.glob(f'{stage}.*.pickle'):
+            if old_path != this_path:
+                old_path.unlink()
@@ -3,6 +3,12 @@ import numpy as np
 
 from datainterface.DemographicProfile import DemographicProfile
 from datainterface.GeoVector import GeoVector
+from datainterface.ColumnStore import ColumnStore
+from datainterface.ContextIndex import ContextIndex
+from datainterface.GeoVectorIndex import GeoVectorIndex
+from datainterface.GeoVectorScorer import GeoVectorScorer
+from datainterface.SpatialIndex import SpatialIndex
+from datainterface.SQLiteStore import SQLiteStore
 # from initialize_sqlalchemy import Base, engine, session
 
 from itertools import islice
@@ -11,10 +17,121 @@ import csv
 
 from tools.geodata_typecast import gdt, gdti, gdtf
 from tools.StateTools import StateTools
+from database.BuildCache import BuildCache
 
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, compress, repeat
 from pathlib import Path
 import sys
+import time
+
+###############################################################################
+# File parsers
+#
+# These are module-level functions so that they can be run in worker
+# processes when Database is created with jobs > 1.
+
+def geo_csv_rows(this_path, geo_sumlevels):
+    '''
+    Generate rows for the geographies table from one geographic CSV file,
+    filtered and projected as they are read.
+    '''
+    st = StateTools()
+
+    with open(this_path, 'rt', encoding='iso-8859-1') as f:
+        for x in csv.reader(f):
+            # Filter for summary levels
+            if x[2] in geo_sumlevels and x[48][3:5] == '00':
+                yield [x[1].lower(),            # STUSAB [lowercase]
+                       x[2],                    # SUMLEVEL
+                       x[4],                    # LOGRECNO
+                       st.get_state(x[49]),     # STATE
+                       x[48],                   # GEOID
+                       x[49]]                   # NAME
+
+def read_geo_csv_file(this_path, geo_sumlevels):
+    '''Read every row that geo_csv_rows() generates for one file.'''
+    return list(geo_csv_rows(this_path, geo_sumlevels))
+
+def read_gazetteer_file(this_path, sumlevel, columns, renames=None,
+                        constants=None, numeric_columns=None):
+    '''
+    Read a Gazetteer file into a DataFrame with columns, aligned by name.
+    renames maps the file's column names to geoheaders column names, and
+    constants sets columns to a single value. GEOIDs are completed with the
+    summary level. numeric_columns are parsed as numbers; everything else is
+    kept as strings.
+    '''
+    df = pd.read_csv(this_path, sep='\t', dtype=str, keep_default_na=False)
+
+    # The last column has trailing whitespace in some files.
+    df.columns = df.columns.str.strip()
+    df[df.columns[-1]] = df[df.columns[-1]].str.strip()
+
+    # Parse numeric columns once, here. Missing values become NaN, which
+    # SQLite stores as NULL.
+    for column in numeric_columns or []:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+
+    df = df.rename(columns=renames or {})
+
+    for column, value in (constants or {}).items():
+        df[column] = value
+
+    df['GEOID'] = sumlevel + '00US' + df['GEOID']
+
+    # Columns the file lacks are empty strings, or NaN if they are numeric.
+    for column in columns:
+        if column not in df.columns:
+            df[column] = np.nan if column in (numeric_columns or []) else ''
+
+    return df[columns]
+
+def to_number(value):
+    '''
+    Parse an estimate once, at ingest: an int, a float if it has a decimal,
+    or None if it is missing. Values that int() and float() can't parse are
+    scrubbed with gdt().
+    '''
+    try:
+        return int(value)
+    except ValueError:
+        pass
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    number = gdt(value)
+
+    if number != number: # numpy.nan
+        return None
+
+    return number
+
+def read_estimate_file(this_path, positions):
+    '''
+    Read the elements at positions from every row of an estimate file. The
+    first two (STATE and LOGRECNO) are returned as a list of keys, and the
+    rest are parsed with to_number() into a float array with a row for each
+    key (numpy.nan where values are missing). The array is much cheaper to
+    send back from a worker process than lists of Python numbers.
+    '''
+    state, logrecno = positions[:2]
+    estimates = positions[2:]
+    keys = []
+    values = []
+
+    with open(this_path, 'rt') as f:
+        for csv_row in csv.reader(f):
+            keys.append((csv_row[state], csv_row[logrecno]))
+            values.append([to_number(csv_row[i]) for i in estimates])
+
+    return (keys, np.array(values, dtype=np.float64).reshape(
+        len(keys), len(estimates)))
 
 class Database:
     '''Creates data products for use by geodata.'''
@@ -37,6 +154,10 @@ class Database:
         return list(pd.read_csv(path / f'{gh_year}_Gaz_place_national.txt',
             sep='\t', nrows=1, dtype='str').columns)
 
+    def column_def(self, column):
+        '''Get the column definition for a column, TEXT unless typed.'''
+        return column + ' ' + self.column_types.get(column, 'TEXT')
+
     def dbapi_qm_substr(self, columns_len):
         '''Get the DBAPI question mark substring'''
         return ', '.join(['?'] * columns_len)
@@ -49,17 +170,26 @@ class Database:
     # ignore. Otherwise, if there is no seperate id column, set it 0.
     def create_table(self, table_name, columns, column_defs, rows, ido=1):
         '''Create a table for use by geodata.'''
-        # DBAPI question mark substring
-        columns_len = len(column_defs) - ido
-        question_mark_substr = self.dbapi_qm_substr(columns_len)
-
         # CREATE TABLE statement
         self.c.execute('''CREATE TABLE %s
                           (%s)''' % (table_name, ', '.join(column_defs)))
 
         # Insert rows into table
-        self.c.executemany('INSERT INTO %s(%s) VALUES (%s)' % (
-            table_name, ', '.join(columns), question_mark_substr), rows)
+        self.insert_rows(table_name, columns, rows)
+
+    def insert_rows(self, table_name, columns, rows):
+        '''
+        Insert rows into a table, chunk_size rows at a time so that rows can
+        be a generator that is never held in memory all at once.
+        '''
+        question_mark_substr = self.dbapi_qm_substr(len(columns))
+        rows = iter(rows)
+        chunk = self.take(self.chunk_size, rows)
+
+        while chunk:
+            self.c.executemany('INSERT INTO %s(%s) VALUES (%s)' % (
+                table_name, ', '.join(columns), question_mark_substr), chunk)
+            chunk = self.take(self.chunk_size, rows)
 
     def debug_output_table(self, table_name):
         '''Print debug information for a table'''
@@ -86,55 +216,253 @@ class Database:
             print(key + ':', value)
         print()
 
+    def map(self, func, *iterables):
+        '''
+        Map func over iterables, in worker processes if there are any. Results
+        are returned in order.
+
+        Each worker returns the result for a whole file, so with worker
+        processes, memory is bounded by files rather than rows: at most
+        self.max_pending results are submitted ahead of the one being
+        consumed.
+        '''
+        if not self.pool:
+            return map(func, *iterables)
+
+        return self.bounded_map(func, *iterables)
+
+    def bounded_map(self, func, *iterables):
+        '''Generate results of func in worker processes, in order.'''
+        pending = deque()
+
+        for args in zip(*iterables):
+            pending.append(self.pool.submit(func, *args))
+
+            if len(pending) >= self.max_pending:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+    def apply_bulk_pragmas(self):
+        '''
+        Tune SQLite for loading: the database is rebuilt from scratch if
+        anything goes wrong, so there is no need for a journal or syncs.
+        '''
+        self.c.execute('PRAGMA journal_mode = OFF')
+        self.c.execute('PRAGMA synchronous = OFF')
+        self.c.execute('PRAGMA cache_size = -262144') # 256 MiB
+        self.c.execute('PRAGMA temp_store = MEMORY')
+
+    def begin_stage(self, stage):
+        '''
+        End the current stage, if any, then start timing stage and open a
+        transaction for it.
+        '''
+        self.end_stage()
+
+        self.stage = stage
+        self.stage_start = time.perf_counter()
+        self.c.execute('BEGIN')
+
+    def end_stage(self):
+        '''Commit the current stage's transaction and record its timing.'''
+        if not self.stage:
+            return
+
+        self.conn.commit()
+
+        self.timings[self.stage] = round(time.perf_counter()
+                                         - self.stage_start, 3)
+        print(f'Stage {self.stage} completed in {self.timings[self.stage]} s.')
+        print()
+
+        self.stage = None
+
     def get_geo_csv_rows(self):
-        '''Get all rows geographic CSV files for every state'''
-        # Get rows from CSV
-        rows = []
-        # Get rows from CSV files for each state.
-        for state in self.st.get_abbrevs(lowercase=True):
-            this_path = self.data_dir / f'g{self.year}5{state}.csv'
-            
-            with open(this_path, 'rt', encoding='iso-8859-1') as f:
-                rows += list(csv.reader(f))
-
-        # Also, get rows for the national file (for ZCTA support).
-        this_path = self.data_dir / f'g{self.year}5us.csv'
-        with open(this_path, 'rt', encoding='iso-8859-1') as f:
-            rows += list(csv.reader(f))
-        
-        return rows
-    
+        '''
+        Generate rows for the geographies table from geographic CSV files
+        for every state, filtered and projected as they are read.
+        '''
+        # The national file is included for ZCTA support.
+        paths = self.get_geo_csv_paths()
+
+        # With worker processes, each one parses a whole state's file, so
+        # rows are held a few files at a time instead of being streamed one
+        # at a time (see map()).
+        if self.pool:
+            return chain.from_iterable(self.map(read_geo_csv_file, paths,
+                repeat(self.geo_sumlevels)))
+        else:
+            return chain.from_iterable(geo_csv_rows(this_path,
+                self.geo_sumlevels) for this_path in paths)
+
+    def get_geo_csv_paths(self):
+        '''Paths of the geographic CSV files for every state and the US'''
+        return [self.data_dir / f'g{self.year}5{state}.csv'
+                for state in self.st.get_abbrevs(lowercase=True, inc_us=True)]
+
+    def get_gh_sources(self):
+        '''
+        Gazetteer files used for the geoheaders table, in the order their
+        rows are added. Each is (summary level, path, renamed columns,
+        constant columns); columns are then aligned with the geoheaders
+        columns by name, and columns that a file lacks are left empty.
+        '''
+        return [
+            ('160', self.data_dir / f'{self.gh_year}_Gaz_place_national.txt',
+             {}, {}),
+            ('050', self.data_dir / f'{self.gh_year}_Gaz_counties_national.txt',
+             {}, {}),
+            ('040', self.data_dir / '2019_Gaz_state_national.txt',
+             {}, {}),
+            # The state abbrev for all ZCTAs, UAs and metro/micro areas in the
+            # geographies table is US.
+            ('860', self.data_dir / f'{self.gh_year}_Gaz_zcta_national.txt',
+             {}, {'USPS': 'US'}),
+            ('400', self.data_dir / f'{self.gh_year}_Gaz_ua_national.txt',
+             {'UATYPE': 'LSAD'}, {'USPS': 'US'}),
+            ('310', self.data_dir / f'{self.gh_year}_Gaz_cbsa_national.txt',
+             {'CBSA_TYPE': 'LSAD'}, {'USPS': 'US'}),
+            ]
+
+    def get_gh_paths(self):
+        '''Paths of the Gazetteer files used for the geoheaders table'''
+        return [source[1] for source in self.get_gh_sources()]
+
+    def get_gh_rows(self):
+        '''
+        Get rows for the geoheaders table from the Gazetteer files for every
+        summary level, as one DataFrame with the geoheaders columns.
+        '''
+        return pd.concat(
+            [read_gazetteer_file(this_path, sumlevel, self.geoheaders_columns,
+                                 renames, constants,
+                                 self.gh_numeric_columns)
+             for sumlevel, this_path, renames, constants
+             in self.get_gh_sources()],
+            ignore_index=True)
+
+    def cached(self, stage, paths, config, build):
+        '''
+        Return the result of build() for a stage with input files paths and
+        configuration config. If there is a build cache, the result is read
+        from it when the inputs are unchanged, and stored in it otherwise.
+        '''
+        if not self.cache:
+            return build()
+
+        key = self.cache.key(stage, paths, config)
+        result = self.cache.get(stage, key)
+
+        if result is None:
+            result = build()
+            self.cache.put(stage, key, result)
+        else:
+            print(f'Using cached {stage}.')
+            print()
+
+        return result
+
+    def get_estimate_rows(self, sequence_number, positions):
+        '''
+        Get the elements at positions from every row of the estimate files
+        for a sequence number, as one (keys, values) result of
+        read_estimate_file() per file.
+        '''
+        files = self.files[sequence_number]
+
+        if not self.cache:
+            return self.map(read_estimate_file, files, repeat(positions))
+
+        return self.cached(f'data-{sequence_number}', files,
+                           (self.year, positions),
+                           lambda: list(self.map(read_estimate_file, files,
+                                                 repeat(positions))))
+
     ###########################################################################
     # __init__
 
-    def __init__(self, path):
-        '''Create the database'''
+    def __init__(self, path, jobs=1, cache_dir=None, bulk=False):
+        '''
+        Create the database. If jobs is more than one, per-state files are
+        parsed in that many worker processes. If cache_dir is given, the
+        results of each stage are cached there, and later builds only
+        reprocess stages whose input files or configuration changed. If bulk
+        is True, SQLite is tuned for loading and indexes are created only
+        after their tables are loaded.
+        '''
         # Initialize ##########################################################
 
         self.data_dir = Path(path).expanduser().resolve()
         self.year = '2020'
         self.gh_year = '2023'
 
+        # Summary levels to keep
+        # 040 = State
+        # 050 = State-County
+        # 160 = State-Place
+        # 310 = Metro/Micro Area
+        # 400 = Urban Area
+        # 860 = ZCTA
+        self.geo_sumlevels = {'040', '050', '160', '310', '400', '860'}
+
+        # SQLite types for numeric columns. Estimates are added once the
+        # data identifiers are known.
+        self.column_types = {
+            'ALAND':        'INTEGER',
+            'AWATER':       'INTEGER',
+            'ALAND_SQMI':   'REAL',
+            'AWATER_SQMI':  'REAL',
+            'INTPTLAT':     'REAL',
+            'INTPTLONG':    'REAL',
+            }
+        self.gh_numeric_columns = list(self.column_types.keys())
+
+        # Estimates that can have decimals. All others are integers.
+        self.real_estimates = {'B25018_1'} # Median number of rooms
+
+        # Number of rows passed to each executemany() call
+        self.chunk_size = 10000
+
         self.st = StateTools()
 
+        # Build cache
+        if cache_dir:
+            self.cache = BuildCache(cache_dir)
+        else:
+            self.cache = None
+
         # Connect to SQLite3
         self.conn = sqlite3.connect(':memory:')
         self.c = self.conn.cursor()
 
+        self.bulk = bulk
+
+        if self.bulk:
+            self.apply_bulk_pragmas()
+
+        # Each stage runs in its own transaction and is timed.
+        self.stage = None
+        self.timings = dict()
+
         # table_metadata ######################################################
+        self.begin_stage('table_metadata')
         this_table_name = 'table_metadata'
 
         # Process column definitions
         columns = self.get_tm_columns(self.data_dir)
-        column_defs = list(map(lambda x: x + ' TEXT', columns))
+        column_defs = list(map(self.column_def, columns))
         column_defs.insert(0, 'id INTEGER PRIMARY KEY')
 
         # Get rows from CSV
         this_path = self.data_dir / 'ACS_5yr_Seq_Table_Number_Lookup.txt'
-        rows = []
 
-        with open(this_path, 'rt') as f:
-            rows = list(csv.reader(f))
+        def read_tm_rows():
+            with open(this_path, 'rt') as f:
+                return list(csv.reader(f))
+
+        rows = self.cached('table_metadata', [this_path], None, read_tm_rows)
 
         # Create table
         self.create_table(this_table_name, columns, column_defs, rows)
@@ -142,7 +470,203 @@ class Database:
         # Debug output
         self.debug_output_table(this_table_name)
 
+        # Parse files for the geographies, geoheaders and data tables, in
+        # worker processes if there are to be any. Workers are shut down
+        # even if parsing fails.
+        if jobs > 1:
+            self.pool = ProcessPoolExecutor(max_workers=jobs)
+        else:
+            self.pool = None
+
+        # Results submitted to workers ahead of the one being consumed
+        self.max_pending = 2 * jobs
+
+        try:
+            self.parse_files()
+        finally:
+            if self.pool:
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = None
+
+        # geodata #############################################################
+        self.begin_stage('geodata')
+        this_table_name = 'geodata'
+
+        # Combine data from places, geoheaders, and data into a single table.
+        
+        # Combine columns
+        columns = self.geographies_columns + self.geoheaders_columns \
+                  + self.data_columns
+        
+        # Unambiguous columns
+        ub_geographies_columns = list(map(lambda x: 'geographies.' + x, self.geographies_columns))
+        ub_geoheaders_columns = list(map(lambda x: 'geoheaders.' + x, self.geoheaders_columns))
+        ub_data_columns = list(map(lambda x: 'data.' + x, self.data_columns))
+        ub_columns = ub_geographies_columns + ub_geoheaders_columns + ub_data_columns
+
+        # Make columns names unambigious
+        def deambigify(column):
+            if column in self.geographies_columns:
+                return 'geographies.' + column
+            elif column in self.geoheaders_columns:
+                return 'geoheaders.' + column
+            elif column in self.data_columns:
+                return 'data.' + column
+
+        # Remove duplicates
+        columns = list(dict.fromkeys(columns))
+        self.columns = columns
+        ub_columns = list(map(deambigify, columns))
+
+        # Column definitions
+        column_defs = list(map(self.column_def, columns))
+        column_defs.insert(0, 'id INTEGER PRIMARY KEY')
+
+        # DBAPI question mark substring
+        columns_len = len(column_defs)
+        question_mark_substr = self.dbapi_qm_substr(columns_len)
+
+        # CREATE TABLE statement
+        self.c.execute('''CREATE TABLE %s
+                          (%s)''' % (this_table_name, ', '.join(column_defs)))
+
+        # Insert rows into merged table
+        self.c.execute('''INSERT INTO %s(%s)
+        SELECT %s FROM geographies
+        JOIN geoheaders ON geographies.GEOID = geoheaders.GEOID
+        JOIN data ON geographies.LOGRECNO = data.LOGRECNO AND geographies.STUSAB = data.STATE''' % (
+            this_table_name, ', '.join(columns), ', '.join(ub_columns)))
+
+        # Debug output
+        self.debug_output_list('columns')
+        self.debug_output_table(this_table_name)
+
+        # Database: Apply changes #############################################
+
+        # Commit changes
+        self.conn.commit()
+
+        # Row factory
+        self.conn.row_factory = sqlite3.Row
+        self.c = self.conn.cursor()
+
+        # Read geodata ########################################################
+        self.begin_stage('read')
+
+        # Read the geodata table once. DemographicProfiles, medians, standard
+        # deviations and GeoVectors are all made from these rows.
+        rows = self.c.execute('SELECT * from geodata').fetchall()
+
+        # Columnar copies of the rows, keyed by column name
+        geodata_columns = dict(zip(['id'] + self.columns, zip(*rows)))
+
+        # DemographicProfiles #################################################
+        self.begin_stage('demographicprofiles')
+
+        # Create a placeholder for DemographicProfiles
+        self.demographicprofiles = []
+        # geodata ids of the rows that DemographicProfiles were made from
+        self.geodata_ids = []
+
+        for row in rows:
+            try:
+                self.demographicprofiles.append(DemographicProfile(row))
+                self.geodata_ids.append(row['id'])
+            except AttributeError as e:
+                print('AttributeError:', e)
+                print(tuple(row))
+
+        # Debug output
+        self.debug_output_list('demographicprofiles')
+
+        # Medians and standard deviations #####################################
+        self.begin_stage('medians')
+
+        # Values are already numbers (or None, which becomes numpy.nan), so
+        # each column is converted to an array at once.
+        df = pd.DataFrame({
+            column: np.array(geodata_columns[column], dtype=np.float64)
+            for column in ['ALAND_SQMI'] + self.data_columns[2:]
+            })
+
+        # Adjustments for better calculations of medians and
+        # standard deviations, and better results for highest and lowest values
+
+        # median_year_structure_built value of 0 were causing problems because
+        # all values for available data are between 1939 and the present year.
+        # Replace all 0 (and 18) values with numpy.nan
+        df = df.replace({'B25035_1': {year: np.nan for year
+                                      in GeoVectorScorer.missing_years}})
+
+        # Print some debug information.
+        print('DataFrames:', '\n')
+        print(df.head())
+        print()
+
+        print('Medians:', '\n')
+        medians = dict(df.median())
+        print(medians)
+        print()
+
+        print('Standard deviations:', '\n')
+        standard_deviations = dict(df.std())
+        print(standard_deviations)
+        print()
+
+        del df
+
+        # GeoVectors ##########################################################
+        self.begin_stage('geovectors')
+
+        # Scores for every row are calculated at once. Medians and standard
+        # deviations are for all geographies, so all summary levels are
+        # scored together.
+        scorer = GeoVectorScorer(medians, standard_deviations)
+        gv_columns = {
+            column: np.array(geodata_columns[column], dtype=np.float64)
+            for column in scorer.columns
+            }
+
+        del geodata_columns
+
+        # If some data is unavailable, don't make that GeoVector. Names of the
+        # geographies skipped are kept, and a few are printed.
+        valid = scorer.valid(gv_columns)
+
+        self.gv_skipped = [row['NAME'] for row in compress(rows, ~valid)]
+        print('Note: Inadequate data for GeoVector creation:',
+              len(self.gv_skipped), 'geographies')
+        self.debug_output_list('gv_skipped')
+
+        gv_columns = {column: values[valid]
+                      for column, values in gv_columns.items()}
+        rs = scorer.raw_subcomponents(gv_columns)
+        scores = scorer.scores(rs)
+        # Weighted subcomponent matrices, kept for GeoVectorIndex
+        self.gv_matrices = scorer.weighted(scores)
+
+        self.geovectors = []
+
+        for idx, row in enumerate(compress(rows, valid)):
+            self.geovectors.append(GeoVector.from_scores(
+                row, *scorer.subcomponents_for(idx, rs, scores,
+                                               self.gv_matrices)))
+
+        # Debug output
+        self.debug_output_list('geovectors')
+
+        del rows
+
+        self.end_stage()
+        self.debug_output_dict('timings')
+
+    def parse_files(self):
+        '''
+        Create the geographies, geoheaders and data tables from the
+        geographic CSV, Gazetteer and estimate files.
+        '''
         # geographies #########################################################
+        self.begin_stage('geographies')
         this_table_name = 'geographies'
 
         # Process column definitions
@@ -155,43 +679,18 @@ class Database:
             'NAME',
             ]
         self.geographies_columns = columns
-        column_defs = list(map(lambda x: x + ' TEXT', columns))
+        column_defs = list(map(self.column_def, columns))
         column_defs.insert(0, 'id INTEGER PRIMARY KEY')
 
-        # Get rows from CSV
-        rows = self.get_geo_csv_rows()
-                
-        # Filter for summary levels
-        # 040 = State
-        # 050 = State-County
-        # 160 = State-Place
-        # 310 = Metro/Micro Area
-        # 400 = Urban Area
-        # 860 = ZCTA
-        rows = list(filter(lambda x: 
-                           (x[2] == '160' \
-                        or x[2] == '050' \
-                        or x[2] == '040' \
-                        or x[2] == '860' \
-                        or x[2] == '310' \
-                        or x[2] == '400')
-                        and ''.join(x[48][3:5]) == '00' ,
-                           rows))
-        rows = list(
-                    map(lambda x:
-                        [x[1].lower(),             # STUSAB [lowercase]
-                        x[2],                      # SUMLEVEL
-                        x[4],                      # LOGRECNO
-                        self.st.get_state(x[49]),  # STATE
-                        x[48],                     # GEOID
-                        x[49]],                    # NAME
-                        rows
-                    )
-                )
-
-        # DBAPI question mark substring
-        columns_len = len(column_defs)
-        question_mark_substr = ', '.join(['?'] * columns_len)
+        # Get rows from CSV. Rows are filtered and projected while they are
+        # read, then inserted in chunks. (With a build cache, they are held in
+        # memory so that they can be stored.)
+        if self.cache:
+            rows = self.cached('geographies', self.get_geo_csv_paths(),
+                               (self.year, sorted(self.geo_sumlevels)),
+                               lambda: list(self.get_geo_csv_rows()))
+        else:
+            rows = self.get_geo_csv_rows()
 
         # Create table
         self.create_table(this_table_name, columns, column_defs, rows)
@@ -200,6 +699,7 @@ class Database:
         self.debug_output_table(this_table_name)
 
         # geoheaders ##########################################################
+        self.begin_stage('geoheaders')
         this_table_name = 'geoheaders'
 
         # The primary reason we are interested in the 2019 National Gazetteer
@@ -207,105 +707,32 @@ class Database:
         # population and housing unit densities.
 
         columns = self.get_gh_columns(self.gh_year, self.data_dir)
-        columns[-1] = columns[-1].strip()
+        columns = [column.strip() for column in columns]
         self.geoheaders_columns = columns
-        column_defs = list(map(lambda x: x + ' TEXT', columns))
+        column_defs = list(map(self.column_def, columns))
         column_defs.insert(0, 'id INTEGER PRIMARY KEY')
 
-        # Get rows for places (160) from CSV
-        this_path = self.data_dir / f'{self.gh_year}_Gaz_place_national.txt'
-        rows = []
-
-        with open(this_path, 'rt') as f:
-            rows = list(csv.reader(f, delimiter='\t'))
-
-        # Get rows for counties (050) from CSV
-        this_path = self.data_dir / f'{self.gh_year}_Gaz_counties_national.txt'
-
-        with open(this_path, 'rt') as f:
-            c_rows = list(csv.reader(f, delimiter='\t'))
-
-        # County geoheaders lack two columns that places have, so insert
-        # them as empty strings.
-        for idx, c_row in enumerate(c_rows):
-            c_row.insert(4, '')
-            c_row.insert(5, '')
-        
-        # Get rows for states (040) from CSV
-        this_path = self.data_dir / '2019_Gaz_state_national.txt'
-
-        with open(this_path, 'rt') as f:
-            s_rows = list(csv.reader(f, delimiter='\t'))
-
-        # Get rows for Metro/micro areas (310) from CSV
-        this_path = self.data_dir / f'{self.gh_year}_Gaz_cbsa_national.txt'
-
-        with open(this_path, 'rt') as f:
-            cbsa_rows = list(csv.reader(f, delimiter='\t'))
-
-        # Get rows for urban areas (400) from CSV
-        this_path = self.data_dir / f'{self.gh_year}_Gaz_ua_national.txt'
-
-        with open(this_path, 'rt') as f:
-            ua_rows = list(csv.reader(f, delimiter='\t'))
-
-        # UA insert blank columns so that the number of columns match.
-        for ua_row in ua_rows:
-            ua_row.insert(0, 'US') # The state abbrev for all UAs in geos tbl
-            ua_row.insert(2, '')
-            ua_row.insert(5, '')
-
-        # Get rows for ZCTAs (860) from CSV
-        this_path = self.data_dir / f'{self.gh_year}_Gaz_zcta_national.txt'
-
-        with open(this_path, 'rt') as f:
-            z_rows = list(csv.reader(f, delimiter='\t'))
-
-        # ZCTA insert blank columns so that the number of columns match.
-        for z_row in z_rows:
-            z_row.insert(0, 'US') # The state abbrev for all ZCTAs in geos tbl
-            z_row.insert(2, '')
-            z_row.insert(3, '')
-            z_row.insert(4, '')
-            z_row.insert(5, '')
-
-        # Metro/micro area insert blank columns so that the number of columns
-        # match.
-        for cbsa_row in cbsa_rows:
-            del(cbsa_row[0])
-            cbsa_row.insert(0, 'US') # The state abb. for all metro/micro areas
-            cbsa_row.insert(2, '')
-            cbsa_row.insert(5, '')
-
-        def complete_geoids(sumlev_code, rows):
-            for row in rows:
-                row[1] = sumlev_code + '00US' + row[1]
-
-        # Complete GEOIDs
-
-        complete_geoids('160', rows)
-        complete_geoids('040', s_rows)
-        complete_geoids('050', c_rows)
-        complete_geoids('310', cbsa_rows)
-        complete_geoids('400', ua_rows)
-        complete_geoids('860', z_rows)
-
-        # Merge rows together
-        rows = rows + c_rows + s_rows + z_rows + ua_rows + cbsa_rows
-
-        for row in rows:
-            row[-1] = row[-1].strip()
+        # Get rows from the Gazetteer files
+        df = self.cached('geoheaders', self.get_gh_paths(),
+                         (self.gh_year, columns, self.gh_numeric_columns),
+                         self.get_gh_rows)
 
         print(columns)
         print(column_defs)
 
         # Create table
-        self.create_table(this_table_name, columns, column_defs, rows)
+        self.create_table(this_table_name, columns, column_defs,
+                          df.itertuples(index=False, name=None))
+
+        # Index GEOIDs for joining with geographies
+        if self.bulk:
+            self.c.execute('CREATE INDEX geoheaders_geoid ON geoheaders(GEOID)')
 
         # Debug output
         self.debug_output_table(this_table_name)
 
         # Specify what data we need ###########################################
+        self.begin_stage('plan')
 
         # Specify table_ids and line numbers that have the data we need.
         # See data/ACS_5yr_Seq_Table_Number_Lookup.txt
@@ -393,16 +820,20 @@ class Database:
         self.debug_output_dict('sequence_numbers')
 
         # Obtain needed files                                             #####
+        # Files are keyed by sequence number, since several table_ids can be
+        # in the same sequence.
         self.files = dict()
 
         for table_id, sequence_numbers in self.sequence_numbers.items():
-            if table_id not in self.files.keys():
-                self.files[table_id] = []
-
             for sequence_number in sequence_numbers:
+                if sequence_number in self.files.keys():
+                    continue
+
+                self.files[sequence_number] = []
+
                 for state in self.st.get_abbrevs(lowercase=True, inc_us=True):
                     this_path = self.data_dir / f'e{self.year}5{state}{sequence_number}000.txt'
-                    self.files[table_id].append(this_path)
+                    self.files[sequence_number].append(this_path)
         
         self.debug_output_dict('files')
 
@@ -453,10 +884,44 @@ class Database:
                 self.data_identifiers[table_id].append(this_data_identifier)
                 self.data_identifiers_list.append(this_data_identifier)
 
+                if this_data_identifier in self.real_estimates:
+                    self.column_types[this_data_identifier] = 'REAL'
+                else:
+                    self.column_types[this_data_identifier] = 'INTEGER'
+
         self.debug_output_dict('data_identifiers')
         self.debug_output_list('data_identifiers_list')
 
+        # Plan reads                                                      #####
+        # Group the positions needed by every table_id by sequence number so
+        # that each estimate file is read once, however many table_ids it
+        # holds.
+        #
+        # Format: <sequence_number>: (positions, [(table_id, offset, start,
+        #                                          width), ...])
+        #
+        # positions are read from each file (STATE and LOGRECNO first).
+        # Each table_id's values are at start:start + width in the estimate
+        # values that are read (after STATE and LOGRECNO), and at
+        # offset:offset + width in self.data_identifiers_list[2:].
+        self.read_plan = dict()
+        offset = 0
+
+        for table_id in self.line_numbers_dict.keys():
+            width = len(self.data_identifiers[table_id]) - 2
+
+            for sequence_number in self.sequence_numbers[table_id]:
+                positions, tables = self.read_plan.setdefault(sequence_number,
+                                                              ([2, 5], []))
+                tables.append((table_id, offset, len(positions) - 2, width))
+                positions += self.positions[table_id][2:]
+
+            offset += width
+
+        self.debug_output_dict('read_plan')
+
         # data ################################################################
+        self.begin_stage('data')
         this_table_name = 'data'
 
         print('Processing data table. This might take a while.')
@@ -464,232 +929,68 @@ class Database:
 
         columns = self.data_identifiers_list
         self.data_columns = columns
-        column_defs = list(map(lambda x: x + ' TEXT', columns))
-        column_defs.append('PRIMARY KEY(STATE, LOGRECNO)')
-
-        # CREATE TABLE statement
-        self.c.execute('''CREATE TABLE %s
-                          (%s)''' % (this_table_name, ', '.join(column_defs)))
-
-        # Map indices (idx) to elements from list
-        def idx_map(idxs, list):
-            ld = dict(enumerate(list))
-            return [ld[i] for i in idxs]
-
-        # Assist with changing the order of the elements around for the
-        # INSERT statement below.
-        def flip_els(rows):
-            return list(
-                map(
-                    lambda x: x[2:] + x[:2], rows
-                    )
-                )
-
-        # Record whether or not we're on the first statement of the function
-        # below.
-        first_table_id = True
-
-        # Iterate through table_ids
-        for table_id, line_numbers in self.line_numbers_dict.items():
-            columns = self.data_identifiers[table_id]
-            rows = []
-
-            # Iterate through files
-            for file in self.files[table_id]:
-                # Read from each CSV file
-                with open(file, 'rt') as f:
-                    csv_rows = csv.reader(f)
-
-                    for csv_row in csv_rows:
-                        # Get elements at self.positions[table_id] for each row
-                        rows.append(idx_map(self.positions[table_id], csv_row))
-
-            if first_table_id:
-                question_mark_substr = self.dbapi_qm_substr(len(columns))
-                # Insert rows into table
-                self.c.executemany('INSERT INTO %s(%s) VALUES (%s)' % (
-                    this_table_name, ', '.join(columns),
-                    question_mark_substr), rows)
-
-                first_table_id = False
-            else:
-                set_clause = list(
-                    map(
-                        lambda x: x + ' = ?',
-                        self.data_identifiers[table_id][2:]
-                        )
-                    )
-                self.c.executemany('''UPDATE %s SET %s
-                    WHERE STATE = ? AND LOGRECNO = ?''' % (
-                    this_table_name, ', '.join(set_clause)), flip_els(rows))
-
-            # Print the count for debug purposes. Should be around ~200,000
-            for debug in self.c.execute('SELECT COUNT(*) FROM data'):
-                display_data_identifier = table_id
-                print('Processing for', display_data_identifier,
-                    'complete (' + str(debug[0]), 'rows).')
-
-        print()
-        # Debug output
-        self.debug_output_table(this_table_name)
-
-        # geodata #############################################################
-        this_table_name = 'geodata'
+        column_defs = list(map(self.column_def, columns))
 
-        # Combine data from places, geoheaders, and data into a single table.
-        
-        # Combine columns
-        columns = self.geographies_columns + self.geoheaders_columns \
-                  + self.data_columns
-        
-        # Unambiguous columns
-        ub_geographies_columns = list(map(lambda x: 'geographies.' + x, self.geographies_columns))
-        ub_geoheaders_columns = list(map(lambda x: 'geoheaders.' + x, self.geoheaders_columns))
-        ub_data_columns = list(map(lambda x: 'data.' + x, self.data_columns))
-        ub_columns = ub_geographies_columns + ub_geoheaders_columns + ub_data_columns
-
-        # Make columns names unambigious
-        def deambigify(column):
-            if column in self.geographies_columns:
-                return 'geographies.' + column
-            elif column in self.geoheaders_columns:
-                return 'geoheaders.' + column
-            elif column in self.data_columns:
-                return 'data.' + column
-
-        # Remove duplicates
-        columns = list(dict.fromkeys(columns))
-        self.columns = columns
-        ub_columns = list(map(deambigify, columns))
-
-        # Column definitions
-        column_defs = list(map(lambda x: x + ' TEXT', columns))
-        column_defs.insert(0, 'id INTEGER PRIMARY KEY')
-
-        # DBAPI question mark substring
-        columns_len = len(column_defs)
-        question_mark_substr = self.dbapi_qm_substr(columns_len)
+        # In bulk mode, the key is indexed after rows are inserted instead of
+        # being maintained during every insert.
+        if not self.bulk:
+            column_defs.append('PRIMARY KEY(STATE, LOGRECNO)')
 
         # CREATE TABLE statement
         self.c.execute('''CREATE TABLE %s
                           (%s)''' % (this_table_name, ', '.join(column_defs)))
 
-        # Insert rows into merged table
-        self.c.execute('''INSERT INTO %s(%s)
-        SELECT %s FROM geographies
-        JOIN geoheaders ON geographies.GEOID = geoheaders.GEOID
-        JOIN data ON geographies.LOGRECNO = data.LOGRECNO AND geographies.STUSAB = data.STATE''' % (
-            this_table_name, ', '.join(columns), ', '.join(ub_columns)))
+        # Values for every table_id are merged in memory on (STATE, LOGRECNO)
+        # and inserted once, rather than inserting the first table_id and
+        # running an UPDATE for every row of every other table_id.
+        # Each key maps to values in self.data_identifiers_list[2:] order.
+        merged = dict()
+        n_values = len(self.data_identifiers_list) - 2
 
-        # Debug output
-        self.debug_output_list('columns')
-        self.debug_output_table(this_table_name)
+        # Only rows for the first table_id add keys; the rest only fill in
+        # values for them.
+        first_table_id = next(iter(self.line_numbers_dict.keys()))
 
-        # Database: Apply changes #############################################
+        # Iterate through sequence numbers
+        for sequence_number, (positions, tables) in self.read_plan.items():
+            table_ids = [table[0] for table in tables]
+            adds_keys = first_table_id in table_ids
 
-        # Commit changes
-        self.conn.commit()
+            # Read from each CSV file once, getting elements at positions
+            # for every table_id in the sequence
+            for keys, file_values in self.get_estimate_rows(sequence_number,
+                                                            positions):
+                # Missing values are numpy.nan, which SQLite stores as NULL.
+                for key, row in zip(keys, file_values.tolist()):
+                    values = merged.get(key)
 
-        # Row factory
-        self.conn.row_factory = sqlite3.Row
-        self.c = self.conn.cursor()
+                    if values is None:
+                        if not adds_keys:
+                            continue
 
-        # DemographicProfiles #################################################
+                        values = merged[key] = [None] * n_values
 
-        # Create a placeholder for DemographicProfiles
-        self.demographicprofiles = []
+                    for table_id, offset, start, width in tables:
+                        values[offset:offset + width] = row[start:start + width]
 
-        for row in self.c.execute('SELECT * from geodata'):
-            try:
-                self.demographicprofiles.append(DemographicProfile(row))
-            except AttributeError as e:
-                print('AttributeError:', e)
-                print(tuple(row))
-
-        # Debug output
-        self.debug_output_list('demographicprofiles')
-
-        # Medians and standard deviations #####################################
-
-        # Prepare a DataFrame into which we can insert rows.
-        rows = []
-        for row in self.c.execute('SELECT * from geodata'):
-            try: 
-                rows.append([
-                            gdt(row['ALAND_SQMI']),
-                            gdt(row['B01003_1']),
-                            gdt(row['B19301_1']),
-                            gdt(row['B02001_2']),
-                            gdt(row['B02001_3']),
-                            gdt(row['B02001_5']),
-                            gdt(row['B03002_3']),
-                            gdt(row['B03002_12']),
-                            gdt(row['B04004_51']),
-                            gdt(row['B15003_1']),
-                            gdt(row['B15003_22']),
-                            gdt(row['B15003_23']),
-                            gdt(row['B15003_24']),
-                            gdt(row['B15003_25']),
-                            gdt(row['B19013_1']),
-                            gdt(row['B25018_1']),
-                            gdt(row['B25035_1']),
-                            gdt(row['B25058_1']),
-                            gdt(row['B25077_1']),
-                            ])
-            except AttributeError:
-                print('AttributeError:', instance)
-
-        # print(dict(enumerate(self.columns)))
-        # print([self.columns[11]] + self.columns[15:])
-        df = pd.DataFrame(rows, columns=[self.columns[12]] + self.columns[16:])
-
-        # Adjustments for better calculations of medians and
-        # standard deviations, and better results for highest and lowest values
-
-        # median_year_structure_built value of 0 were causing problems because
-        # all values for available data are between 1939 and the present year.
-        # Replace all 0 values with numpy.nan
-        df = df.replace({'B25035_1': {0: np.nan}})
-
-        # Print some debug information.
-        print('DataFrames:', '\n')
-        print(df.head())
-        print()
-
-        print('Medians:', '\n')
-        medians = df.median()
-        print(dict(medians))
-        print()
-
-        print('Standard deviations:', '\n')
-        standard_deviations = df.std()
-        print(dict(standard_deviations))
-        print()
+            # Print the count for debug purposes. Should be around ~200,000
+            print('Processing for', ', '.join(table_ids),
+                'complete (' + str(len(merged)), 'rows).')
 
-        # GeoVectors ##########################################################
+        # Insert rows into table
+        self.insert_rows(this_table_name, self.data_columns,
+            ([state, logrecno] + values
+             for (state, logrecno), values in merged.items()))
 
-        self.geovectors = []
+        del merged
 
-        for row in self.c.execute('SELECT * from geodata'):
-            try:
-                # Construct a GeoVector and append it to self.geovectors.
-                self.geovectors.append(
-                    GeoVector(
-                        row,
-                        dict(medians),
-                        dict(standard_deviations)
-                    )
-                )
-            # If a TypeError is thrown because some data is unavailable, just
-            # don't make that GeoVector and print a debugging message.
-            except (TypeError, ValueError, AttributeError):
-                print('Note: Inadequate data for GeoVector creation:',
-                      row['NAME'])
+        if self.bulk:
+            self.c.execute('''CREATE UNIQUE INDEX data_state_logrecno
+                              ON data(STATE, LOGRECNO)''')
 
         print()
-
         # Debug output
-        self.debug_output_list('geovectors')
+        self.debug_output_table(this_table_name)
 
     def get_products(self):
         '''Return a dictionary of products.'''
@@ -697,4 +998,62 @@ class Database:
         return {
             'demographicprofiles':  self.demographicprofiles,
             'geovectors':           self.geovectors,
+            'indexes':              self.get_indexes(),
             }
+
+    def save_sqlite(self, path):
+        '''
+        Write the geodata table, aligned with the DemographicProfiles, to an
+        on-disk SQLiteStore at path.
+        '''
+        rows = {row[0]: tuple(row)[1:]
+                for row in self.c.execute('SELECT * from geodata')}
+
+        SQLiteStore.create(path, list(map(self.column_def, self.columns)),
+                           (rows[geodata_id] for geodata_id in self.geodata_ids),
+                           self.get_columns(),
+                           [dpi.counties for dpi in self.demographicprofiles])
+
+    def get_name_and_geoid_indexes(self, instances):
+        '''
+        Map display labels to lists of positions (a name can be shared by
+        geographies of different summary levels) and GEOIDs to positions.
+        If a GEOID appears more than once, the first position is kept.
+        '''
+        name_index = defaultdict(list)
+        geoid_index = dict()
+
+        for idx, instance in enumerate(instances):
+            name_index[instance.name].append(idx)
+            geoid_index.setdefault(instance.geoid, idx)
+
+        return (dict(name_index), geoid_index)
+
+    def get_indexes(self):
+        '''Return lookup indexes for DemographicProfiles and GeoVectors.'''
+        indexes = dict()
+
+        indexes['dp_name'], indexes['dp_geoid'] = \
+            self.get_name_and_geoid_indexes(self.demographicprofiles)
+        indexes['gv_name'], indexes['gv_geoid'] = \
+            self.get_name_and_geoid_indexes(self.geovectors)
+        indexes['context'] = \
+            ContextIndex.from_demographicprofiles(self.demographicprofiles)
+        indexes['geovectors'] = GeoVectorIndex.from_matrices(
+            self.gv_matrices, [gv.sumlevel for gv in self.geovectors])
+        indexes['spatial'] = SpatialIndex.from_columns(self.get_columns())
+
+        # Position of each DemographicProfile's GeoVector, or -1 if it has none
+        indexes['dp_to_gv'] = np.array(
+            [indexes['gv_geoid'].get(dpi.geoid, -1)
+             for dpi in self.demographicprofiles], dtype=np.int32)
+
+        return indexes
+
+    def get_columns(self):
+        '''Return a ColumnStore aligned with the DemographicProfiles.'''
+        if not hasattr(self, 'columns_store'):
+            self.columns_store = \
+                ColumnStore.from_demographicprofiles(self.demographicprofiles)
+
+        return self.columns_store
@@ -0,0 +1,128 @@
+'''
+Columnar copies of the data held by DemographicProfiles. Each component
+(rc) and compound (c) is stored as its own NumPy array, along with string
+tables for names, GEOIDs, summary levels and state abbreviations.
+
+Position i in every array describes the DemographicProfile at position i in
+the demographicprofiles data product, so the arrays can be used to select
+profiles without touching the profiles themselves.
+'''
+
+import numpy as np
+
+from pathlib import Path
+
+def rank_indices(values, mask, n=10, lowest=False):
+    '''
+    Return the indices of the n highest (or lowest) values where mask is True,
+    in ranked order. Ties keep their original order, as with sorted().
+
+    Only the top n are sorted: np.argpartition finds the nth value in linear
+    time. If n is 0 or None, every index where mask is True is returned.
+    '''
+    idxs = np.flatnonzero(mask)
+    vals = np.asarray(values)[idxs]
+
+    # Rank by ascending keys either way.
+    if not lowest:
+        vals = -vals
+
+    if n and n < len(idxs):
+        # The value that the nth ranked geography has
+        kth = vals[np.argpartition(vals, n - 1)[n - 1]]
+
+        # Everything that ranks above kth, plus as many ties as are needed
+        # to fill n (in their original order).
+        above = np.flatnonzero(vals < kth)
+        ties = np.flatnonzero(vals == kth)[:n - len(above)]
+        keep = np.concatenate((above, ties))
+
+        idxs = idxs[keep]
+        vals = vals[keep]
+
+    # A stable sort keeps ties in their original order.
+    return idxs[np.argsort(vals, kind='stable')]
+
+class ColumnStore:
+    '''NumPy arrays for components, compounds and labels of geographies.'''
+    # String tables and the DemographicProfile attributes they come from
+    labels = {
+        'NAME': 'name',
+        'GEOID': 'geoid',
+        'SUMLEVEL': 'sumlevel',
+        'STUSAB': 'state',
+    }
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+
+    @classmethod
+    def from_demographicprofiles(cls, dpi_instances):
+        '''Build columns from a list of DemographicProfiles.'''
+        arrays = dict()
+
+        for label, attr in cls.labels.items():
+            arrays[label] = np.array(
+                [getattr(dpi, attr) for dpi in dpi_instances], dtype=str)
+
+        fetch_one = dpi_instances[0]
+
+        # Components and compounds are stored as floats so that missing
+        # values can remain numpy.nan. DemographicProfiles already hold them
+        # in fixed-order float arrays, which are stacked and split by column.
+        for data_type in ['rc', 'c']:
+            matrix = np.array([getattr(dpi, data_type + '_values')
+                               for dpi in dpi_instances], dtype=np.float64)
+
+            for idx, comp in enumerate(getattr(fetch_one, data_type + '_keys')):
+                arrays[cls.key(comp, data_type)] = \
+                    np.ascontiguousarray(matrix[:, idx])
+
+        return cls(arrays)
+
+    @staticmethod
+    def key(comp, data_type):
+        '''Name under which a component or compound is stored.'''
+        return data_type + '.' + comp
+
+    def save(self, path):
+        '''Save each array to its own .npy file in the directory path.'''
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        # Remove arrays left over from a previous build.
+        for old_file in path.glob('*.npy'):
+            old_file.unlink()
+
+        for name, array in self.arrays.items():
+            np.save(path / (name + '.npy'), array)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        '''Load arrays saved by save(), memory-mapped by default.'''
+        arrays = dict()
+
+        for this_file in sorted(Path(path).glob('*.npy')):
+            arrays[this_file.stem] = np.load(this_file, mmap_mode=mmap_mode)
+
+        return cls(arrays)
+
+    def column(self, comp, data_type):
+        '''Get the array for a component ('rc') or compound ('c').'''
+        return self.arrays[self.key(comp, data_type)]
+
+    def rank(self, comp, data_type, mask, n=10, lowest=False):
+        '''Rank rows by a component or compound. See rank_indices().'''
+        return rank_indices(self.column(comp, data_type), mask, n=n,
+                            lowest=lowest)
+
+    def has(self, comp, data_type):
+        '''Determine whether there is an array for comp.'''
+        return self.key(comp, data_type) in self.arrays
+
+    def __len__(self):
+        return len(self.arrays['NAME'])
+
+    def __repr__(self):
+        return 'ColumnStore(rows=%s, columns=%s)' % (len(self),
+                                                     len(self.arrays))
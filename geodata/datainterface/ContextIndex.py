@@ -0,0 +1,113 @@
+'''
+Inverted indexes used to resolve contexts (such as p+ca:losangeles) without
+scanning every DemographicProfile.
+
+Each index maps a key to a sorted array of positions in the
+demographicprofiles data product. Contexts are resolved by intersecting
+these arrays.
+'''
+
+import numpy as np
+
+from collections import defaultdict
+
+class ContextIndex:
+    '''Summary level, state, county and ZCTA prefix indexes.'''
+    # ZCTAs are indexed by the first three digits of their codes.
+    zcta_prefix_len = 3
+
+    def __init__(self, size, sumlevel, state, county, zcta_prefix):
+        self.size = size
+        self.sumlevel = sumlevel
+        self.state = state
+        self.county = county
+        self.zcta_prefix = zcta_prefix
+
+    @classmethod
+    def from_demographicprofiles(cls, dpi_instances):
+        '''Build indexes from a list of DemographicProfiles.'''
+        sumlevel = defaultdict(list)
+        state = defaultdict(list)
+        county = defaultdict(list)
+        zcta_prefix = defaultdict(list)
+
+        for idx, dpi in enumerate(dpi_instances):
+            sumlevel[dpi.sumlevel].append(idx)
+            state[dpi.state].append(idx)
+
+            # Only places have counties.
+            for county_geoid in dpi.counties:
+                county[county_geoid].append(idx)
+
+            if dpi.name.startswith('ZCTA5 '):
+                zcta_prefix[dpi.name[6:6 + cls.zcta_prefix_len]].append(idx)
+
+        def to_arrays(index):
+            # Positions were appended in order, so they are already sorted.
+            return {key: np.array(value, dtype=np.int32)
+                    for key, value in index.items()}
+
+        return cls(len(dpi_instances), to_arrays(sumlevel), to_arrays(state),
+                   to_arrays(county), to_arrays(zcta_prefix))
+
+    def empty(self):
+        '''An empty array of positions'''
+        return np.array([], dtype=np.int32)
+
+    def all(self):
+        '''Every position'''
+        return np.arange(self.size, dtype=np.int32)
+
+    def zcta_ids(self, group, names):
+        '''
+        Positions of ZCTAs whose codes start with group. names is the NAME
+        array, used when group is longer than the indexed prefix.
+        '''
+        if len(group) <= self.zcta_prefix_len:
+            # Union of every prefix that starts with group
+            matches = [ids for prefix, ids in self.zcta_prefix.items()
+                       if prefix.startswith(group)]
+
+            if not matches:
+                return self.empty()
+
+            return np.sort(np.concatenate(matches))
+
+        ids = self.zcta_prefix.get(group[:self.zcta_prefix_len], self.empty())
+
+        return ids[np.char.startswith(names[ids], 'ZCTA5 ' + group)]
+
+    def ids(self, universe_sl, group_sl, group, names=None):
+        '''
+        Sorted positions of geographies that match a context unpacked by
+        SummaryLevelTools.unpack_context(). For county groups, group must be
+        the county GEOID.
+        '''
+        ids = None
+
+        # Filter by summary level
+        if universe_sl:
+            ids = self.sumlevel.get(universe_sl, self.empty())
+
+        # Filter by group summary level
+        if group_sl == '050':
+            group_ids = self.county.get(group, self.empty())
+        elif group_sl == '040':
+            group_ids = self.state.get(group, self.empty())
+        elif group_sl == '860':
+            group_ids = self.zcta_ids(group, names)
+        else:
+            group_ids = None
+
+        if ids is None and group_ids is None:
+            return self.all()
+        elif ids is None:
+            return group_ids
+        elif group_ids is None:
+            return ids
+        else:
+            return np.intersect1d(ids, group_ids, assume_unique=True)
+
+    def __repr__(self):
+        return 'ContextIndex(size=%s, states=%s, counties=%s)' % (
+            self.size, len(self.state), len(self.county))
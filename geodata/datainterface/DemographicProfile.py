@@ -5,185 +5,231 @@ geographies.
 
 # pylint: disable=import-error
 from tools.geodata_typecast import gdt, gdti, gdtf
-from tools.CountyTools import CountyTools
+from tools.CountyTools import place_counties
+from array import array
+from collections.abc import Mapping
 import textwrap
 import sys
 import csv
 
-class DemographicProfile:
-    '''Used to display data for a geography.'''
-    def __init__(self, db_row):
-
-        self.name = db_row['NAME']
-        self.state = db_row['STUSAB']
-        self.geoid = db_row['GEOID']
-        self.sumlevel = db_row['SUMLEVEL']
-        # self.key = db_row['KEY']
-
-        # CountyTools instance and county data
-        ct = CountyTools()
-        # County GEOIDs
-        if self.sumlevel == '160': # Place
-            print(self.geoid)
-            self.counties = ct.place_to_counties[self.geoid[7:]]
-            # County names (without the state)
-            self.counties_display = list(map(lambda x: ct.county_geoid_to_name[x],
-                                    ct.place_to_counties[self.geoid[7:]]))
-            self.counties_display = list(map(lambda x: x.split(', ')[0],
-                                    self.counties_display))
-        else:
-            self.counties = []
-            self.counties_display = []
-
-        #######################################################################
-        # Row labels - Formatted names for each type of data
+class ValueArray(Mapping):
+    '''
+    A read-only mapping over values held in a fixed-order float array. index
+    maps keys to positions. Values for keys in int_keys are returned as ints
+    (unless they are numpy.nan), and values for keys in whole_keys are
+    returned as ints if they are whole numbers, so they format as they did
+    before they were stored as floats.
+    '''
+    __slots__ = ('index', 'array', 'int_keys', 'whole_keys')
 
-        self.rl = dict()
+    def __init__(self, index, array, int_keys, whole_keys=frozenset()):
+        self.index = index
+        # Not named values, which would hide Mapping.values()
+        self.array = array
+        self.int_keys = int_keys
+        self.whole_keys = whole_keys
 
-        # Population category
-        self.rl['population'] = 'Total population'
-        self.rl['population_density'] = 'Population density'
+    def __getitem__(self, key):
+        value = self.array[self.index[key]]
 
-        # Geography category
-        self.rl['land_area'] = 'Land area'
-        self.rl['latitude'] = 'Latitude'
-        self.rl['longitude'] = 'Longitude'
+        if key in self.int_keys and value == value:
+            return int(value)
 
-        # Race category
-        self.rl['white_alone'] = 'White alone'
-        self.rl['white_alone_not_hispanic_or_latino'] = 'Not Hispanic or Latino'
-        self.rl['black_alone'] = 'Black or African American alone'
-        self.rl['asian_alone'] = 'Asian alone'
-        self.rl['other_race']  = 'Other race'
-        # Technically not a race, but included in the race category
-        self.rl['hispanic_or_latino'] = 'Hispanic or Latino'
-        self.rl['italian_alone'] = 'Italian alone'
+        if key in self.whole_keys and value.is_integer():
+            return int(value)
 
-        # Education category
-        self.rl['population_25_years_and_older'] = 'Total population 25 years and older'
-        self.rl['bachelors_degree_or_higher'] = "Bachelor's degree or higher"
-        self.rl['graduate_degree_or_higher'] =  'Graduate degree or higher'
+        return value
 
-        # Income category
-        self.rl['per_capita_income'] = 'Per capita income'
-        self.rl['median_household_income'] = 'Median household income'
+    def __iter__(self):
+        return iter(self.index)
 
-        # Housing category
-        self.rl['median_year_structure_built'] = 'Median year unit built'
-        self.rl['median_rooms'] = 'Median rooms'
-        self.rl['median_value'] = 'Median value'
-        self.rl['median_rent'] = 'Median rent'
+    def __len__(self):
+        return len(self.index)
 
-        #######################################################################
-        # Indents - With how many spaces should row labels be indented?
-
-        self.ind = dict()
-
-        # Population category
-        self.ind['population'] = 0
-        self.ind['population_density'] = 0
-
-        # Geography category
-        self.ind['land_area'] = 0
-        self.ind['latitude'] = 0
-        self.ind['longitude'] = 0
-
-        # Race category
-        self.ind['white_alone'] = 4
-        self.ind['white_alone_not_hispanic_or_latino'] = 6
-        self.ind['black_alone'] = 4
-        self.ind['asian_alone'] = 4
-        self.ind['other_race']  = 4
-        # Technically not a race, but included in the race category
-        self.ind['hispanic_or_latino'] = 4
-        self.ind['italian_alone'] = 0
-
-        # Education category
-        self.ind['population_25_years_and_older'] = 0
-        self.ind['bachelors_degree_or_higher'] = 2
-        self.ind['graduate_degree_or_higher'] = 2
-
-        # Income category
-        self.ind['per_capita_income'] = 0
-        self.ind['median_household_income'] = 0
+    def __repr__(self):
+        return repr(dict(self))
 
-        # Housing category
-        self.ind['median_year_structure_built'] = 0
-        self.ind['median_rooms'] = 0
-        self.ind['median_value'] = 0
-        self.ind['median_rent'] = 0
+class DemographicProfile:
+    '''Used to display data for a geography.'''
+    # Labels, indents and row headers are the same for every geography, so
+    # they are shared by the class instead of being stored with instances.
+
+    #######################################################################
+    # Row labels - Formatted names for each type of data
+
+    rl = dict()
+
+    # Population category
+    rl['population'] = 'Total population'
+    rl['population_density'] = 'Population density'
+
+    # Geography category
+    rl['land_area'] = 'Land area'
+    rl['latitude'] = 'Latitude'
+    rl['longitude'] = 'Longitude'
+
+    # Race category
+    rl['white_alone'] = 'White alone'
+    rl['white_alone_not_hispanic_or_latino'] = 'Not Hispanic or Latino'
+    rl['black_alone'] = 'Black or African American alone'
+    rl['asian_alone'] = 'Asian alone'
+    rl['other_race']  = 'Other race'
+    # Technically not a race, but included in the race category
+    rl['hispanic_or_latino'] = 'Hispanic or Latino'
+    rl['italian_alone'] = 'Italian alone'
+
+    # Education category
+    rl['population_25_years_and_older'] = 'Total population 25 years and older'
+    rl['bachelors_degree_or_higher'] = "Bachelor's degree or higher"
+    rl['graduate_degree_or_higher'] =  'Graduate degree or higher'
+
+    # Income category
+    rl['per_capita_income'] = 'Per capita income'
+    rl['median_household_income'] = 'Median household income'
+
+    # Housing category
+    rl['median_year_structure_built'] = 'Median year unit built'
+    rl['median_rooms'] = 'Median rooms'
+    rl['median_value'] = 'Median value'
+    rl['median_rent'] = 'Median rent'
+
+    #######################################################################
+    # Indents - With how many spaces should row labels be indented?
+
+    ind = dict()
+
+    # Population category
+    ind['population'] = 0
+    ind['population_density'] = 0
+
+    # Geography category
+    ind['land_area'] = 0
+    ind['latitude'] = 0
+    ind['longitude'] = 0
+
+    # Race category
+    ind['white_alone'] = 4
+    ind['white_alone_not_hispanic_or_latino'] = 6
+    ind['black_alone'] = 4
+    ind['asian_alone'] = 4
+    ind['other_race']  = 4
+    # Technically not a race, but included in the race category
+    ind['hispanic_or_latino'] = 4
+    ind['italian_alone'] = 0
+
+    # Education category
+    ind['population_25_years_and_older'] = 0
+    ind['bachelors_degree_or_higher'] = 2
+    ind['graduate_degree_or_higher'] = 2
+
+    # Income category
+    ind['per_capita_income'] = 0
+    ind['median_household_income'] = 0
+
+    # Housing category
+    ind['median_year_structure_built'] = 0
+    ind['median_rooms'] = 0
+    ind['median_value'] = 0
+    ind['median_rent'] = 0
+
+    #######################################################################
+    # Row headers - Mostly for CLI display of DemographicProfiles
+
+    rh = dict()
+
+    for comp in rl.keys():
+        rh[comp] = ' ' * ind[comp] + rl[comp]
+
+    del comp
+
+    # Raw components and compounds are stored in float arrays in these
+    # orders. Components are returned as ints, except for rc_float_keys.
+    # Of those, rc_whole_keys are returned as ints when they are whole
+    # numbers, as gdt() returned estimates without decimals.
+    rc_keys = ['land_area', 'latitude', 'longitude', 'population',
+               'white_alone', 'black_alone', 'asian_alone', 'other_race',
+               'hispanic_or_latino', 'white_alone_not_hispanic_or_latino',
+               'italian_alone', 'population_25_years_and_older',
+               'bachelors_degree_or_higher', 'graduate_degree_or_higher',
+               'per_capita_income', 'median_household_income',
+               'median_year_structure_built', 'median_rooms', 'median_value',
+               'median_rent']
+    c_keys = ['population_density', 'white_alone', 'black_alone',
+              'asian_alone', 'other_race', 'hispanic_or_latino',
+              'white_alone_not_hispanic_or_latino', 'italian_alone',
+              'population_25_years_and_older', 'bachelors_degree_or_higher',
+              'graduate_degree_or_higher']
+    rc_float_keys = {'land_area', 'latitude', 'longitude', 'median_rooms'}
+    rc_whole_keys = frozenset({'median_rooms'})
+
+    rc_index = {key: idx for idx, key in enumerate(rc_keys)}
+    c_index = {key: idx for idx, key in enumerate(c_keys)}
+    rc_int_keys = frozenset(rc_keys) - rc_float_keys
+
+    # Inter-area margin (for display purposes)
+    iam = ' '
+
+    __slots__ = ('name', 'state', 'geoid', 'sumlevel', 'county_entry',
+                 'rc_values', 'c_values', 'rc_view', 'c_view', 'formatted')
+
+    # Slots that are made again when needed instead of being pickled
+    unpickled_slots = ('rc_view', 'c_view', 'formatted')
 
-        #######################################################################
-        # Row headers - Mostly for CLI display of DemographicProfiles
+    def __init__(self, db_row):
 
-        self.rh = dict()
+        self.name = db_row['NAME']
+        self.state = db_row['STUSAB']
+        self.geoid = db_row['GEOID']
+        self.sumlevel = db_row['SUMLEVEL']
+        # self.key = db_row['KEY']
 
-        for comp in self.rl.keys():
-            self.rh[comp] = ' ' * self.ind[comp] + self.rl[comp]
+        # County GEOIDs and names, shared with other places in the same
+        # counties
+        self.county_entry = place_counties().get(self.sumlevel, self.geoid)
 
         #######################################################################
         # Raw components - Data that comes directly from the Census data files
-        self.rc = dict()
-        self.d = dict()
+        rc = dict()
 
         # Geography category
-        self.rc['land_area'] = gdtf(db_row['ALAND_SQMI'])
-        self.rc['latitude'] = gdtf(db_row['INTPTLAT'])
-        self.rc['longitude'] = gdtf(db_row['INTPTLONG'])
+        rc['land_area'] = gdtf(db_row['ALAND_SQMI'])
+        rc['latitude'] = gdtf(db_row['INTPTLAT'])
+        rc['longitude'] = gdtf(db_row['INTPTLONG'])
 
         # Population category
-        self.rc['population'] = gdt(db_row['B01003_1'])
+        rc['population'] = gdt(db_row['B01003_1'])
 
         # Race category
-        self.rc['white_alone'] = gdt(db_row['B02001_2'])
-        self.rc['black_alone'] = gdt(db_row['B02001_3'])
-        self.rc['asian_alone'] = gdt(db_row['B02001_5'])
-        self.rc['other_race'] = gdt(db_row['B01003_1']) \
+        rc['white_alone'] = gdt(db_row['B02001_2'])
+        rc['black_alone'] = gdt(db_row['B02001_3'])
+        rc['asian_alone'] = gdt(db_row['B02001_5'])
+        rc['other_race'] = gdt(db_row['B01003_1']) \
             - gdt(db_row['B02001_2']) - gdt(db_row['B02001_3']) \
             - gdt(db_row['B02001_5'])
         # Technically not a race, but included in the race category
-        self.rc['hispanic_or_latino'] = gdt(db_row['B03002_12'])
-        self.rc['white_alone_not_hispanic_or_latino'] = gdt(db_row['B03002_3'])
+        rc['hispanic_or_latino'] = gdt(db_row['B03002_12'])
+        rc['white_alone_not_hispanic_or_latino'] = gdt(db_row['B03002_3'])
 
         # Italian
-        self.rc['italian_alone'] = gdt(db_row['B04004_51'])
+        rc['italian_alone'] = gdt(db_row['B04004_51'])
 
         # Education category
-        self.rc['population_25_years_and_older'] = gdt(db_row['B15003_1'])
-        self.rc['bachelors_degree_or_higher'] = gdt(db_row['B15003_22']) \
+        rc['population_25_years_and_older'] = gdt(db_row['B15003_1'])
+        rc['bachelors_degree_or_higher'] = gdt(db_row['B15003_22']) \
             + gdt(db_row['B15003_23']) + gdt(db_row['B15003_24']) \
             + gdt(db_row['B15003_25'])
-        self.rc['graduate_degree_or_higher'] = gdt(db_row['B15003_23']) \
+        rc['graduate_degree_or_higher'] = gdt(db_row['B15003_23']) \
            + gdt(db_row['B15003_24']) + gdt(db_row['B15003_25'])
 
         # Income category
-        self.rc['per_capita_income'] = gdt(db_row['B19301_1'])
-        self.rc['median_household_income'] = gdt(db_row['B19013_1'])
+        rc['per_capita_income'] = gdt(db_row['B19301_1'])
+        rc['median_household_income'] = gdt(db_row['B19013_1'])
 
         # Housing category
-        self.rc['median_year_structure_built'] = gdt(db_row['B25035_1'])
-        self.rc['median_rooms'] = gdt(db_row['B25018_1'])
-        self.rc['median_value'] = gdt(db_row['B25077_1'])
-        self.rc['median_rent'] = gdt(db_row['B25058_1'])
-
-        #######################################################################
-        # Formatted components: Thousands seperaters, dollar signs, etc.
-        self.fc = dict()
-
-        for key in self.rc.keys():
-            if key not in ['per_capita_income', 'median_year_structure_built',
-                'median_value', 'median_rent', 'land_area',
-                'median_household_income']:
-                self.fc[key] = f'{self.rc[key]:,}'
-            elif key not in ['median_year_structure_built', 'land_area']:
-                if key == 'median_household_income' and self.rc[key] == 250001:
-                    self.fc[key] = '$250,000+'
-                else:
-                    self.fc[key] = '$' + f'{self.rc[key]:,}'
-            elif key == 'land_area':
-                self.fc[key] = f'{self.rc[key]:,.1f}' + ' sqmi'
-            else:
-                self.fc[key] = str(self.rc[key])
+        rc['median_year_structure_built'] = gdt(db_row['B25035_1'])
+        rc['median_rooms'] = gdt(db_row['B25018_1'])
+        rc['median_value'] = gdt(db_row['B25077_1'])
+        rc['median_rent'] = gdt(db_row['B25058_1'])
 
         #######################################################################
         # Compounds: The result of mathematic operations of raw components.
@@ -192,46 +238,46 @@ class DemographicProfile:
 
         # Most of the if/else statements below avoid division by zero errors.
 
-        self.c = dict()
+        c = dict()
 
         # Geography category
         # No compounds for this category.
 
-        if self.rc['land_area'] != 0:
+        if rc['land_area'] != 0:
             # Population category
-            self.c['population_density'] = self.rc['population'] / self.rc['land_area']
+            c['population_density'] = rc['population'] / rc['land_area']
         else:
-            self.c['population_density'] = 0.0
+            c['population_density'] = 0.0
 
-        if self.rc['population'] != 0:
+        if rc['population'] != 0:
             # Race category - Percentages of the total population
-            self.c['white_alone'] = self.rc['white_alone'] / self.rc['population'] * 100.0
-            self.c['black_alone'] = self.rc['black_alone'] / self.rc['population'] * 100.0
-            self.c['asian_alone'] = self.rc['asian_alone'] / self.rc['population'] * 100.0
-            self.c['other_race'] = self.rc['other_race'] / self.rc['population'] * 100.0
+            c['white_alone'] = rc['white_alone'] / rc['population'] * 100.0
+            c['black_alone'] = rc['black_alone'] / rc['population'] * 100.0
+            c['asian_alone'] = rc['asian_alone'] / rc['population'] * 100.0
+            c['other_race'] = rc['other_race'] / rc['population'] * 100.0
             # Technically not a race, but included in the race category
-            self.c['hispanic_or_latino'] = self.rc['hispanic_or_latino'] / self.rc['population'] * 100.0
-            self.c['white_alone_not_hispanic_or_latino'] = self.rc['white_alone_not_hispanic_or_latino'] / self.rc['population'] * 100.0
-            self.c['italian_alone'] = self.rc['italian_alone'] / self.rc['population'] * 100.0
+            c['hispanic_or_latino'] = rc['hispanic_or_latino'] / rc['population'] * 100.0
+            c['white_alone_not_hispanic_or_latino'] = rc['white_alone_not_hispanic_or_latino'] / rc['population'] * 100.0
+            c['italian_alone'] = rc['italian_alone'] / rc['population'] * 100.0
         else:
             # Race category - Percentages of the total population
-            self.c['white_alone'] = 0.0
-            self.c['black_alone'] = 0.0
-            self.c['asian_alone'] = 0.0
-            self.c['other_race'] = 0.0          # Technically not a race, but included in the race category
-            self.c['hispanic_or_latino'] = 0.0
-            self.c['white_alone_not_hispanic_or_latino'] = 0.0
-            self.c['italian_alone'] = 0.0
-
-        if self.rc['population_25_years_and_older'] != 0 and self.rc['population'] != 0:
+            c['white_alone'] = 0.0
+            c['black_alone'] = 0.0
+            c['asian_alone'] = 0.0
+            c['other_race'] = 0.0          # Technically not a race, but included in the race category
+            c['hispanic_or_latino'] = 0.0
+            c['white_alone_not_hispanic_or_latino'] = 0.0
+            c['italian_alone'] = 0.0
+
+        if rc['population_25_years_and_older'] != 0 and rc['population'] != 0:
             # Education category - Percentages of the population 25 years and older
-            self.c['population_25_years_and_older'] = self.rc['population_25_years_and_older'] / self.rc['population'] * 100.0
-            self.c['bachelors_degree_or_higher'] = self.rc['bachelors_degree_or_higher'] / self.rc['population_25_years_and_older'] * 100.0
-            self.c['graduate_degree_or_higher'] = self.rc['graduate_degree_or_higher'] / self.rc['population_25_years_and_older'] * 100.0
+            c['population_25_years_and_older'] = rc['population_25_years_and_older'] / rc['population'] * 100.0
+            c['bachelors_degree_or_higher'] = rc['bachelors_degree_or_higher'] / rc['population_25_years_and_older'] * 100.0
+            c['graduate_degree_or_higher'] = rc['graduate_degree_or_higher'] / rc['population_25_years_and_older'] * 100.0
         else:
-            self.c['population_25_years_and_older'] = 0.0
-            self.c['bachelors_degree_or_higher'] = 0.0
-            self.c['graduate_degree_or_higher'] = 0.0
+            c['population_25_years_and_older'] = 0.0
+            c['bachelors_degree_or_higher'] = 0.0
+            c['graduate_degree_or_higher'] = 0.0
 
 
         # Income category
@@ -240,26 +286,109 @@ class DemographicProfile:
         # Housing category
         # No compounds for this category
 
-        #######################################################################
-        # Formatted compounds: The result of mathematic operations of raw
-        # components
-        
-        self.fcd = dict()
-
-        for key in self.c.keys():
-            if key == 'population_density':
-                self.fcd[key] = f'{self.c[key]:,.1f}' + '/sqmi'
+        # Store components and compounds compactly, in fixed orders.
+        self.rc_values = array('d', [rc[key] for key in self.rc_keys])
+        self.c_values = array('d', [c[key] for key in self.c_keys])
+
+        # Mappings over the values and display strings are only made when
+        # they are needed. See rc, c, fc and fcd.
+        self.clear_derived()
+
+    def clear_derived(self):
+        '''Clear the slots that are made when needed.'''
+        for slot in self.unpickled_slots:
+            setattr(self, slot, None)
+
+    @property
+    def rc(self):
+        '''Raw components, as a read-only mapping'''
+        if self.rc_view is None:
+            self.rc_view = ValueArray(self.rc_index, self.rc_values,
+                                      self.rc_int_keys, self.rc_whole_keys)
+
+        return self.rc_view
+
+    @property
+    def c(self):
+        '''Compounds, as a read-only mapping'''
+        if self.c_view is None:
+            self.c_view = ValueArray(self.c_index, self.c_values, frozenset())
+
+        return self.c_view
+
+    def format_component(self, key, value):
+        '''Format a component: Thousands seperaters, dollar signs, etc.'''
+        if key not in ['per_capita_income', 'median_year_structure_built',
+            'median_value', 'median_rent', 'land_area',
+            'median_household_income']:
+            return f'{value:,}'
+        elif key not in ['median_year_structure_built', 'land_area']:
+            if key == 'median_household_income' and value == 250001:
+                return '$250,000+'
             else:
-                self.fcd[key] = f'{self.c[key]:,.1f}' + '%'
+                return '$' + f'{value:,}'
+        elif key == 'land_area':
+            return f'{value:,.1f}' + ' sqmi'
+        else:
+            return str(value)
 
-        #######################################################################
-        # Inter-area margin (for display purposes)
-        self.iam = ' '
+    def format_compound(self, key, value):
+        '''Format a compound: a density or a percentage'''
+        if key == 'population_density':
+            return f'{value:,.1f}' + '/sqmi'
+        else:
+            return f'{value:,.1f}' + '%'
+
+    def get_formatted(self):
+        '''
+        Format every component and compound the first time a display string
+        is needed, and keep them for later calls.
+        '''
+        if self.formatted is None:
+            self.formatted = (
+                {key: self.format_component(key, value)
+                 for key, value in self.rc.items()},
+                {key: self.format_compound(key, value)
+                 for key, value in self.c.items()})
+
+        return self.formatted
+
+    @property
+    def fc(self):
+        '''Formatted components'''
+        return self.get_formatted()[0]
+
+    @property
+    def fcd(self):
+        '''Formatted compounds'''
+        return self.get_formatted()[1]
+
+    @property
+    def counties(self):
+        '''County GEOIDs (for places only)'''
+        return self.county_entry[0]
+
+    @property
+    def counties_display(self):
+        '''County names without the state (for places only)'''
+        return self.county_entry[1]
+
+    def __getstate__(self):
+        # Views and display strings are not pickled; they are made again
+        # when needed.
+        return (None, {slot: getattr(self, slot) for slot in self.__slots__
+                       if slot not in self.unpickled_slots})
+
+    def __setstate__(self, state):
+        for slot, value in state[1].items():
+            setattr(self, slot, value)
+
+        self.clear_derived()
 
     def __repr__(self):
         '''Display a representation of the DemographicProfile class'''
         return "DemographicProfile(name='%s', counties=%s)" % (self.name,
-                self.counties)
+                list(self.counties))
 
     def dp_full_row_str(self, content):
         '''Return a line with just one string'''
@@ -0,0 +1,196 @@
+'''
+A similarity index for GeoVectors. The weighted subcomponents of every
+GeoVector are held in a dense float32 matrix for each mode ('std' and 'app'),
+and a KD-tree is built for each (summary level, mode) so that the most
+demographically similar geographies can be found without computing the
+distance to every GeoVector.
+
+Distances are the same Euclidean distances as GeoVector.distance().
+'''
+
+from datainterface.ColumnStore import rank_indices
+
+from scipy.spatial import cKDTree
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+def nearest_block(matrix, query_ids, ids, k):
+    '''
+    For each position in query_ids, find the k nearest rows of matrix among
+    positions ids, excluding the query itself. Distances for the whole block
+    are computed at once, so memory use is len(query_ids) * len(ids) floats.
+
+    Returns a list of (query position, neighbour positions, distances).
+    '''
+    queries = matrix[query_ids].astype(np.float64)
+    candidates = matrix[ids].astype(np.float64)
+
+    # |a - b|^2 = |a|^2 + |b|^2 - 2ab
+    squared = (queries * queries).sum(axis=1)[:, None] \
+        + (candidates * candidates).sum(axis=1)[None, :] \
+        - 2 * (queries @ candidates.T)
+    np.maximum(squared, 0, out=squared)
+
+    # One extra, since the query is usually among its own candidates.
+    kk = min(k + 1, len(ids))
+    kth = np.partition(squared, kk - 1, axis=1)[:, kk - 1]
+
+    results = []
+
+    for row, query_id in enumerate(query_ids):
+        # Everything at or within the kth distance, ranked with ties kept in
+        # position order (as in GeoVectorIndex.rank())
+        within = np.flatnonzero(squared[row] <= kth[row])
+        within = within[np.argsort(squared[row][within], kind='stable')]
+        within = within[ids[within] != query_id][:k]
+
+        results.append((query_id, ids[within], np.sqrt(squared[row][within])))
+
+    return results
+
+# Matrix shared by the processes used by GeoVectorIndex.all_nearest()
+_worker_matrix = None
+
+def _init_worker(matrix):
+    global _worker_matrix
+    _worker_matrix = matrix
+
+def _nearest_block_worker(args):
+    return nearest_block(_worker_matrix, *args)
+
+class GeoVectorIndex:
+    '''Matrices and KD-trees of GeoVector weighted subcomponents.'''
+    modes = ['std', 'app']
+
+    def __init__(self, matrices, sumlevels, sumlevel_ids, trees):
+        self.matrices = matrices
+        self.sumlevels = sumlevels
+        self.sumlevel_ids = sumlevel_ids
+        self.trees = trees
+
+    @classmethod
+    def from_geovectors(cls, gv_instances):
+        '''Build the index from a list of GeoVectors.'''
+        fetch_one = gv_instances[0]
+        matrices = dict()
+
+        for mode in cls.modes:
+            keys = list(fetch_one.ws[mode].keys())
+            matrices[mode] = np.array(
+                [[gv.ws[mode][key] for key in keys] for gv in gv_instances])
+
+        return cls.from_matrices(matrices, [gv.sumlevel for gv in gv_instances])
+
+    @classmethod
+    def from_matrices(cls, matrices, sumlevels):
+        '''
+        Build the index from weighted subcomponent matrices for each mode
+        (e.g. from GeoVectorScorer.weighted()) and the summary level of each
+        row.
+        '''
+        matrices = {mode: np.asarray(matrices[mode], dtype=np.float32)
+                    for mode in cls.modes}
+        sumlevels = np.array(sumlevels, dtype=str)
+        sumlevel_ids = dict()
+        trees = dict()
+
+        for sumlevel in map(str, np.unique(sumlevels)):
+            ids = np.flatnonzero(sumlevels == sumlevel).astype(np.int32)
+            sumlevel_ids[sumlevel] = ids
+
+            for mode in cls.modes:
+                trees[(sumlevel, mode)] = cKDTree(matrices[mode][ids])
+
+        return cls(matrices, sumlevels, sumlevel_ids, trees)
+
+    def vector(self, idx, mode='std'):
+        '''Weighted subcomponents of the GeoVector at position idx'''
+        return self.matrices[mode][idx].astype(np.float64)
+
+    def distances(self, vector, ids, mode='std'):
+        '''Distances from vector to the GeoVectors at positions ids'''
+        diffs = self.matrices[mode][ids].astype(np.float64) - vector
+        return np.sqrt((diffs * diffs).sum(axis=1))
+
+    def rank(self, vector, ids, mode='std', n=10):
+        '''
+        Positions in ids ranked by distance from vector, nearest first. Ties
+        keep the order of ids. If n is 0 or None, every position is ranked.
+        '''
+        distances = self.distances(vector, ids, mode)
+        mask = np.ones(len(ids), dtype=bool)
+        return ids[rank_indices(distances, mask, n=n, lowest=True)]
+
+    def nearest(self, idx, mode='std', n=10, ids=None):
+        '''
+        Get the positions of the n GeoVectors nearest to the one at position
+        idx, nearest first. By default, GeoVectors with the same summary
+        level are searched with a KD-tree; otherwise, only positions in ids
+        are considered.
+        '''
+        vector = self.vector(idx, mode)
+
+        if ids is not None or not n:
+            if ids is None:
+                ids = self.sumlevel_ids[self.sumlevels[idx]]
+            return self.rank(vector, ids, mode, n)
+
+        sumlevel = self.sumlevels[idx]
+        sumlevel_ids = self.sumlevel_ids[sumlevel]
+        tree = self.trees[(sumlevel, mode)]
+
+        # Find the distance to the nth nearest GeoVector, then everything
+        # within that distance, so that ties are ranked as in sorted().
+        k = min(n, len(sumlevel_ids))
+        distances, _ = tree.query(vector, k=k)
+        radius = np.max(distances)
+        within = tree.query_ball_point(vector, radius + 1e-6)
+
+        return self.rank(vector, sumlevel_ids[np.sort(within)], mode, n)
+
+    def all_nearest(self, ids=None, mode='std', k=25, chunk_size=256, jobs=1):
+        '''
+        Generate (position, neighbour positions, distances) with the k
+        nearest neighbours of every GeoVector, excluding itself.
+
+        If ids is None, each GeoVector is compared with GeoVectors of the
+        same summary level. Otherwise, GeoVectors at positions ids are
+        compared with each other. Work is done chunk_size queries at a time,
+        optionally across jobs processes.
+        '''
+        if ids is None:
+            groups = list(self.sumlevel_ids.values())
+        else:
+            groups = [np.asarray(ids)]
+
+        tasks = [(group[start:start + chunk_size], group, k)
+                 for group in groups
+                 for start in range(0, len(group), chunk_size)]
+
+        matrix = self.matrices[mode]
+
+        if jobs > 1:
+            # Blocks are submitted a few at a time, so that results waiting
+            # to be yielded stay bounded however many blocks there are.
+            with ProcessPoolExecutor(max_workers=jobs,
+                                     initializer=_init_worker,
+                                     initargs=(np.asarray(matrix),)) as pool:
+                pending = deque()
+
+                for task in tasks:
+                    pending.append(pool.submit(_nearest_block_worker, task))
+
+                    if len(pending) >= 2 * jobs:
+                        yield from pending.popleft().result()
+
+                while pending:
+                    yield from pending.popleft().result()
+        else:
+            for task in tasks:
+                yield from nearest_block(matrix, *task)
+
+    def __repr__(self):
+        return 'GeoVectorIndex(rows=%s, sumlevels=%s)' % (
+            len(self.sumlevels), list(self.sumlevel_ids.keys()))
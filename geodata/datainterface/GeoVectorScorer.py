@@ -0,0 +1,172 @@
+'''
+Vectorized GeoVector scoring. Raw subcomponents, scores and weighted
+subcomponents are computed from columns of the geodata table: for every
+geography at once when data products are created, or for a single row by
+GeoVector.__init__().
+
+Median and standard deviation reference values are the same for every
+GeoVector, so they are computed once per GeoVectorScorer.
+'''
+
+from tools.geodata_safedivision import gdsd
+from tools.geodata_typecast import gdti, gdtf
+
+import numpy as np
+
+class GeoVectorScorer:
+    '''Scores GeoVectors given medians and standard deviations.'''
+    # geodata columns that GeoVectors need. Geographies missing any of them
+    # don't get GeoVectors.
+    columns = ['B01003_1', 'ALAND_SQMI', 'B19301_1', 'B02001_2', 'B02001_3',
+               'B02001_5', 'B03002_12', 'B15003_1', 'B15003_22', 'B15003_23',
+               'B15003_24', 'B15003_25', 'B25035_1']
+
+    # Values of B25035_1 (median year structure built) that mean there is no
+    # data. They are left out of medians and extreme values as well.
+    missing_years = (0, 18)
+
+    # Subcomponents, in the order of GeoVector.rs
+    subcomponents = ['population_density', 'per_capita_income',
+                     'white_alone', 'black_alone', 'asian_alone',
+                     'hispanic_or_latino', 'bachelors_degree_or_higher',
+                     'graduate_degree_or_higher', 'median_year_structure_built']
+
+    # Weights of the subcomponents in each mode, in the order of GeoVector.ws.
+    # Weighted subcomponents are the ones used in distance calculations.
+    # Groups of them make up each component:
+    #
+    #   Population density: population density (100%), both modes
+    #   Income: per capita income (100%), both modes
+    #   Race: white, black and Asian alone, and Hispanic or Latino (25% each),
+    #     standard mode only. (Hispanic or Latino is not a race as far as the
+    #     Census is concerned, but it makes up 25% of this component.)
+    #   Education: bachelor's and graduate degree or higher (50% each),
+    #     standard mode only
+    #   Median year structure built (100%), appearance mode only
+    weights = {
+        'std': {
+            'population_density':           1,
+            'per_capita_income':            1,
+            'white_alone':                  4,
+            'black_alone':                  4,
+            'asian_alone':                  4,
+            'hispanic_or_latino':           4,
+            'bachelors_degree_or_higher':   2,
+            'graduate_degree_or_higher':    2,
+            },
+        'app': {
+            'population_density':           1,
+            'per_capita_income':            1,
+            'median_year_structure_built':  1,
+            },
+        }
+
+    def __init__(self, medians, standard_deviations):
+        self.med = self.reference_values(medians)
+        self.sd = self.reference_values(standard_deviations)
+
+        # Standard deviations of years aren't offset.
+        self.sd['median_year_structure_built'] += 1939
+
+    def reference_values(self, stats):
+        '''
+        Subcomponent values for medians or standard deviations. (B03002_12
+        is used for asian_alone here, as it always has been.)
+        '''
+        def ratio(dividend, divisor):
+            return gdsd(float(stats[dividend]), float(stats[divisor]))
+
+        return {
+            'population_density': ratio('B01003_1', 'ALAND_SQMI'),
+            'per_capita_income': gdtf(stats['B19301_1']),
+            'white_alone': ratio('B02001_2', 'B01003_1') * 100.0,
+            'black_alone': ratio('B02001_3', 'B01003_1') * 100.0,
+            'asian_alone': ratio('B03002_12', 'B01003_1') * 100.0,
+            'hispanic_or_latino': ratio('B03002_12', 'B01003_1') * 100.0,
+            'bachelors_degree_or_higher': gdsd(
+                  gdti(stats['B15003_22']) + gdti(stats['B15003_23'])
+                + gdti(stats['B15003_24']) + gdti(stats['B15003_25']),
+                float(stats['B15003_1'])) * 100.0,
+            'graduate_degree_or_higher': gdsd(
+                  gdti(stats['B15003_23']) + gdti(stats['B15003_24'])
+                + gdti(stats['B15003_25']),
+                float(stats['B15003_1'])) * 100.0,
+            'median_year_structure_built': gdtf(stats['B25035_1']) - 1939,
+            }
+
+    def valid(self, columns):
+        '''
+        Boolean array that is True for rows that have every column needed
+        for a GeoVector. columns maps names to float arrays.
+        '''
+        return ~np.any([np.isnan(columns[column]) for column in self.columns],
+                       axis=0)
+
+    def raw_subcomponents(self, columns):
+        '''Raw subcomponents for every row, as a (rows, subcomponents) matrix.'''
+        def ratio(dividend, divisor):
+            # As gdsd() does, return 0 where the divisor is 0.
+            with np.errstate(divide='ignore', invalid='ignore'):
+                return np.where(divisor == 0, 0.0, dividend / divisor)
+
+        population = columns['B01003_1']
+        years = np.where(np.isin(columns['B25035_1'], self.missing_years),
+                         np.nan, columns['B25035_1'])
+        degrees = columns['B15003_23'] + columns['B15003_24'] \
+            + columns['B15003_25']
+
+        return np.column_stack([
+            ratio(population, columns['ALAND_SQMI']),
+            columns['B19301_1'],
+            ratio(columns['B02001_2'], population) * 100.0,
+            ratio(columns['B02001_3'], population) * 100.0,
+            ratio(columns['B02001_5'], population) * 100.0,
+            ratio(columns['B03002_12'], population) * 100.0,
+            ratio(columns['B15003_22'] + degrees, columns['B15003_1']) * 100.0,
+            ratio(degrees, columns['B15003_1']) * 100.0,
+            years - 1939,
+            ])
+
+    def scores(self, rs):
+        '''
+        Scores for a matrix of raw subcomponents: proportional from 0 to 50
+        below the median, 50 at the median, proportional from 50 to 100 up
+        to three standard deviations above it, and 100 otherwise (including
+        for numpy.nan, e.g. a missing year). Scores are kept from 0 to 100.
+        '''
+        med = np.array([self.med[sc] for sc in self.subcomponents])
+        sd3 = np.array([self.sd[sc] for sc in self.subcomponents]) * 3
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            below = np.rint((rs / med) * 50)
+            above = np.rint(50 + ((rs - med) / sd3) * 50)
+
+            scores = np.select(
+                [rs < med, rs == med, (rs > med) & (rs < med + sd3)],
+                [below, 50, above], default=100)
+
+        return np.clip(scores, 0, 100).astype(np.int64)
+
+    def weighted(self, scores):
+        '''Weighted subcomponent matrices for each mode, from scores.'''
+        matrices = dict()
+
+        for mode, weights in self.weights.items():
+            matrices[mode] = np.column_stack(
+                [scores[:, self.subcomponents.index(sc)] / weight
+                 for sc, weight in weights.items()])
+
+        return matrices
+
+    def subcomponents_for(self, idx, rs, scores, weighted):
+        '''
+        Get GeoVector.rs, GeoVector.s and GeoVector.ws dictionaries for row
+        idx of the matrices from raw_subcomponents(), scores() and
+        weighted().
+        '''
+        return (
+            dict(zip(self.subcomponents, rs[idx].tolist())),
+            dict(zip(self.subcomponents, scores[idx].tolist())),
+            {mode: dict(zip(weights, weighted[mode][idx].tolist()))
+             for mode, weights in self.weights.items()},
+            )
@@ -0,0 +1,93 @@
+'''
+DemographicProfiles pickled one at a time into a single file, so that loading
+them doesn't unpickle every profile. The file is memory-mapped, and each
+profile is unpickled the first time it is used.
+
+Position i holds the DemographicProfile at position i in the
+demographicprofiles data product (and in the ColumnStore). The pickle for
+position i is data[offsets[i]:offsets[i + 1]].
+'''
+
+import numpy as np
+import operator
+import pickle
+
+from collections.abc import Sequence
+from pathlib import Path
+
+class ProfileStore(Sequence):
+    '''A read-only list of DemographicProfiles, unpickled when used.'''
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+        # Profiles unpickled so far, by position
+        self.loaded = dict()
+
+    @staticmethod
+    def save(dpi_instances, path):
+        '''Save DemographicProfiles to the directory path.'''
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        # Replace the files rather than rewrite them, so that profiles
+        # already mapped from a previous build are left intact.
+        for name in ['profiles.pickles', 'offsets.npy']:
+            (path / name).unlink(missing_ok=True)
+
+        offsets = [0]
+
+        with open(path / 'profiles.pickles', 'wb') as f:
+            for dpi in dpi_instances:
+                offsets.append(offsets[-1] + f.write(
+                    pickle.dumps(dpi, protocol=pickle.HIGHEST_PROTOCOL)))
+
+        np.save(path / 'offsets.npy', np.array(offsets, dtype=np.int64))
+
+    @classmethod
+    def exists(cls, path):
+        '''Determine whether profiles are saved at path.'''
+        path = Path(path)
+        return (path / 'profiles.pickles').is_file() \
+            and (path / 'offsets.npy').is_file()
+
+    @classmethod
+    def load(cls, path):
+        '''Load profiles saved by save(), memory-mapped.'''
+        path = Path(path)
+        offsets = np.load(path / 'offsets.npy', mmap_mode='r')
+
+        # Empty files can't be memory-mapped.
+        if offsets[-1] == 0:
+            data = b''
+        else:
+            data = np.memmap(path / 'profiles.pickles', dtype=np.uint8,
+                             mode='r')
+
+        return cls(data, offsets)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[x] for x in range(*idx.indices(len(self)))]
+
+        idx = operator.index(idx)
+
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError('profile index out of range')
+
+        dpi = self.loaded.get(idx)
+
+        if dpi is None:
+            dpi = pickle.loads(
+                self.data[self.offsets[idx]:self.offsets[idx + 1]])
+            self.loaded[idx] = dpi
+
+        return dpi
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __repr__(self):
+        return 'ProfileStore(profiles=%s, loaded=%s)' % (len(self),
+                                                         len(self.loaded))
@@ -0,0 +1,207 @@
+'''
+An on-disk SQLite copy of the geodata table, for answering queries without
+loading every DemographicProfile.
+
+Row id i of the geodata table is the DemographicProfile at position i in the
+demographicprofiles data product. Besides the columns of the in-memory
+geodata table that DemographicProfiles are made from, each row has a REAL
+column for every ColumnStore array (named as in ColumnStore, e.g.
+"c.population_density"), so that contexts and geofilters can be evaluated
+with indexed SQL. The counties table maps places to county GEOIDs.
+
+The database is loaded in WAL mode, then switched back to a rollback journal
+once it is complete, so that read-only connections (from any number of
+processes) don't need to create -wal or -shm files next to it.
+'''
+
+from datainterface.DemographicProfile import DemographicProfile
+
+from pathlib import Path
+
+import math
+import os
+import sqlite3
+
+def quote(column):
+    '''Quote an SQL identifier.'''
+    return '"%s"' % column.replace('"', '""')
+
+class SQLiteStore:
+    '''A read-only connection to an on-disk geodata database.'''
+    # Columns of the geodata table that are indexed
+    indexed_columns = ['GEOID', 'NAME', 'SUMLEVEL', 'STUSAB']
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+        # Connections can't be shared with child processes, so each process
+        # opens its own.
+        self.pid = None
+        self.conn = None
+
+        self.columns = None
+
+    @classmethod
+    def create(cls, path, column_defs, rows, columns, counties,
+               page_size=8192):
+        '''
+        Write a database to path. rows are rows of the geodata table (without
+        ids) with column definitions column_defs, aligned with columns (a
+        ColumnStore) and counties (lists of county GEOIDs).
+        '''
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Start from an empty file, since page_size can't be changed in WAL
+        # mode.
+        for suffix in ['', '-wal', '-shm']:
+            this_path = path.with_name(path.name + suffix)
+            if this_path.exists():
+                this_path.unlink()
+
+        conn = sqlite3.connect(path)
+        c = conn.cursor()
+
+        c.execute('PRAGMA page_size = %d' % page_size)
+        c.execute('PRAGMA journal_mode = WAL')
+
+        # geodata
+        value_keys = [key for key in columns.arrays.keys()
+                      if key not in columns.labels]
+        column_defs = ['id INTEGER PRIMARY KEY'] + list(column_defs) \
+            + [quote(x) + ' REAL' for x in value_keys]
+
+        c.execute('CREATE TABLE geodata (%s)' % ', '.join(column_defs))
+
+        values = [columns.arrays[key].tolist() for key in value_keys]
+
+        def geodata_rows():
+            for idx, row in enumerate(rows):
+                # NaN is stored as NULL.
+                yield [idx] + list(row) + [
+                    None if math.isnan(value[idx]) else value[idx]
+                    for value in values]
+
+        c.executemany('INSERT INTO geodata VALUES (%s)'
+                      % ', '.join(['?'] * len(column_defs)), geodata_rows())
+
+        # counties
+        c.execute('CREATE TABLE counties (id INTEGER, county_geoid TEXT)')
+        c.executemany('INSERT INTO counties VALUES (?, ?)',
+                      ((idx, county_geoid)
+                       for idx, county_geoids in enumerate(counties)
+                       for county_geoid in county_geoids))
+
+        # Indexes are created after the rows are inserted.
+        for column in cls.indexed_columns:
+            c.execute('CREATE INDEX geodata_%s ON geodata(%s)'
+                      % (column.lower(), quote(column)))
+        c.execute('CREATE INDEX counties_county_geoid ON counties(county_geoid)')
+
+        conn.commit()
+        c.execute('ANALYZE')
+        # Leaving WAL mode checkpoints and removes the -wal and -shm files.
+        c.execute('PRAGMA journal_mode = DELETE')
+        conn.close()
+
+    def connect(self):
+        '''Get this process's read-only connection.'''
+        if self.conn is None or self.pid != os.getpid():
+            self.conn = sqlite3.connect(
+                'file:%s?mode=ro' % self.path.resolve().as_posix(), uri=True)
+            self.conn.row_factory = sqlite3.Row
+            self.pid = os.getpid()
+
+        return self.conn
+
+    def execute(self, sql, params=()):
+        return self.connect().execute(sql, params)
+
+    def has(self, comp, data_type):
+        '''Determine whether there is a column for a component or compound.'''
+        if self.columns is None:
+            self.columns = {row['name'] for row in
+                            self.execute('PRAGMA table_info(geodata)')}
+
+        return self.key(comp, data_type) in self.columns
+
+    @staticmethod
+    def key(comp, data_type):
+        '''Name of the column for a component ('rc') or compound ('c').'''
+        return data_type + '.' + comp
+
+    def column(self, comp, data_type):
+        '''Quoted column for a component or compound'''
+        return quote(self.key(comp, data_type))
+
+    def where(self, universe_sl=None, group_sl=None, group=None,
+              geofilter=None):
+        '''
+        Get an SQL WHERE condition for a context unpacked by
+        SummaryLevelTools.unpack_context() (with county groups given as
+        GEOIDs) and a compiled Geofilter, and its parameters.
+        '''
+        conditions = []
+        params = []
+
+        # Filter by summary level
+        if universe_sl:
+            conditions.append('SUMLEVEL = ?')
+            params.append(universe_sl)
+
+        # Filter by group summary level
+        if group_sl == '050':
+            conditions.append(
+                'id IN (SELECT id FROM counties WHERE county_geoid = ?)')
+            params.append(group)
+        elif group_sl == '040':
+            conditions.append('STUSAB = ?')
+            params.append(group)
+        elif group_sl == '860':
+            # GLOB is case sensitive, so it can use the NAME index.
+            conditions.append('NAME GLOB ?')
+            params.append('ZCTA5 ' + group + '*')
+
+        if geofilter:
+            condition, geofilter_params = geofilter.where(
+                lambda x: self.column(x.comp,
+                                      x.filter_by(self.has(x.comp, 'c'))))
+            conditions.append(condition)
+            params += geofilter_params
+
+        if not conditions:
+            return ('1', params)
+
+        return (' AND '.join(conditions), params)
+
+    def ids(self, where='1', params=(), order_by='id', n=None):
+        '''Get positions of rows that match an SQL WHERE condition.'''
+        sql = 'SELECT id FROM geodata WHERE %s ORDER BY %s' % (where, order_by)
+
+        if n:
+            sql += ' LIMIT %d' % n
+
+        return [row[0] for row in self.execute(sql, params)]
+
+    def get_profiles(self, ids):
+        '''Get the DemographicProfiles at positions ids, in that order.'''
+        profiles = dict()
+        ids = list(ids)
+
+        # Stay below SQLite's limit on the number of parameters.
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+
+            for row in self.execute('SELECT * FROM geodata WHERE id IN (%s)'
+                                    % ', '.join(['?'] * len(chunk)), chunk):
+                profiles[row['id']] = DemographicProfile(row)
+
+        return [profiles[idx] for idx in ids]
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __repr__(self):
+        return 'SQLiteStore(%r)' % str(self.path)
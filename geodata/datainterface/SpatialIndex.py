@@ -0,0 +1,134 @@
+'''
+A spatial index for DemographicProfiles, built from their internal points
+(INTPTLAT and INTPTLONG).
+
+Points are stored as unit vectors in a KD-tree. The straight-line (chord)
+distance between unit vectors increases with the great-circle distance, so
+nearest neighbours in the tree are also nearest on the globe. Candidates
+found with the tree are then measured with the haversine formula.
+'''
+
+from scipy.spatial import cKDTree
+
+import numpy as np
+
+# Mean radius of the Earth
+EARTH_RADIUS_MI = 3958.7613
+EARTH_RADIUS_KM = 6371.0088
+
+def earth_radius(kilometers=False):
+    '''Mean radius of the Earth in miles (or kilometers)'''
+    return EARTH_RADIUS_KM if kilometers else EARTH_RADIUS_MI
+
+def to_xyz(latitudes, longitudes):
+    '''Convert latitudes and longitudes in degrees to unit vectors.'''
+    latitudes = np.radians(latitudes)
+    longitudes = np.radians(longitudes)
+
+    return np.stack((np.cos(latitudes) * np.cos(longitudes),
+                     np.cos(latitudes) * np.sin(longitudes),
+                     np.sin(latitudes)), axis=-1)
+
+def haversine(lat1, lon1, lat2, lon2, kilometers=False):
+    '''Great-circle distances in miles (or kilometers), vectorized.'''
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 \
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+
+    return 2 * earth_radius(kilometers) * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+class SpatialIndex:
+    '''KD-tree of the internal points of DemographicProfiles.'''
+    def __init__(self, size, ids, latitudes, longitudes, tree):
+        self.size = size
+        self.ids = ids
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.tree = tree
+
+    @classmethod
+    def from_columns(cls, columns):
+        '''Build the index from a ColumnStore.'''
+        latitudes = np.asarray(columns.column('latitude', 'rc'))
+        longitudes = np.asarray(columns.column('longitude', 'rc'))
+
+        # Geographies without coordinates can't be indexed.
+        ids = np.flatnonzero(~np.isnan(latitudes) & ~np.isnan(longitudes))
+        ids = ids.astype(np.int32)
+        tree = cKDTree(to_xyz(latitudes[ids], longitudes[ids]))
+
+        return cls(len(columns), ids, latitudes, longitudes, tree)
+
+    def distances(self, lat, lon, ids, kilometers=False):
+        '''Haversine distances from (lat, lon) to positions ids'''
+        return haversine(lat, lon, self.latitudes[ids], self.longitudes[ids],
+                         kilometers)
+
+    def within(self, lat, lon, radius, mask=None, kilometers=False):
+        '''
+        Get positions within radius miles (or kilometers) of (lat, lon), and
+        their distances, nearest first. If mask is given, only positions where
+        it is True are returned.
+        '''
+        # Chord length for the radius, with a little slack for rounding
+        angle = min(radius / earth_radius(kilometers), np.pi)
+        chord = 2 * np.sin(angle / 2) + 1e-9
+
+        locs = self.tree.query_ball_point(to_xyz(lat, lon), chord)
+        ids = np.sort(self.ids[np.asarray(locs, dtype=np.intp)])
+
+        if mask is not None:
+            ids = ids[mask[ids]]
+
+        distances = self.distances(lat, lon, ids, kilometers)
+        keep = distances <= radius
+        ids = ids[keep]
+        distances = distances[keep]
+
+        order = np.argsort(distances, kind='stable')
+        return (ids[order], distances[order])
+
+    def nearest(self, lat, lon, n=10, mask=None, margin=0.0,
+                kilometers=False):
+        '''
+        Get the n positions nearest to (lat, lon) where mask is True, and
+        their distances, nearest first. Positions up to (1 + margin) times
+        the nth distance are included as well, so that callers can rerank
+        with a more exact distance.
+        '''
+        # Nothing to find
+        if n <= 0 or len(self.ids) == 0:
+            return (self.ids[:0], np.array([]))
+
+        if mask is None:
+            mask = np.ones(self.size, dtype=bool)
+
+        point = to_xyz(lat, lon)
+        k = min(n * 4 + 16, len(self.ids))
+
+        # Ask the tree for more neighbours until n of them are in the mask.
+        while k > 0:
+            _, locs = self.tree.query(point, k=k)
+            locs = np.atleast_1d(locs)
+            found = self.ids[locs[locs < len(self.ids)]]
+            found = found[mask[found]]
+
+            if len(found) >= n or k >= len(self.ids):
+                break
+
+            k = min(k * 4, len(self.ids))
+        else:
+            found = self.ids[:0]
+
+        # No positions in the mask
+        if len(found) == 0:
+            return (found, np.array([]))
+
+        nth = self.distances(lat, lon, found[:n], kilometers).max()
+
+        return self.within(lat, lon, nth * (1 + margin), mask=mask,
+                           kilometers=kilometers)
+
+    def __repr__(self):
+        return 'SpatialIndex(size=%s, indexed=%s)' % (self.size, len(self.ids))
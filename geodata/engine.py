@@ -1,4 +1,7 @@
 from database.Database import Database
+from datainterface.ColumnStore import ColumnStore
+from datainterface.ProfileStore import ProfileStore
+from datainterface.SQLiteStore import SQLiteStore
 from pathlib import Path
 
 import argparse
@@ -11,40 +14,106 @@ import geopy.distance
 
 from tools.geodata_typecast import gdt, gdtf, gdti
 
-from tools.CountyTools import CountyTools
+from tools.CountyTools import CountyTools, save_lookup
 from tools.StateTools import StateTools
 from tools.KeyTools import KeyTools
 from tools.SummaryLevelTools import SummaryLevelTools
+from tools.GeofilterTools import GeofilterTools
 
 from math import sin, cos, sqrt, atan2, radians
 
 from rapidfuzz import fuzz
 
+# Loaded data products, shared by every Engine in the process. Keyed by the
+# path of the data product file; each value is a tuple of (signature,
+# products), where signature comes from data_products_signature(), so that a
+# rewritten file, columns directory or profiles directory is noticed.
+_data_products_cache = dict()
+
 class Engine:
-    def __init__(self):
+    def __init__(self, preload=False):
         self.ct = CountyTools()
         self.st = StateTools()
         self.kt = KeyTools()
         self.slt = SummaryLevelTools()
+        self.gft = GeofilterTools()
 
         self.PROJECT_ROOT = Path(__file__).resolve().parents[1]
-            
-    def create_data_products(self, data_path):
-        '''Generate and save data products.'''
-        d = Database(data_path)
-        database_path = self.PROJECT_ROOT / 'bin' / 'default.geodata'
+
+        # Warm the cache now instead of on the first query.
+        if preload:
+            self.warm()
+
+    @property
+    def database_path(self):
+        '''Path to the default data product file.'''
+        return self.PROJECT_ROOT / 'bin' / 'default.geodata'
+
+    @property
+    def columns_path(self):
+        '''Path to the directory holding columnar data products.'''
+        return self.PROJECT_ROOT / 'bin' / 'default.columns'
+
+    @property
+    def profiles_path(self):
+        '''Path to the directory holding the DemographicProfiles.'''
+        return self.PROJECT_ROOT / 'bin' / 'default.profiles'
+
+    @property
+    def counties_path(self):
+        '''Path to the directory holding the packed county lookup.'''
+        return self.PROJECT_ROOT / 'bin' / 'default.counties'
+
+    @property
+    def sqlite_path(self):
+        '''Path to the on-disk SQLite database.'''
+        return self.PROJECT_ROOT / 'bin' / 'default.sqlite'
+
+    @property
+    def d(self):
+        '''Shortcut for the loaded data products.'''
+        return self.get_data_products()
+
+    def create_data_products(self, data_path, jobs=1, cache_dir=None, sqlite=False, bulk=False):
+        '''
+        Generate and save data products. Files are parsed in jobs worker
+        processes. If cache_dir is given, intermediate products are cached
+        there so that later builds only redo stages whose inputs changed. If
+        sqlite is True, also write the on-disk database used by SQLiteEngine.
+        If bulk is True, SQLite is tuned for loading while the build runs.
+        '''
+        # Pack the county lookup first, so that the build uses it too.
+        save_lookup(self.counties_path)
+
+        d = Database(data_path, jobs=jobs, cache_dir=cache_dir, bulk=bulk)
+        database_path = self.database_path
 
         # Ensure the directory exists
         database_path.parent.mkdir(parents=True, exist_ok=True)
 
+        # Write the columns and profiles first so that they are never older
+        # than the pickled products they are aligned with. The profiles are
+        # saved on their own so that loading doesn't unpickle all of them.
+        d.get_columns().save(self.columns_path)
+
+        products = dict(d.get_products())
+        ProfileStore.save(products.pop('demographicprofiles'),
+                          self.profiles_path)
+
         with(database_path.open('wb')) as f:
-            pickle.dump(d.get_products(), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(products, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        if sqlite:
+            d.save_sqlite(self.sqlite_path)
+
+        # Drop anything loaded from the previous file.
+        _data_products_cache.pop(str(database_path), None)
 
         print('Data product write completed.')
 
     def load_data_products(self):
         '''Load data products.'''
-        database_path = self.PROJECT_ROOT / 'bin' / 'default.geodata'
+        database_path = self.database_path
 
         error = '(unknown)' # In case an error doesn't get assigned.
 
@@ -64,8 +133,95 @@ class Engine:
         except Exception as e:
             error = f"unexpected error: {e!r}"
 
+    def load_columns(self, products):
+        '''
+        Load columnar data products, memory-mapped. Data products made before
+        columns were saved separately have no columns directory; columns
+        are then built from the DemographicProfiles in products.
+        '''
+        if not self.columns_path.is_dir():
+            print('Note: %s not found. Building columns from the profiles; '
+                  'rebuild with createdb to save them.' % self.columns_path)
+            return ColumnStore.from_demographicprofiles(
+                products['demographicprofiles'])
+
+        return ColumnStore.load(self.columns_path, mmap_mode='r')
+
+    def load_profiles(self):
+        '''
+        Load the DemographicProfiles saved apart from the other data
+        products. They are memory-mapped and each one is unpickled only when
+        it is used.
+        '''
+        if not ProfileStore.exists(self.profiles_path):
+            raise FileNotFoundError('%s not found. Rebuild the data products '
+                                    'with createdb.' % self.profiles_path)
+
+        return ProfileStore.load(self.profiles_path)
+
+    def data_products_signature(self):
+        '''
+        Get (st_mtime_ns, st_size) of the data product file and st_mtime_ns
+        of the columns and profiles directories (or None for a directory
+        that doesn't exist). ColumnStore and ProfileStore replace every file
+        when they save, so the directories' modification times change
+        whenever they are rebuilt.
+        '''
+        stat = self.database_path.stat()
+        mtimes = []
+
+        for path in [self.columns_path, self.profiles_path]:
+            try:
+                mtimes.append(path.stat().st_mtime_ns)
+            except FileNotFoundError:
+                mtimes.append(None)
+
+        return (stat.st_mtime_ns, stat.st_size, *mtimes)
+
     def get_data_products(self):
-        return self.load_data_products()
+        '''
+        Return the data products, loading them only if they are not cached or
+        the file or the columns have changed since they were loaded.
+        '''
+        key = str(self.database_path)
+
+        try:
+            signature = self.data_products_signature()
+        except FileNotFoundError:
+            _data_products_cache.pop(key, None)
+            return self.load_data_products()
+
+        cached = _data_products_cache.get(key)
+
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        products = self.load_data_products()
+
+        # Don't cache failed loads so that the next query tries again.
+        if products is not None:
+            # Data products made before the profiles were saved separately
+            # still have them in the pickle.
+            if 'demographicprofiles' not in products:
+                products['demographicprofiles'] = self.load_profiles()
+
+            products['columns'] = self.load_columns(products)
+            _data_products_cache[key] = (signature, products)
+
+        return products
+
+    def reload(self):
+        '''Discard cached data products and load them again.'''
+        _data_products_cache.pop(str(self.database_path), None)
+        return self.get_data_products()
+
+    def warm(self):
+        '''Load data products into the cache ahead of the first query.'''
+        return self.get_data_products()
+
+    def get_columns(self):
+        '''Return the ColumnStore aligned with the DemographicProfiles.'''
+        return self.get_data_products()['columns']
 
     def get_data_types(self, comp, data_type, fetch_one):
         '''
@@ -95,132 +251,248 @@ class Engine:
         return (sort_by, print_)
 
     def context_filter(self, input_instances, context, geofilter, gv=False):
-        '''Filters instances and leaves those that match the context.'''
-        universe_sl, group_sl, group = self.slt.unpack_context(context)
-        instances = input_instances
-        fetch_one = instances[0]
-
-        # Filter by summary level
-        if universe_sl:
-            instances \
-                = list(filter(lambda x: x.sumlevel == universe_sl, instances))
-
-        # Filter by group summary level
-        if group_sl == '050':
-            key = 'us:' + group + '/county'
-            county_name = self.kt.key_to_county_name[key]
-            county_geoid = self.ct.county_name_to_geoid[county_name]
-
-            instances = list(filter(lambda x: county_geoid in x.counties,
-                                    instances))
-        elif group_sl == '040':
-            instances = list(filter(lambda x: x.state == group, instances))
-        elif group_sl == '860':
-            instances = list(filter(lambda x: x.name.startswith('ZCTA5 ' + group),
-                                    instances))
-
-        # Filtering
-        if geofilter:
-            # Convert pipe-delimited criteria string to a list of criteria
-            filter_criteria = geofilter.split('+')
-            # Covert list of criteria to lists of lists
-            filter_criteria = map(lambda x: x.split(':'), filter_criteria)
-
-            for filter_criterium in filter_criteria:
-                # Determine if a data_type was specified
-                if len(filter_criterium) == 4:
-                    # If so, set the data_type
-                    data_type = filter_criterium[3]
-                else:
-                    # Otherwise, set it to false
-                    data_type = False
-
-                comp = filter_criterium[0]
-                filter_by, print_ = self.get_data_types(comp, data_type, fetch_one)
-                operator = filter_criterium[1]
-
-                # The value is a index 2; convert using geodata_typecast
-                value = gdt(filter_criterium[2])
-
-                # Now, filter by operator at index 1.
-                if operator == 'gt':
-                    instances = list(filter(lambda x: getattr(x, filter_by)[comp] > value, instances))
-                elif operator == 'gteq':
-                    instances = list(filter(lambda x: getattr(x, filter_by)[comp] >= value, instances))
-                elif operator == 'eq':
-                    instances = list(filter(lambda x: getattr(x, filter_by)[comp] == value, instances))
-                elif operator == 'lteq':
-                    instances = list(filter(lambda x: getattr(x, filter_by)[comp] <= value, instances))
-                elif operator == 'lt':
-                    instances = list(filter(lambda x: getattr(x, filter_by)[comp] < value, instances))
-                # It is an error if the value specified is invalid.
-                else:
-                    raise ValueError("filter: Invalid operator")
+        '''
+        Filters instances (DemographicProfiles or GeoVectors) and leaves
+        those that match the context. Matches are found with context_ids(),
+        so geofilters are evaluated on the columns of the DemographicProfile
+        with the same GEOID.
+        '''
+        geoids = self.get_columns().arrays['GEOID'][
+            self.context_ids(context, geofilter)]
+        geoids = set(geoids.tolist())
 
-        return instances
+        return [x for x in input_instances if x.geoid in geoids]
 
     def compare_geovectors(self, display_label, context='', n=10, mode='std', **kwargs):
-        '''Compare GeoVectors.'''
+        '''
+        Compare GeoVectors.
+
+        Uses the GeoVectorIndex built by createdb: a KD-tree search when
+        comparing with the same summary level, or a search over the matrix
+        rows selected by the context.
+        '''
         d = self.get_data_products()
 
         gv_list = d['geovectors']
+        gv_index = d['indexes']['geovectors']
 
         # Obtain the GeoVector for which we entered a name.
-        comparison_gv = \
-            list(filter(lambda x: x.name == display_label, gv_list))[0]
+        comparison_idx = d['indexes']['gv_name'].get(display_label, [])[0]
 
-        # If a context was specified, filter GeoVector instances
+        # If a context was specified, only consider GeoVectors in it
         if context:
-            gv_list = self.context_filter(gv_list, context, False)
+            ids = self.context_gv_ids(context)
         else:
-            gv_list = list(filter(lambda x: x.sumlevel == comparison_gv.sumlevel,
-                                gv_list))
+            ids = None
 
         # Get the closest GeoVectors.
         # In other words, get the most demographically similar places.
-        return sorted(gv_list,
-                        key=lambda x: comparison_gv.distance(x, mode=mode))[:n]
+        idxs = gv_index.nearest(comparison_idx, mode=mode, n=n, ids=ids)
+        return [gv_list[idx] for idx in idxs]
+
+    def context_gv_ids(self, context, geofilter=''):
+        '''Like context_ids(), but get positions of GeoVectors.'''
+        dp_to_gv = self.get_data_products()['indexes']['dp_to_gv']
+        ids = dp_to_gv[self.context_ids(context, geofilter)]
+
+        # Not every DemographicProfile has a GeoVector.
+        return numpy.unique(ids[ids >= 0])
+
+    def all_similar_geovectors(self, context='', k=25, mode='std', chunk_size=256, jobs=1, **kwargs):
+        '''
+        Generate (GeoVector, [(GeoVector, distance), ...]) with the k most
+        demographically similar GeoVectors for every GeoVector, excluding
+        itself. Without a context, each GeoVector is compared with those of
+        the same summary level, as in compare_geovectors().
+        '''
+        d = self.get_data_products()
+        gv_list = d['geovectors']
+
+        if context:
+            ids = self.context_gv_ids(context)
+        else:
+            ids = None
+
+        for idx, neighbours, distances in d['indexes']['geovectors'].all_nearest(
+                ids, mode=mode, k=k, chunk_size=chunk_size, jobs=jobs):
+            yield (gv_list[idx],
+                   [(gv_list[x], y) for x, y in zip(neighbours, distances)])
+
+    def all_similar_geovectors_tofile(self, output='', context='', k=25, mode='std', chunk_size=256, jobs=1, **kwargs):
+        '''
+        Write the output of all_similar_geovectors() as rows, one per
+        neighbour, to a CSV file (or stdout if output is empty). If output
+        ends in .parquet, write a Parquet file instead (requires pyarrow).
+        '''
+        header = ['Geography', 'GEOID', 'Rank', 'Similar geography',
+                  'Similar GEOID', 'Distance']
+
+        def row_chunks():
+            rows = []
+
+            for gv, neighbours in self.all_similar_geovectors(
+                    context=context, k=k, mode=mode, chunk_size=chunk_size,
+                    jobs=jobs):
+                for rank, (neighbour, distance) in enumerate(neighbours, 1):
+                    rows.append([gv.name, gv.geoid, rank, neighbour.name,
+                                 neighbour.geoid, round(float(distance), 2)])
+
+                if len(rows) >= chunk_size * k:
+                    yield rows
+                    rows = []
+
+            if rows:
+                yield rows
+
+        if output.endswith('.parquet'):
+            # pyarrow is optional; it is only needed for Parquet output.
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError as e:
+                raise ImportError('Writing Parquet files requires pyarrow. '
+                                  "Install it with 'pip install pyarrow', or "
+                                  'write a CSV file.') from e
+
+            writer = None
+
+            for rows in row_chunks():
+                table = pyarrow.Table.from_arrays(
+                    [pyarrow.array(column) for column in zip(*rows)],
+                    names=header)
+
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(output, table.schema)
+
+                writer.write_table(table)
+
+            if writer is not None:
+                writer.close()
+        else:
+            if output:
+                f = open(output, 'w', newline='')
+            else:
+                f = sys.stdout
+
+            try:
+                csvwriter = csv.writer(f, quoting=csv.QUOTE_MINIMAL)
+                csvwriter.writerow(header)
+
+                for rows in row_chunks():
+                    csvwriter.writerows(rows)
+            finally:
+                if output:
+                    f.close()
 
     def compare_geovectors_app(self, display_label, context='', n=10):
         return self.compare_geovectors(display_label, context=context, n=n, mode='app')
 
     def get_dp(self, display_label, **kwargs):
         '''Get DemographicProfiles.'''
+        return self.lookup(display_label)
+
+    def county_key_to_geoid(self, group):
+        '''Convert a county group such as 'ca:losangeles' to its GEOID.'''
+        key = 'us:' + group + '/county'
+        county_name = self.kt.key_to_county_name[key]
+        return self.ct.county_name_to_geoid[county_name]
+
+    def context_ids(self, context, geofilter=''):
+        '''
+        Get the sorted positions of DemographicProfiles that match the
+        context and geofilter. Contexts are resolved with the ContextIndex
+        built by createdb, and geofilters are evaluated only on those rows.
+        '''
         d = self.get_data_products()
+        columns = d['columns']
+        universe_sl, group_sl, group = self.slt.unpack_context(context)
+
+        if group_sl == '050':
+            group = self.county_key_to_geoid(group)
 
-        place = display_label
-        return list(filter(lambda x: x.name == place, d['demographicprofiles']))
+        ids = d['indexes']['context'].ids(universe_sl, group_sl, group,
+                                          names=columns.arrays['NAME'])
 
-    def extreme_values(self, comp, data_type='c', context='', geofilter='', n=10, lowest=False, **kwargs):
-        '''Get highest and lowest values.'''
+        if geofilter:
+            ids = self.gft.compile(geofilter).select(columns, ids)
+
+        return ids
+
+    def context_mask(self, columns, context, geofilter):
+        '''
+        Vectorized counterpart of context_filter(): return a boolean array
+        that is True for rows of columns that match the context and geofilter.
+        '''
+        mask = numpy.zeros(len(columns), dtype=bool)
+        mask[self.context_ids(context, geofilter)] = True
+        return mask
+
+    def lookup(self, display_label, product='demographicprofiles'):
+        '''
+        Get every DemographicProfile (or GeoVector, if product is
+        'geovectors') with the exact display label, in data product order.
+        '''
         d = self.get_data_products()
 
-        comp = comp
-        data_type = data_type
+        if product == 'geovectors':
+            index = d['indexes']['gv_name']
+        else:
+            index = d['indexes']['dp_name']
+
+        return [d[product][idx] for idx in index.get(display_label, [])]
+
+    def get_by_geoid(self, geoid, product='demographicprofiles'):
+        '''
+        Get the DemographicProfile (or GeoVector) with a GEOID such as
+        '16000US0644000', or None if there is no such geography.
+        '''
+        d = self.get_data_products()
+
+        if product == 'geovectors':
+            index = d['indexes']['gv_geoid']
+        else:
+            index = d['indexes']['dp_geoid']
+
+        idx = index.get(geoid)
+
+        if idx is None:
+            return None
+
+        return d[product][idx]
+
+    def extreme_values(self, comp, data_type='c', context='', geofilter='', n=10, lowest=False, **kwargs):
+        '''
+        Get highest and lowest values.
+
+        Ranking is done on columns: only the top n DemographicProfiles are
+        sorted and returned. Set n to 0 to get every matching profile.
+        '''
+        d = self.get_data_products()
 
         dpi_instances = d['demographicprofiles']
+        columns = d['columns']
         fetch_one = dpi_instances[0]
 
         sort_by, print_ = self.get_data_types(comp, data_type, fetch_one)
-        
-        # Remove numpy.nans because they interfere with sorted()
-        dpi_instances = list(filter(lambda x: not \
-                    numpy.isnan(getattr(x, sort_by)[comp]), dpi_instances))
+        values = columns.column(comp, sort_by)
+
+        # Remove numpy.nans because they can't be ranked
+        mask = ~numpy.isnan(values)
 
         # Filter instances
-        dpi_instances = self.context_filter(dpi_instances, context, geofilter)
+        mask &= self.context_mask(columns, context, geofilter)
 
         # For the median_year_structure_built component, remove values of zero and
         # 18...
         if comp == 'median_year_structure_built':
-            dpi_instances = list(filter(lambda x: not \
-                x.rc['median_year_structure_built'] == 0, dpi_instances))
-            dpi_instances = list(filter(lambda x: not \
-                x.rc['median_year_structure_built'] == 18, dpi_instances))
+            median_year_structure_built \
+                = columns.column('median_year_structure_built', 'rc')
+            mask &= median_year_structure_built != 0
+            mask &= median_year_structure_built != 18
 
-        # Sort our DemographicProfile instances by component or compound specified.
-        return sorted(dpi_instances, key=lambda x: \
-                    getattr(x, sort_by)[comp], reverse=(not lowest))
+        # Rank our DemographicProfile instances by component or compound specified.
+        idxs = columns.rank(comp, sort_by, mask, n=n, lowest=lowest)
+        return [dpi_instances[idx] for idx in idxs]
 
     def lowest_values(self, comp, data_type='c', context='', geofilter='', n=10, **kwargs):
         '''Wrapper function for lowest values.'''
@@ -283,7 +555,8 @@ class Engine:
                 raise ValueError(comp + ': Invalid comp')
 
         # Filter instances
-        dpi_instances = self.context_filter(dpi_instances, context, geofilter)
+        dpi_instances = [dpi_instances[idx]
+                         for idx in self.context_ids(context, geofilter)]
 
         if len(dpi_instances) == 0:
             raise ValueError('Sorry, no geographies match your criteria.')
@@ -320,10 +593,7 @@ class Engine:
 
     def get_csv_dp(self, display_label, **kwargs):
         '''Output a DemographicProfile in CSV format'''
-        d = self.get_data_products()
-
-        place = display_label
-        dp = list(filter(lambda x: x.name == place, d['demographicprofiles']))[0]
+        dp = self.lookup(display_label)[0]
         dp.tocsv()
 
     def get_distance(self, dp1, dp2, kilometers=False):
@@ -341,34 +611,187 @@ class Engine:
 
     def distance(self, display_label_1, display_label_2, kilometers=False, **kwargs):
         '''Get the distance between two geographies'''
+        dp1 = self.lookup(display_label_1)[0]
+        dp2 = self.lookup(display_label_2)[0]
+
+        return self.get_distance(dp1, dp2, kilometers)
+
+    def closest_geographies(self, display_label, context='', geofilter='', n=10, exact=True, kilometers=False, **kwargs):
+        '''
+        Display the closest geographies
+
+        Candidates are found with the SpatialIndex built by createdb and
+        ranked by haversine distance. If exact is True, the nearest are
+        reranked by geodesic distance (as get_distance() measures it).
+        '''
         d = self.get_data_products()
+        dpi_instances = d['demographicprofiles']
+        columns = d['columns']
 
-        dl1 = display_label_1
-        dl2 = display_label_2
-        dp1 = list(filter(lambda x: x.name == dl1, d['demographicprofiles']))[0]
-        dp2 = list(filter(lambda x: x.name == dl2, d['demographicprofiles']))[0]
+        target_idx = d['indexes']['dp_name'].get(display_label, [])[0]
+        target_geo = dpi_instances[target_idx]
+        lat = target_geo.rc['latitude']
+        lon = target_geo.rc['longitude']
 
-        return self.get_distance(dp1, dp2, kilometers)
+        # Filter instances, leaving out the target geography
+        mask = self.context_mask(columns, context, geofilter)
+        mask &= columns.arrays['NAME'] != target_geo.name
+
+        # The geodesic distance differs from the haversine distance by well
+        # under 2%, so candidates within 2% of the nth can be reranked.
+        if exact:
+            margin = 0.02
+        else:
+            margin = 0.0
+
+        ids, distances = d['indexes']['spatial'].nearest(lat, lon, n=n,
+            mask=mask, margin=margin, kilometers=kilometers)
 
-    def closest_geographies(self, display_label, context='', geofilter='', n=10, **kwargs):
-        '''Display the closest geographies'''
+        dp_distances = [(dpi_instances[idx], distance)
+                        for idx, distance in zip(ids, distances)]
+
+        if exact:
+            dp_distances = [(dp, self.get_distance(target_geo, dp, kilometers))
+                            for dp, distance in dp_distances]
+            dp_distances = sorted(dp_distances, key=lambda x: x[1])
+        else:
+            dp_distances = [(dp, float(distance))
+                            for dp, distance in dp_distances]
+
+        return dp_distances[:n]
+
+    def within_radius(self, display_label, radius, context='', geofilter='', kilometers=False, **kwargs):
+        '''
+        Get (DemographicProfile, distance) for every geography within radius
+        miles (or kilometers) of the one specified by display_label, nearest
+        first. Distances are haversine distances.
+        '''
         d = self.get_data_products()
+        dpi_instances = d['demographicprofiles']
+        columns = d['columns']
+
+        target_geo = self.lookup(display_label)[0]
+
+        # Filter instances, leaving out the target geography
+        mask = self.context_mask(columns, context, geofilter)
+        mask &= columns.arrays['NAME'] != target_geo.name
+
+        ids, distances = d['indexes']['spatial'].within(
+            target_geo.rc['latitude'], target_geo.rc['longitude'], radius,
+            mask=mask, kilometers=kilometers)
 
-        target_geo = list(filter(lambda x: x.name == display_label, d['demographicprofiles']))[0]
+        return [(dpi_instances[idx], float(distance))
+                for idx, distance in zip(ids, distances)]
+
+    def within_bbox(self, south, west, north, east, context='', geofilter='', **kwargs):
+        '''
+        Get DemographicProfiles whose internal points are within a bounding
+        box, in data product order. If west is greater than east, the box
+        crosses the antimeridian.
+        '''
+        d = self.get_data_products()
         dpi_instances = d['demographicprofiles']
-        # Remove numpy.nans because they interfere with sorted()
-        # dpi_instances = list(filter(lambda x: not \
-        #                numpy.isnan(getattr(x, sort_by)[comp]), dpi_instances))
+        columns = d['columns']
 
-        # Filter instances
-        dpi_instances = self.context_filter(dpi_instances, context, geofilter)
+        latitudes = columns.column('latitude', 'rc')
+        longitudes = columns.column('longitude', 'rc')
+
+        mask = self.context_mask(columns, context, geofilter)
+        mask &= (latitudes >= south) & (latitudes <= north)
+
+        if west <= east:
+            mask &= (longitudes >= west) & (longitudes <= east)
+        else:
+            mask &= (longitudes >= west) | (longitudes <= east)
+
+        return [dpi_instances[idx] for idx in numpy.flatnonzero(mask)]
+
+class SQLiteEngine(Engine):
+    '''
+    An Engine that answers get_dp(), extreme_values() and context_filter()
+    with indexed SQL on the database written by createdb --sqlite, rather
+    than by loading every DemographicProfile. Each process opens its own
+    read-only connection, so worker processes can share one database. Other
+    queries use the data products, as Engine does.
+    '''
+    def __init__(self, path=None, preload=False):
+        super().__init__(preload=preload)
+
+        if path is None:
+            path = self.sqlite_path
+
+        self.store = SQLiteStore(path)
+
+    def get_dp(self, display_label, **kwargs):
+        '''Get DemographicProfiles.'''
+        return self.store.get_profiles(
+            self.store.ids('NAME = ?', [display_label]))
+
+    def context_where(self, context, geofilter):
+        '''Get an SQL WHERE condition for a context and geofilter.'''
+        universe_sl, group_sl, group = self.slt.unpack_context(context)
+
+        if group_sl == '050':
+            group = self.county_key_to_geoid(group)
+
+        if geofilter:
+            geofilter = self.gft.compile(geofilter)
 
-        # Get distances
-        dp_distances = []
+        return self.store.where(universe_sl, group_sl, group, geofilter)
 
-        for dp in dpi_instances:
-            if dp.name != target_geo.name:
-                dp_distances.append((dp, self.get_distance(target_geo, dp)))
+    def context_filter(self, input_instances=None, context='', geofilter='', gv=False):
+        '''
+        Filters instances and leaves those that match the context. If
+        input_instances is None, every matching DemographicProfile is
+        returned.
+        '''
+        where, params = self.context_where(context, geofilter)
+
+        if input_instances is None:
+            return self.store.get_profiles(self.store.ids(where, params))
+
+        geoids = {row['GEOID'] for row in self.store.execute(
+            'SELECT GEOID FROM geodata WHERE %s' % where, params)}
+
+        return [x for x in input_instances if x.geoid in geoids]
+
+    def extreme_values(self, comp, data_type='c', context='', geofilter='', n=10, lowest=False, **kwargs):
+        '''
+        Get highest and lowest values.
+
+        Only the top n rows are read from the database. Set n to 0 to get
+        every matching profile.
+        '''
+        # Any profile will do for determining the data type.
+        fetch_one = self.store.get_profiles(self.store.ids(n=1))
+
+        if not fetch_one:
+            return []
+
+        sort_by, print_ = self.get_data_types(comp, data_type, fetch_one[0])
+
+        if not self.store.has(comp, sort_by):
+            raise KeyError(self.store.key(comp, sort_by))
+
+        column = self.store.column(comp, sort_by)
+        where, params = self.context_where(context, geofilter)
+
+        # Remove NULLs (numpy.nans) because they can't be ranked
+        where += ' AND %s IS NOT NULL' % column
+
+        # For the median_year_structure_built component, remove values of zero and
+        # 18...
+        if comp == 'median_year_structure_built':
+            median_year_structure_built \
+                = self.store.column('median_year_structure_built', 'rc')
+            where += ' AND (%s IS NULL OR %s NOT IN (0, 18))' % (
+                median_year_structure_built, median_year_structure_built)
+
+        # Ties keep data product order, as with Engine.extreme_values().
+        if lowest:
+            order_by = '%s ASC, id' % column
+        else:
+            order_by = '%s DESC, id' % column
 
-        # Sort our DemographicProfile instances by component or compound specified.
-        return sorted(dp_distances, key=lambda x: x[1])[:n]
\ No newline at end of file
+        ids = self.store.ids(where, params, order_by=order_by, n=n)
+        return self.store.get_profiles(ids)
@@ -17,7 +17,7 @@ class GeodataGUI:
         self.root.title('geodata v0.2a')
         self.root.minsize(500, 20)
 
-        self.engine = Engine()
+        self.engine = Engine(preload=True)
 
         self.dp_fetch_one = self.engine.d['demographicprofiles'][0]
 
@@ -0,0 +1,191 @@
+'''
+A packed copy of the county lookup tables in tools/data, saved as NumPy
+arrays so that it can be memory-mapped instead of imported.
+
+Counties and places are held in arrays of GEOIDs sorted for binary search.
+The counties of the place at position i are
+place_counties[place_offsets[i]:place_offsets[i + 1]], as positions in
+county_geoids, and the places in each county are stored the same way.
+'''
+
+import numpy as np
+
+from collections.abc import Mapping
+from functools import cached_property
+from pathlib import Path
+
+class SortedLookup(Mapping):
+    '''
+    A read-only mapping over a sorted array of keys. value(i) gets the value
+    for the key at position i.
+    '''
+    def __init__(self, keys, value):
+        self.keys_array = keys
+        self.value = value
+
+    def position(self, key):
+        '''Position of key in the sorted keys'''
+        if not isinstance(key, str):
+            raise KeyError(key)
+
+        idx = int(np.searchsorted(self.keys_array, key))
+
+        if idx < len(self.keys_array) and self.keys_array[idx] == key:
+            return idx
+
+        raise KeyError(key)
+
+    def __getitem__(self, key):
+        return self.value(self.position(key))
+
+    def __iter__(self):
+        return iter(self.keys_array.tolist())
+
+    def __len__(self):
+        return len(self.keys_array)
+
+class CountyLookup:
+    '''Sorted GEOID arrays and offsets for counties and places.'''
+    # Arrays that make up a CountyLookup
+    array_names = ['county_geoids', 'county_full_names', 'county_offsets',
+                   'county_places', 'place_geoids', 'place_offsets',
+                   'place_counties', 'county_names', 'county_keys',
+                   'source_hash', 'source_stamp']
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+
+    @classmethod
+    def from_mappings(cls, county_geoid_to_name, place_to_counties,
+                      county_names, county_keys, source_hash='',
+                      source_stamp=''):
+        '''
+        Build a CountyLookup from the mappings in tools/data. county_keys
+        are the KeyTools keys for county_names, in the same order.
+        source_hash identifies the data the mappings came from, so that a
+        saved CountyLookup can be checked against it. source_stamp
+        describes the files the data was read from (e.g. their sizes and
+        modification times), which is cheaper to check.
+        '''
+        county_geoids = np.array(sorted(county_geoid_to_name), dtype=str)
+        place_geoids = np.array(sorted(place_to_counties), dtype=str)
+
+        # Positions of each place's counties
+        place_counties = [np.searchsorted(county_geoids, place_to_counties[x])
+                          for x in place_geoids.tolist()]
+        place_lengths = [len(x) for x in place_counties]
+        place_counties = np.concatenate(place_counties).astype(np.int32)
+
+        # Positions of each county's places, ordered by county and then by
+        # place.
+        place_ids = np.repeat(np.arange(len(place_geoids), dtype=np.int32),
+                              place_lengths)
+        order = np.argsort(place_counties, kind='stable')
+        county_places = place_ids[order]
+        county_lengths = np.bincount(place_counties,
+                                     minlength=len(county_geoids))
+
+        return cls({
+            'county_geoids': county_geoids,
+            'county_full_names': np.array(
+                [county_geoid_to_name[x] for x in county_geoids.tolist()],
+                dtype=str),
+            'county_offsets': cls.offsets(county_lengths),
+            'county_places': county_places,
+            'place_geoids': place_geoids,
+            'place_offsets': cls.offsets(place_lengths),
+            'place_counties': place_counties,
+            'county_names': np.array(county_names, dtype=str),
+            'county_keys': np.array(county_keys, dtype=str),
+            'source_hash': np.array(source_hash, dtype=str),
+            'source_stamp': np.array(source_stamp, dtype=str),
+            })
+
+    @staticmethod
+    def offsets(lengths):
+        '''Offsets of consecutive runs with lengths lengths'''
+        offsets = np.zeros(len(lengths) + 1, dtype=np.int32)
+        np.cumsum(lengths, out=offsets[1:])
+        return offsets
+
+    @classmethod
+    def exists(cls, path):
+        '''Determine whether a complete CountyLookup is saved at path.'''
+        path = Path(path)
+        return all((path / (name + '.npy')).is_file()
+                   for name in cls.array_names)
+
+    def save(self, path):
+        '''Save each array to its own .npy file in the directory path.'''
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        for name, array in self.arrays.items():
+            np.save(path / (name + '.npy'), array)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        '''Load arrays saved by save(), memory-mapped by default.'''
+        return cls({name: np.load(Path(path) / (name + '.npy'),
+                                  mmap_mode=mmap_mode)
+                    for name in cls.array_names})
+
+    def runs(self, offsets, values, geoids):
+        '''
+        Get a function that returns run i of values (positions in geoids) as
+        a list of GEOIDs.
+        '''
+        def run(idx):
+            return geoids[values[offsets[idx]:offsets[idx + 1]]].tolist()
+
+        return run
+
+    @property
+    def source_hash(self):
+        return str(self.arrays['source_hash'])
+
+    @property
+    def source_stamp(self):
+        return str(self.arrays['source_stamp'])
+
+    @cached_property
+    def county_geoid_to_name(self):
+        return SortedLookup(self.arrays['county_geoids'],
+                            lambda idx: str(self.arrays['county_full_names'][idx]))
+
+    @cached_property
+    def county_name_to_geoid(self):
+        # Ordered by name, as in tools/data
+        return dict(sorted(zip(self.arrays['county_full_names'].tolist(),
+                               self.arrays['county_geoids'].tolist())))
+
+    @cached_property
+    def county_to_places(self):
+        # Only counties that contain places
+        offsets = self.arrays['county_offsets']
+        ids = np.flatnonzero(np.diff(offsets))
+        run = self.runs(offsets, self.arrays['county_places'],
+                        self.arrays['place_geoids'])
+
+        return SortedLookup(self.arrays['county_geoids'][ids],
+                            lambda idx: run(ids[idx]))
+
+    @cached_property
+    def place_to_counties(self):
+        return SortedLookup(self.arrays['place_geoids'],
+                            self.runs(self.arrays['place_offsets'],
+                                      self.arrays['place_counties'],
+                                      self.arrays['county_geoids']))
+
+    @cached_property
+    def county_names(self):
+        return self.arrays['county_names'].tolist()
+
+    @cached_property
+    def county_keys(self):
+        '''KeyTools keys for county_names, in the same order'''
+        return self.arrays['county_keys'].tolist()
+
+    def __repr__(self):
+        return 'CountyLookup(counties=%s, places=%s)' % (
+            len(self.arrays['county_geoids']), len(self.arrays['place_geoids']))
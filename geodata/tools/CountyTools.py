@@ -2,19 +2,182 @@
 Tools to find out what county/ies contain a place and vice versa. Also helps
 with converting county GEOIDs to names.
 
-Gets previously generated data to improve performance.
+Gets previously generated data to improve performance. If createdb has saved
+a packed CountyLookup made from the current modules in tools/data, it is
+memory-mapped; otherwise, the modules are imported. Either way, nothing is
+loaded until first used.
 '''
 
-from tools.data.county_geoid_to_name import county_geoid_to_name
-from tools.data.county_name_to_geoid import county_name_to_geoid
-from tools.data.county_names import county_names
-from tools.data.county_to_places import county_to_places
-from tools.data.place_to_counties import place_to_counties
+from tools.CountyLookup import CountyLookup
 
-class CountyTools:
+from pathlib import Path
+
+import hashlib
+
+# Where createdb saves the packed CountyLookup
+lookup_path = Path(__file__).resolve().parents[2] / 'bin' / 'default.counties'
+
+class ModuleTables:
+    '''Lookup tables imported from the generated modules in tools/data.'''
     def __init__(self):
+        from tools.data.county_geoid_to_name import county_geoid_to_name
+        from tools.data.county_name_to_geoid import county_name_to_geoid
+        from tools.data.county_names import county_names
+        from tools.data.county_to_places import county_to_places
+        from tools.data.place_to_counties import place_to_counties
+
         self.county_geoid_to_name = county_geoid_to_name
         self.county_name_to_geoid = county_name_to_geoid
         self.county_names = county_names
         self.county_to_places = county_to_places
         self.place_to_counties = place_to_counties
+
+        # KeyTools makes keys itself.
+        self.county_keys = None
+
+def source_paths():
+    '''Paths of the generated modules in tools/data'''
+    return sorted((Path(__file__).parent / 'data').glob('*.py'))
+
+def source_stamp():
+    '''Names, sizes and modification times of the modules in tools/data.'''
+    stamps = []
+
+    for this_path in source_paths():
+        stat = this_path.stat()
+        stamps.append((this_path.name, stat.st_size, stat.st_mtime_ns))
+
+    return repr(stamps)
+
+def source_hash():
+    '''SHA-1 digest of the generated modules in tools/data.'''
+    digest = hashlib.sha1()
+
+    for this_path in source_paths():
+        digest.update(this_path.name.encode())
+        digest.update(this_path.read_bytes())
+
+    return digest.hexdigest()
+
+# Lookup tables shared by every CountyTools in this process
+_tables = None
+
+def county_tables():
+    '''
+    Get the shared lookup tables, loading them on first use. A packed
+    CountyLookup made from different modules than the ones in tools/data
+    (e.g. by an older createdb) is ignored. The modules are only hashed if
+    their sizes or modification times changed since it was made.
+    '''
+    global _tables
+
+    if _tables is None:
+        if CountyLookup.exists(lookup_path):
+            _tables = CountyLookup.load(lookup_path)
+
+            if _tables.source_stamp != source_stamp() \
+                and _tables.source_hash != source_hash():
+                print('Note: %s is out of date. Using tools/data instead; '
+                      'rebuild with createdb to update it.' % lookup_path)
+                _tables = None
+
+        if _tables is None:
+            _tables = ModuleTables()
+
+    return _tables
+
+def save_lookup(path=lookup_path):
+    '''Save a packed CountyLookup made from the modules in tools/data.'''
+    # KeyTools uses CountyTools, so it is imported here.
+    from tools.KeyTools import KeyTools
+    from tools.StateTools import StateTools
+
+    global _tables
+
+    tables = ModuleTables()
+    st = StateTools()
+
+    CountyLookup.from_mappings(
+        tables.county_geoid_to_name,
+        tables.place_to_counties,
+        tables.county_names,
+        [KeyTools.county_key(x, st) for x in tables.county_names],
+        source_hash(), source_stamp()).save(path)
+
+    # Use the new file from now on.
+    if path == lookup_path:
+        _tables = None
+
+class CountyTools:
+    '''County and place lookups. Tables are shared and loaded on first use.'''
+    @property
+    def county_geoid_to_name(self):
+        return county_tables().county_geoid_to_name
+
+    @property
+    def county_name_to_geoid(self):
+        return county_tables().county_name_to_geoid
+
+    @property
+    def county_names(self):
+        return county_tables().county_names
+
+    @property
+    def county_to_places(self):
+        return county_tables().county_to_places
+
+    @property
+    def place_to_counties(self):
+        return county_tables().place_to_counties
+
+class PlaceCounties:
+    '''
+    County GEOIDs and county names (without the state) for places, looked up
+    once per place and shared. Entries are (county GEOIDs, county names)
+    tuples, and places in the same counties share one entry, so county lists
+    aren't repeated for every DemographicProfile and GeoVector.
+    '''
+    # Entry for geographies that aren't places
+    empty = ((), ())
+
+    def __init__(self, ct=None):
+        self.ct = ct or CountyTools()
+        # Entries keyed by county GEOIDs
+        self.entries = dict()
+        # Entries keyed by place GEOID (without the summary level prefix)
+        self.places = dict()
+
+    def get(self, sumlevel, geoid):
+        '''Get the entry for a geography.'''
+        if sumlevel != '160':
+            return self.empty
+
+        place = geoid[7:]
+        entry = self.places.get(place)
+
+        if entry is None:
+            counties = tuple(self.ct.place_to_counties[place])
+            entry = self.entries.get(counties)
+
+            if entry is None:
+                entry = (counties, tuple(
+                    self.ct.county_geoid_to_name[county].split(', ')[0]
+                    for county in counties))
+                self.entries[counties] = entry
+
+            self.places[place] = entry
+
+        return entry
+
+# PlaceCounties shared by every DemographicProfile and GeoVector in this
+# process
+_place_counties = None
+
+def place_counties():
+    '''Get the shared PlaceCounties, creating it on first use.'''
+    global _place_counties
+
+    if _place_counties is None:
+        _place_counties = PlaceCounties()
+
+    return _place_counties
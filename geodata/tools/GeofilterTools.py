@@ -0,0 +1,164 @@
+'''
+Tools to parse geofilters (the -f argument) into plans that can be evaluated
+against columns or DemographicProfiles.
+
+A geofilter is made of criteria in the form comp:operator:value[:data_type].
+Criteria joined by '+' must all match; criteria joined by '|' match if any of
+them do. '|' binds more tightly than '+', so
+
+    population:gteq:10000|median_value:lt:300000+per_capita_income:gt:40000
+
+selects geographies with at least 10,000 people or a median value below
+$300,000, and a per capita income above $40,000.
+
+Operators are gt, gteq, eq, lteq and lt, plus btw for inclusive ranges, which
+take two values separated by '~' (population:btw:10000~50000).
+'''
+
+from tools.geodata_typecast import gdt
+
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+class Criterion(namedtuple('Criterion', 'comp operator value data_type')):
+    '''One comp:operator:value[:data_type] criterion.'''
+    operators = {
+        'gt':   lambda x, value: x > value,
+        'gteq': lambda x, value: x >= value,
+        'eq':   lambda x, value: x == value,
+        'lteq': lambda x, value: x <= value,
+        'lt':   lambda x, value: x < value,
+        'btw':  lambda x, value: (x >= value[0]) & (x <= value[1]),
+    }
+
+    # SQL for each operator, given a column name
+    sql_operators = {
+        'gt':   '%s > ?',
+        'gteq': '%s >= ?',
+        'eq':   '%s = ?',
+        'lteq': '%s <= ?',
+        'lt':   '%s < ?',
+        'btw':  '%s BETWEEN ? AND ?',
+    }
+
+    def filter_by(self, has_compound):
+        '''
+        Get 'c' (compounds) or 'rc' (components), the same way
+        Engine.get_data_types() does.
+        '''
+        if not self.data_type:
+            return 'c' if has_compound else 'rc'
+        elif self.data_type == 'c':
+            return 'rc'
+        else:
+            return 'c'
+
+    def apply(self, x):
+        '''Apply the criterion to a value or an array of values.'''
+        return self.operators[self.operator](x, self.value)
+
+    def sql(self, column):
+        '''Get an SQL condition on column, and its parameters.'''
+        if self.operator == 'btw':
+            params = list(self.value)
+        else:
+            params = [self.value]
+
+        return (self.sql_operators[self.operator] % column, params)
+
+class Geofilter:
+    '''A parsed geofilter: a conjunction of groups of alternatives.'''
+    def __init__(self, groups):
+        self.groups = groups
+
+    def select(self, columns, ids):
+        '''
+        Return the positions in ids whose rows in columns (a ColumnStore)
+        match. Each group narrows ids, so later groups look at fewer rows.
+        '''
+        for group in self.groups:
+            if len(ids) == 0:
+                break
+
+            group_mask = np.zeros(len(ids), dtype=bool)
+
+            for criterion in group:
+                filter_by = criterion.filter_by(
+                    columns.has(criterion.comp, 'c'))
+                values = columns.column(criterion.comp, filter_by)[ids]
+                group_mask |= criterion.apply(values)
+
+            ids = ids[group_mask]
+
+        return ids
+
+    def where(self, column):
+        '''
+        Get an SQL WHERE condition for the geofilter, and its parameters.
+        column is a function that returns the SQL column for a Criterion.
+        '''
+        conditions = []
+        params = []
+
+        for group in self.groups:
+            alternatives = []
+
+            for criterion in group:
+                condition, criterion_params = criterion.sql(column(criterion))
+                alternatives.append(condition)
+                params += criterion_params
+
+            conditions.append('(%s)' % ' OR '.join(alternatives))
+
+        return (' AND '.join(conditions), params)
+
+    def __repr__(self):
+        return 'Geofilter(%s)' % (self.groups,)
+
+class GeofilterTools:
+    '''Tools to compile geofilters.'''
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def compile(geofilter):
+        '''
+        Parse a geofilter string into a Geofilter. Plans are cached, so
+        repeated geofilters are only parsed once.
+        '''
+        groups = []
+
+        for group in geofilter.split('+'):
+            criteria = []
+
+            for filter_criterium in group.split('|'):
+                filter_criterium = filter_criterium.split(':')
+
+                if len(filter_criterium) not in [3, 4]:
+                    raise ValueError('filter: Invalid criterion')
+
+                # Determine if a data_type was specified
+                if len(filter_criterium) == 4:
+                    data_type = filter_criterium[3]
+                else:
+                    data_type = False
+
+                comp, operator, value = filter_criterium[:3]
+
+                if operator not in Criterion.operators.keys():
+                    raise ValueError("filter: Invalid operator")
+
+                # Convert values using geodata_typecast
+                if operator == 'btw':
+                    value = tuple(map(gdt, value.split('~')))
+
+                    if len(value) != 2:
+                        raise ValueError('filter: Invalid range')
+                else:
+                    value = gdt(value)
+
+                criteria.append(Criterion(comp, operator, value, data_type))
+
+            groups.append(tuple(criteria))
+
+        return Geofilter(tuple(groups))
@@ -1,5 +1,9 @@
 from tools.StateTools import StateTools
-from tools.CountyTools import CountyTools
+from tools.CountyTools import county_tables
+
+# Mappings between keys and county names, shared by every KeyTools in this
+# process
+_county_key_maps = None
 
 class KeyTools:
     '''
@@ -17,37 +21,55 @@ class KeyTools:
         else:
             return '040' # State
 
-    def __init__(self):
-        st = StateTools()
-        ct = CountyTools()
+    @staticmethod
+    def county_key(county_name, st):
+        '''Get the key for a county name. st is a StateTools instance.'''
+        split_county_name = county_name.split(', ')
+
+        # name portion
+        name = split_county_name[0]
+        name = name[:-7]
+        name = name.replace(' ', '')
+        name = name.lower()
+
+        # state portion
+        state = split_county_name[-1]
+        state = st.get_abbrev(state, lowercase=True)
+
+        # Build key
+        return 'us:' + state + ':' + name + '/county'
+
+    def get_county_key_maps(self):
+        '''
+        Get (key_to_county_name, county_name_to_key), making them on first
+        use. Keys saved with a packed CountyLookup are used if there are any.
+        '''
+        global _county_key_maps
 
-        #######################################################################
-        # Counties
+        if _county_key_maps is None:
+            tables = county_tables()
+            county_names = tables.county_names
+            county_keys = tables.county_keys
 
-        # key_to_county_name ##################################################
-        # county_name_to_key ##################################################
-        self.key_to_county_name = dict()
-        self.county_name_to_key = dict()
+            if county_keys is None:
+                st = StateTools()
+                county_keys = [self.county_key(x, st) for x in county_names]
 
-        for county_name in ct.county_names:
-            split_county_name = county_name.split(', ')
+            _county_key_maps = (dict(zip(county_keys, county_names)),
+                                dict(zip(county_names, county_keys)))
 
-            # name portion
-            name = split_county_name[0]
-            name = name[:-7]
-            name = name.replace(' ', '')
-            name = name.lower()
+        return _county_key_maps
 
-            # state portion
-            state = split_county_name[-1]
-            state = st.get_abbrev(state, lowercase=True)
+    #######################################################################
+    # Counties
 
-            # Build key
-            key = 'us:' + state + ':' + name + '/county'
+    @property
+    def key_to_county_name(self):
+        return self.get_county_key_maps()[0]
 
-            # Insert key/value pair
-            self.key_to_county_name[key] = county_name
-            self.county_name_to_key[county_name] = key
+    @property
+    def county_name_to_key(self):
+        return self.get_county_key_maps()[1]
 
 ###############################################################################
 ###############################################################################
@@ -11,7 +11,8 @@ class StateTools:
 
     def get_abbrevs(self, lowercase=False, inc_us=False):
         '''Get two-letter state abbreviations.'''
-        abbrevs = self.abbrevs
+        # Copy so that 'US' isn't added to self.abbrevs on every call
+        abbrevs = list(self.abbrevs)
 
         if inc_us:
             abbrevs.append('US')
@@ -0,0 +1,10 @@
+'''
+geodata's modules import each other from the geodata directory (e.g. "from
+tools.StateTools import StateTools"), so it is put on sys.path here.
+'''
+
+from pathlib import Path
+
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'geodata'))
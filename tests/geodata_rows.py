@@ -0,0 +1,37 @@
+'''
+Rows of the geodata table for tests. Every column that DemographicProfiles
+and GeoVectors read has a default, so tests only spell out the values they
+are about.
+'''
+
+defaults = {
+    'ALAND_SQMI': 10.0,
+    'INTPTLAT': 33.5,
+    'INTPTLONG': -86.8,
+    'B01003_1': 1000,
+    'B02001_2': 600,
+    'B02001_3': 300,
+    'B02001_5': 50,
+    'B03002_3': 550,
+    'B03002_12': 80,
+    'B04004_51': 10,
+    'B15003_1': 700,
+    'B15003_22': 100,
+    'B15003_23': 40,
+    'B15003_24': 10,
+    'B15003_25': 5,
+    'B19013_1': 50000,
+    'B19301_1': 25000,
+    'B25018_1': 5.5,
+    'B25035_1': 1975,
+    'B25058_1': 900,
+    'B25077_1': 150000,
+    }
+
+def geodata_row(sumlevel, geoid, name, state='al', **values):
+    '''A geodata row, with values replacing the defaults.'''
+    row = {'SUMLEVEL': sumlevel, 'GEOID': geoid, 'NAME': name,
+           'STUSAB': state}
+    row.update(defaults)
+    row.update(values)
+    return row
@@ -0,0 +1,90 @@
+import pickle
+
+import numpy as np
+
+from database.BuildCache import BuildCache
+from database.Database import Database, read_estimate_file
+
+def test_get_and_put(tmp_path):
+    cache = BuildCache(tmp_path / 'cache')
+
+    assert cache.get('data', 'abc') is None
+
+    cache.put('data', 'abc', {'x': [1, 2]})
+    assert cache.get('data', 'abc') == {'x': [1, 2]}
+
+    # Results for other keys are replaced.
+    cache.put('data', 'def', 1)
+    assert cache.get('data', 'abc') is None
+    assert cache.get('data', 'def') == 1
+    assert BuildCache(tmp_path / 'cache').get('data', 'def') == 1
+
+def test_key(tmp_path):
+    cache = BuildCache(tmp_path / 'cache')
+    paths = [tmp_path / 'a.txt', tmp_path / 'b.txt']
+    paths[0].write_text('a')
+    paths[1].write_text('b')
+
+    key = cache.key('data', paths, {'jobs': 1})
+
+    assert cache.key('data', paths, {'jobs': 1}) == key
+    assert cache.key('data', paths, {'jobs': 2}) != key
+    assert cache.key('plan', paths, {'jobs': 1}) != key
+    assert cache.key('data', paths[:1], {'jobs': 1}) != key
+
+    paths[1].write_text('changed')
+    assert cache.key('data', paths, {'jobs': 1}) != key
+
+def test_hashes_saved_once_per_key(tmp_path, monkeypatch):
+    cache = BuildCache(tmp_path / 'cache')
+    paths = []
+
+    for idx in range(5):
+        paths.append(tmp_path / ('%s.txt' % idx))
+        paths[-1].write_text(str(idx))
+
+    dumps = []
+    dump = cache.dump
+    monkeypatch.setattr(cache, 'dump',
+                        lambda *args: dumps.append(args[0]) or dump(*args))
+
+    key = cache.key('data', paths, None)
+
+    assert dumps == [cache.hashes_path]
+    with open(cache.hashes_path, 'rb') as f:
+        assert set(pickle.load(f)) == {str(x) for x in paths}
+
+    # Nothing new to save
+    assert cache.key('data', paths, None) == key
+    assert dumps == [cache.hashes_path]
+
+    # Hashes are reused by a new BuildCache.
+    assert BuildCache(tmp_path / 'cache').key('data', paths, None) == key
+
+def test_cached_stage_matches_rebuild(tmp_path):
+    path = tmp_path / 'e20205al0001000.txt'
+    path.write_text('ACSSF,2020e5,al,000,0001,0000001,10,,3.5\n'
+                    'ACSSF,2020e5,al,000,0001,0000002,N,7,8\n')
+    builds = []
+
+    def build():
+        builds.append(path.read_text())
+        return read_estimate_file(path, [2, 5, 6, 7, 8])
+
+    def cached():
+        d = Database.__new__(Database)
+        d.cache = BuildCache(tmp_path / 'cache')
+        return d.cached('data-0001', [path], ('2020', [2, 5, 6, 7, 8]), build)
+
+    first = cached()
+    second = cached()
+
+    assert len(builds) == 1
+    assert second[0] == first[0]
+    np.testing.assert_array_equal(second[1], first[1])
+    np.testing.assert_array_equal(second[1],
+                                  read_estimate_file(path, [2, 5, 6, 7, 8])[1])
+
+    # Changed input files are built again.
+    path.write_text('ACSSF,2020e5,al,000,0001,0000001,11,,3.5\n')
+    assert cached()[1][0, 0] == 11
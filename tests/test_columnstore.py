@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from datainterface.ColumnStore import ColumnStore, rank_indices
+from datainterface.DemographicProfile import DemographicProfile
+
+from geodata_rows import geodata_row
+
+@pytest.fixture(scope='module')
+def profiles():
+    rows = [
+        geodata_row('040', '04000US01', 'Alabama', B01003_1=4900000,
+                    ALAND_SQMI=50645.3),
+        geodata_row('050', '05000US01073', 'Jefferson County, Alabama',
+                    B01003_1=660000, B19013_1=None),
+        geodata_row('160', '16000US0107000', 'Birmingham city, Alabama',
+                    B01003_1=200000, B25018_1=4.9),
+        # No land area, so no population density
+        geodata_row('160', '16000US0100124', 'Abbeville city, Alabama',
+                    ALAND_SQMI=0.0, B01003_1=2500),
+        # No people, so no percentages
+        geodata_row('860', '86000US35004', 'ZCTA5 35004', state='US',
+                    B01003_1=0, INTPTLAT=None, INTPTLONG=None),
+        ]
+    return [DemographicProfile(row) for row in rows]
+
+def test_columns_match_profiles(profiles):
+    columns = ColumnStore.from_demographicprofiles(profiles)
+
+    assert len(columns) == len(profiles)
+    assert columns.arrays['GEOID'].tolist() == [x.geoid for x in profiles]
+    assert columns.arrays['NAME'].tolist() == [x.name for x in profiles]
+    assert columns.arrays['SUMLEVEL'].tolist() \
+        == [x.sumlevel for x in profiles]
+
+    # Every value the profiles have, including numpy.nan where data is
+    # missing
+    for idx, dpi in enumerate(profiles):
+        for comp, value in dpi.rc.items():
+            np.testing.assert_equal(columns.column(comp, 'rc')[idx], value)
+        for comp, value in dpi.c.items():
+            np.testing.assert_equal(columns.column(comp, 'c')[idx], value)
+
+    assert columns.has('population_density', 'c')
+    assert not columns.has('population_density', 'rc')
+
+def test_save_and_load(profiles, tmp_path):
+    columns = ColumnStore.from_demographicprofiles(profiles)
+    columns.save(tmp_path)
+
+    for mmap_mode in ['r', None]:
+        loaded = ColumnStore.load(tmp_path, mmap_mode=mmap_mode)
+
+        assert loaded.arrays.keys() == columns.arrays.keys()
+        for key, array in columns.arrays.items():
+            np.testing.assert_array_equal(loaded.arrays[key], array)
+
+def extreme_values(profiles, comp, data_type, lowest):
+    '''
+    Positions of profiles in the order Engine.extreme_values() returned them
+    before ranking was done on columns: numpy.nan removed, then sorted().
+    '''
+    ids = [idx for idx, dpi in enumerate(profiles)
+           if not np.isnan(getattr(dpi, data_type)[comp])]
+    return sorted(ids, key=lambda idx: getattr(profiles[idx], data_type)[comp],
+                  reverse=not lowest)
+
+@pytest.fixture(scope='module')
+def ranked_profiles():
+    # Incomes with ties and missing values
+    incomes = [50000, 72000, None, 50000, 31000, 72000, 50000, None, 98000,
+               31000, 50000, 64000]
+    return [DemographicProfile(geodata_row(
+                '860', '86000US350%02d' % idx, 'ZCTA5 350%02d' % idx,
+                state='US', B19013_1=income, B01003_1=1000 + idx % 3 * 500))
+            for idx, income in enumerate(incomes)]
+
+@pytest.mark.parametrize('comp,data_type', [
+    ('median_household_income', 'rc'),
+    ('population', 'rc'),
+    ('population_density', 'c'),
+    ])
+@pytest.mark.parametrize('lowest', [False, True])
+def test_rank_matches_sorted(ranked_profiles, comp, data_type, lowest):
+    columns = ColumnStore.from_demographicprofiles(ranked_profiles)
+    mask = ~np.isnan(columns.column(comp, data_type))
+    expected = extreme_values(ranked_profiles, comp, data_type, lowest)
+
+    for n in range(len(ranked_profiles) + 2):
+        assert columns.rank(comp, data_type, mask, n=n,
+                            lowest=lowest).tolist() \
+            == (expected[:n] if n else expected)
+
+def test_rank_indices_with_mask():
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 10, 500).astype(float)
+    mask = rng.random(500) < 0.7
+
+    for lowest in [False, True]:
+        expected = sorted(np.flatnonzero(mask).tolist(),
+                          key=lambda idx: values[idx], reverse=not lowest)
+
+        for n in [1, 10, 49, 50, 51, 400, 0]:
+            assert rank_indices(values, mask, n=n, lowest=lowest).tolist() \
+                == (expected[:n] if n else expected)
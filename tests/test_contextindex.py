@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from datainterface.ColumnStore import ColumnStore
+from datainterface.ContextIndex import ContextIndex
+from datainterface.DemographicProfile import DemographicProfile
+
+from geodata_rows import geodata_row
+
+# Contexts, as unpacked by SummaryLevelTools.unpack_context() (with county
+# groups as GEOIDs)
+CONTEXTS = [
+    (None, None, None),
+    ('160', None, None),
+    ('050', '040', 'al'),
+    ('160', '040', 'al'),
+    ('160', '050', '01073'),
+    ('160', '050', '01095'),
+    (None, '050', '01017'),
+    ('160', '050', '01001'),
+    ('860', '860', '35'),
+    ('860', '860', '3500'),
+    ('860', '860', '36104'),
+    ('860', '860', '999'),
+    ('040', '040', 'zz'),
+    ('310', None, None),
+    ]
+
+@pytest.fixture(scope='module')
+def profiles():
+    rows = [
+        geodata_row('040', '04000US01', 'Alabama'),
+        geodata_row('040', '04000US06', 'California', state='ca'),
+        geodata_row('050', '05000US01073', 'Jefferson County, Alabama'),
+        geodata_row('050', '05000US01095', 'Marshall County, Alabama'),
+        # Places in one county, and in more than one
+        geodata_row('160', '16000US0100100', 'Abanda CDP, Alabama'),
+        geodata_row('160', '16000US0100460', 'Adamsville city, Alabama'),
+        geodata_row('160', '16000US0102116', 'Albertville city, Alabama'),
+        geodata_row('160', '16000US0107000', 'Birmingham city, Alabama'),
+        geodata_row('160', '16000US0107912', 'Boaz city, Alabama'),
+        geodata_row('860', '86000US35004', 'ZCTA5 35004', state='US'),
+        geodata_row('860', '86000US35005', 'ZCTA5 35005', state='US'),
+        geodata_row('860', '86000US36104', 'ZCTA5 36104', state='US'),
+        geodata_row('860', '86000US90210', 'ZCTA5 90210', state='US'),
+        ]
+    return [DemographicProfile(row) for row in rows]
+
+def context_filter(profiles, universe_sl, group_sl, group):
+    '''Positions of the profiles that Engine.context_filter() used to keep.'''
+    instances = list(enumerate(profiles))
+
+    if universe_sl:
+        instances = [x for x in instances if x[1].sumlevel == universe_sl]
+
+    if group_sl == '050':
+        instances = [x for x in instances if group in x[1].counties]
+    elif group_sl == '040':
+        instances = [x for x in instances if x[1].state == group]
+    elif group_sl == '860':
+        instances = [x for x in instances
+                     if x[1].name.startswith('ZCTA5 ' + group)]
+
+    return [idx for idx, _ in instances]
+
+@pytest.mark.parametrize('context', CONTEXTS)
+def test_ids_match_context_filter(profiles, context):
+    index = ContextIndex.from_demographicprofiles(profiles)
+    names = ColumnStore.from_demographicprofiles(profiles).arrays['NAME']
+
+    ids = index.ids(*context, names=names)
+
+    assert ids.tolist() == context_filter(profiles, *context)
+    assert np.all(np.diff(ids) > 0)
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from tools import CountyTools as county_tools
+from tools.CountyLookup import CountyLookup
+from tools.CountyTools import ModuleTables, source_hash, source_stamp
+from tools.KeyTools import KeyTools
+from tools.StateTools import StateTools
+
+@pytest.fixture(scope='module')
+def tables():
+    return ModuleTables()
+
+@pytest.fixture(scope='module')
+def lookup(tables, tmp_path_factory):
+    st = StateTools()
+    path = tmp_path_factory.mktemp('counties') / 'default.counties'
+
+    CountyLookup.from_mappings(
+        tables.county_geoid_to_name, tables.place_to_counties,
+        tables.county_names,
+        [KeyTools.county_key(x, st) for x in tables.county_names],
+        source_hash()).save(path)
+
+    return CountyLookup.load(path)
+
+@pytest.mark.parametrize('name', ['county_geoid_to_name',
+                                  'county_name_to_geoid', 'county_to_places',
+                                  'place_to_counties'])
+def test_mappings_match_modules(tables, lookup, name):
+    expected = getattr(tables, name)
+    mapping = getattr(lookup, name)
+
+    assert len(mapping) == len(expected)
+    assert set(mapping) == set(expected)
+
+    for key in expected:
+        assert mapping[key] == expected[key]
+        assert type(mapping[key]) is type(expected[key])
+
+    # Lookups of other keys fail as they do for dictionaries.
+    for key in ['99999', '', 1]:
+        assert key not in mapping
+        with pytest.raises(KeyError):
+            mapping[key]
+
+def test_order_matches_modules(tables, lookup):
+    assert lookup.county_names == tables.county_names
+    assert list(lookup.county_name_to_geoid) \
+        == list(tables.county_name_to_geoid)
+    assert list(lookup.place_to_counties) == sorted(tables.place_to_counties)
+
+    st = StateTools()
+    assert lookup.county_keys \
+        == [KeyTools.county_key(x, st) for x in tables.county_names]
+
+def test_offsets():
+    np.testing.assert_array_equal(CountyLookup.offsets([2, 0, 3]),
+                                  [0, 2, 2, 5])
+
+def test_stale_lookup_ignored(tables, lookup, tmp_path, monkeypatch):
+    path = tmp_path / 'default.counties'
+    arrays = dict(lookup.arrays, source_hash=np.array('stale', dtype=str))
+    CountyLookup(arrays).save(path)
+
+    monkeypatch.setattr(county_tools, 'lookup_path', path)
+    monkeypatch.setattr(county_tools, '_tables', None)
+
+    assert isinstance(county_tools.county_tables(), ModuleTables)
+
+    # A lookup made from the current modules is used.
+    county_tools.save_lookup(path)
+
+    assert isinstance(county_tools.county_tables(), CountyLookup)
+    assert county_tools.county_tables().source_hash == source_hash()
+
+def use_lookup(monkeypatch, lookup, path, **arrays):
+    '''Save lookup with arrays replaced, and make it the shared lookup.'''
+    CountyLookup(dict(lookup.arrays, **{
+        name: np.array(value, dtype=str) for name, value in arrays.items()
+        })).save(path)
+
+    monkeypatch.setattr(county_tools, 'lookup_path', path)
+    monkeypatch.setattr(county_tools, '_tables', None)
+
+def test_modules_hashed_only_if_stamp_differs(lookup, tmp_path, monkeypatch):
+    hashed = []
+    monkeypatch.setattr(county_tools, 'source_hash',
+                        lambda: hashed.append(1) or source_hash())
+
+    # Same sizes and modification times: nothing is hashed.
+    use_lookup(monkeypatch, lookup, tmp_path / 'a', source_hash='stale',
+               source_stamp=source_stamp())
+    assert isinstance(county_tools.county_tables(), CountyLookup)
+    assert hashed == []
+
+    # Touched, but with the same contents: the modules are hashed.
+    use_lookup(monkeypatch, lookup, tmp_path / 'b',
+               source_hash=source_hash(), source_stamp='touched')
+    assert isinstance(county_tools.county_tables(), CountyLookup)
+    assert hashed == [1]
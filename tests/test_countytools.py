@@ -0,0 +1,44 @@
+from tools.CountyTools import CountyTools, PlaceCounties
+
+# Places in one county and in more than one, and two places in the same
+# counties
+PLACES = ['0100100', '0100460', '0101660', '0102116', '0107000', '0107912',
+          '0102320', '0134024']
+
+def baseline_counties(ct, sumlevel, geoid):
+    '''Counties and county names as each profile and vector looked them up.'''
+    if sumlevel != '160':
+        return ([], [])
+
+    counties = ct.place_to_counties[geoid[7:]]
+    counties_display = list(map(lambda x: ct.county_geoid_to_name[x],
+                                ct.place_to_counties[geoid[7:]]))
+    counties_display = list(map(lambda x: x.split(', ')[0],
+                                counties_display))
+
+    return (counties, counties_display)
+
+def test_place_counties_match_baseline():
+    ct = CountyTools()
+    pc = PlaceCounties(ct)
+
+    geographies = [('160', '16000US' + x) for x in PLACES] \
+        + [('050', '05000US01073'), ('040', '04000US01'),
+           ('860', '86000US35004')]
+
+    for sumlevel, geoid in geographies:
+        counties, counties_display = pc.get(sumlevel, geoid)
+
+        assert (list(counties), list(counties_display)) \
+            == baseline_counties(ct, sumlevel, geoid)
+
+def test_entries_shared():
+    pc = PlaceCounties()
+
+    assert pc.get('160', '16000US0107000') is pc.get('160', '16000US0107000')
+    assert pc.get('050', '05000US01073') is pc.get('860', '86000US35004')
+
+    # Both places are in Jefferson and Shelby Counties.
+    assert pc.get('160', '16000US0134024') is pc.get('160', '16000US0107000')
+    assert pc.get('160', '16000US0102320') \
+        is not pc.get('160', '16000US0107000')
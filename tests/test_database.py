@@ -0,0 +1,181 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import repeat
+from types import SimpleNamespace
+
+import csv
+
+import numpy as np
+
+from database.Database import Database, geo_csv_rows, read_estimate_file, \
+    to_number
+from tools.StateTools import StateTools
+from tools.geodata_typecast import gdt
+
+def test_name_and_geoid_indexes():
+    # Names shared by geographies of different summary levels, and a
+    # repeated GEOID
+    instances = [SimpleNamespace(name=name, geoid=geoid) for name, geoid in [
+        ('Alabama', '04000US01'),
+        ('Los Angeles County, California', '05000US06037'),
+        ('Los Angeles city, California', '16000US0644000'),
+        ('ZCTA5 90210', '86000US90210'),
+        ('Los Angeles County, California', '05000US06037'),
+        ('Alabama', '04000US01x'),
+        ]]
+
+    name_index, geoid_index = Database.get_name_and_geoid_indexes(
+        None, instances)
+
+    # Same as filtering every instance by name, as get_dp() did
+    for name in {x.name for x in instances} | {'Nowhere'}:
+        assert [instances[idx] for idx in name_index.get(name, [])] \
+            == list(filter(lambda x: x.name == name, instances))
+
+    for geoid in {x.geoid for x in instances}:
+        assert instances[geoid_index[geoid]] \
+            is next(filter(lambda x: x.geoid == geoid, instances))
+    assert 'Nowhere' not in geoid_index
+
+def write_geo_csv(path):
+    '''
+    Write a geographic CSV file with a row for each summary level, some of
+    them for parts of geographies (whose GEOIDs don't have '00' after the
+    summary level).
+    '''
+    rows = []
+
+    for idx, (sumlevel, component, name) in enumerate([
+            ('040', '00', 'Alabama'),
+            ('050', '00', 'Jefferson County, Alabama'),
+            ('060', '00', 'Bessemer CCD, Jefferson County, Alabama'),
+            ('160', '00', 'Birmingham city, Alabama'),
+            ('160', '01', 'Birmingham city (part), Alabama'),
+            ('310', '00', 'Birmingham-Hoover, AL Metro Area'),
+            ('400', '00', 'Birmingham, AL Urbanized Area (2010)'),
+            ('860', '00', 'ZCTA5 35004'),
+            ('970', '00', 'Jefferson County School District, Alabama'),
+            ]):
+        row = [''] * 50
+        row[1] = 'AL'
+        row[2] = sumlevel
+        row[4] = '%07d' % idx
+        row[48] = sumlevel + component + 'US01' + str(idx)
+        row[49] = name
+        rows.append(row)
+
+    with open(path, 'w', newline='', encoding='iso-8859-1') as f:
+        csv.writer(f).writerows(rows)
+
+def baseline_geo_csv_rows(path):
+    '''Rows for the geographies table as they were made from a whole file.'''
+    st = StateTools()
+
+    with open(path, 'rt', encoding='iso-8859-1') as f:
+        rows = list(csv.reader(f))
+
+    rows = list(filter(lambda x:
+                       (x[2] == '160' or x[2] == '050' or x[2] == '040'
+                        or x[2] == '860' or x[2] == '310' or x[2] == '400')
+                       and ''.join(x[48][3:5]) == '00', rows))
+
+    return [[x[1].lower(), x[2], x[4], st.get_state(x[49]), x[48], x[49]]
+            for x in rows]
+
+def test_geo_csv_rows_match_baseline(tmp_path):
+    path = tmp_path / 'g20205al.csv'
+    write_geo_csv(path)
+
+    rows = geo_csv_rows(path, {'040', '050', '160', '310', '400', '860'})
+
+    # Rows are generated, not read all at once.
+    assert iter(rows) is rows
+    assert list(rows) == baseline_geo_csv_rows(path)
+
+class ImmediatePool:
+    '''Runs submitted functions at once, and records how many are pending.'''
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, func, *args):
+        self.submitted += 1
+        future = Future()
+        future.set_result(func(*args))
+        return future
+
+def test_map_holds_bounded_results():
+    d = Database.__new__(Database)
+    d.pool = ImmediatePool()
+    d.max_pending = 4
+
+    consumed = 0
+
+    for result in d.map(pow, range(20), range(20)):
+        assert result == pow(consumed, consumed)
+        consumed += 1
+        assert d.pool.submitted - consumed < d.max_pending
+
+    assert consumed == 20
+
+# Estimates as they appear in ACS files, including missing values
+ESTIMATES = ['1520', '0', '', '.', '4.5', '250,001', '-', '2500-', 'N', '12']
+
+def write_estimate_files(tmp_path, count=4):
+    paths = []
+
+    for file_idx in range(count):
+        path = tmp_path / ('e20205%s0001000.txt' % file_idx)
+        rows = [['ACSSF', '2020e5', 'al', '000', '0001', '%07d' % row_idx]
+                + [ESTIMATES[(row_idx + file_idx + x) % len(ESTIMATES)]
+                   for x in range(6)]
+                for row_idx in range(25)]
+
+        with open(path, 'w', newline='') as f:
+            csv.writer(f).writerows(rows)
+
+        paths.append(path)
+
+    return paths
+
+def test_read_estimate_file_matches_baseline(tmp_path):
+    path = write_estimate_files(tmp_path, count=1)[0]
+    positions = [2, 5, 6, 8, 11]
+
+    keys, values = read_estimate_file(path, positions)
+
+    # Estimates used to be stored as text and typecast with gdt() when
+    # they were used.
+    with open(path, 'rt') as f:
+        rows = list(csv.reader(f))
+
+    assert keys == [(row[2], row[5]) for row in rows]
+    np.testing.assert_array_equal(
+        values, [[gdt(row[i]) for i in positions[2:]] for row in rows])
+
+def test_parallel_map_matches_serial(tmp_path):
+    paths = write_estimate_files(tmp_path)
+    positions = [2, 5, 6, 7, 8, 9, 10, 11]
+
+    d = Database.__new__(Database)
+    d.pool = None
+    serial = list(d.map(read_estimate_file, paths, repeat(positions)))
+
+    with ProcessPoolExecutor(max_workers=2) as d.pool:
+        d.max_pending = 2
+        parallel = list(d.map(read_estimate_file, paths, repeat(positions)))
+
+    assert len(parallel) == len(serial) == len(paths)
+
+    for (keys, values), (serial_keys, serial_values) in zip(parallel, serial):
+        assert keys == serial_keys
+        np.testing.assert_array_equal(values, serial_values)
+
+def test_to_number_matches_gdt():
+    for value in ESTIMATES + ['-2', '5.3', ' 7 ']:
+        number = to_number(value)
+        expected = gdt(value)
+
+        if expected != expected:
+            assert number is None
+        else:
+            assert number == expected
+            assert type(number) is type(expected)
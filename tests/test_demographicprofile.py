@@ -0,0 +1,137 @@
+import math
+import pickle
+
+import pytest
+
+from datainterface.DemographicProfile import DemographicProfile
+from tools.geodata_typecast import gdt, gdtf
+
+from geodata_rows import geodata_row
+
+# Raw components that come straight from one geodata column, and how the
+# dictionaries that DemographicProfiles used to hold typecast them
+COLUMNS = {
+    'land_area': ('ALAND_SQMI', gdtf),
+    'latitude': ('INTPTLAT', gdtf),
+    'longitude': ('INTPTLONG', gdtf),
+    'population': ('B01003_1', gdt),
+    'per_capita_income': ('B19301_1', gdt),
+    'median_household_income': ('B19013_1', gdt),
+    'median_year_structure_built': ('B25035_1', gdt),
+    'median_value': ('B25077_1', gdt),
+    'median_rent': ('B25058_1', gdt),
+    }
+
+@pytest.fixture(scope='module')
+def rows():
+    return [
+        geodata_row('040', '04000US01', 'Alabama', B01003_1=4900000,
+                    ALAND_SQMI=50645.3),
+        geodata_row('160', '16000US0107000', 'Birmingham city, Alabama',
+                    B19013_1=None, B25077_1=None),
+        geodata_row('160', '16000US0102116', 'Albertville city, Alabama',
+                    B19013_1=250001, B25035_1=0),
+        geodata_row('860', '86000US35004', 'ZCTA5 35004', state='US',
+                    B01003_1=0, ALAND_SQMI=0.0, INTPTLAT=None,
+                    INTPTLONG=None),
+        ]
+
+def same(a, b):
+    '''Equal values of the same type, with numpy.nan equal to numpy.nan'''
+    if isinstance(a, float) and math.isnan(a):
+        return isinstance(b, float) and math.isnan(b)
+    return type(a) is type(b) and a == b
+
+def test_values_match_typecast_row(rows):
+    for row in rows:
+        dpi = DemographicProfile(row)
+
+        for key, (column, typecast) in COLUMNS.items():
+            assert same(dpi.rc[key], typecast(row[column])), key
+
+        assert list(dpi.rc) == dpi.rc_keys
+        assert list(dpi.c) == dpi.c_keys
+        assert dict(dpi.c) == dict(zip(dpi.c.keys(), dpi.c.values()))
+        assert all(isinstance(value, float) for value in dpi.c.values())
+
+        # Compounds, as they were calculated
+        population = gdt(row['B01003_1'])
+        land_area = gdtf(row['ALAND_SQMI'])
+        assert dpi.c['population_density'] \
+            == (population / land_area if land_area != 0 else 0.0)
+        assert dpi.c['white_alone'] \
+            == (row['B02001_2'] / population * 100.0 if population else 0.0)
+
+def test_views_made_once(rows):
+    dpi = DemographicProfile(rows[0])
+
+    assert dpi.rc is dpi.rc
+    assert dpi.c is dpi.c
+
+def test_pickle(rows):
+    dpi = DemographicProfile(rows[1])
+    dpi.rc
+
+    state = dpi.__getstate__()[1]
+    assert not set(DemographicProfile.unpickled_slots) & set(state)
+
+    other = pickle.loads(pickle.dumps(dpi))
+
+    assert (other.name, other.geoid, other.counties) \
+        == (dpi.name, dpi.geoid, dpi.counties)
+    assert other.rc_view is None
+    assert all(same(other.rc[key], dpi.rc[key]) for key in dpi.rc)
+    assert all(same(other.c[key], dpi.c[key]) for key in dpi.c)
+
+def formatted(rc, c):
+    '''fc and fcd, as DemographicProfile.__init__() used to make them'''
+    fc = dict()
+
+    for key in rc.keys():
+        if key not in ['per_capita_income', 'median_year_structure_built',
+            'median_value', 'median_rent', 'land_area',
+            'median_household_income']:
+            fc[key] = f'{rc[key]:,}'
+        elif key not in ['median_year_structure_built', 'land_area']:
+            if key == 'median_household_income' and rc[key] == 250001:
+                fc[key] = '$250,000+'
+            else:
+                fc[key] = '$' + f'{rc[key]:,}'
+        elif key == 'land_area':
+            fc[key] = f'{rc[key]:,.1f}' + ' sqmi'
+        else:
+            fc[key] = str(rc[key])
+
+    fcd = dict()
+
+    for key in c.keys():
+        if key == 'population_density':
+            fcd[key] = f'{c[key]:,.1f}' + '/sqmi'
+        else:
+            fcd[key] = f'{c[key]:,.1f}' + '%'
+
+    return (fc, fcd)
+
+def test_formatting_matches_baseline(rows):
+    for row in rows:
+        dpi = DemographicProfile(row)
+
+        # Nothing is formatted until it is needed.
+        assert dpi.formatted is None
+
+        assert (dpi.fc, dpi.fcd) == formatted(dict(dpi.rc), dict(dpi.c))
+        assert dpi.fc is dpi.fc
+
+        other = pickle.loads(pickle.dumps(dpi))
+        assert other.formatted is None
+        assert str(other) == str(dpi)
+
+@pytest.mark.parametrize('text', ['8', '5.5', '10'])
+def test_median_rooms_formatted_as_text_was(rows, text):
+    # Median rooms are stored as REAL, so they come back as floats.
+    dpi = DemographicProfile(dict(rows[0], B25018_1=float(text)))
+    expected = gdt(text)
+
+    assert same(dpi.rc['median_rooms'], expected)
+    assert dpi.fc['median_rooms'] \
+        == formatted({'median_rooms': expected}, {})[0]['median_rooms']
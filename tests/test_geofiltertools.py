@@ -0,0 +1,129 @@
+import numpy as np
+import pytest
+
+from datainterface.ColumnStore import ColumnStore
+from datainterface.DemographicProfile import DemographicProfile
+from tools.GeofilterTools import GeofilterTools
+from tools.geodata_typecast import gdt
+
+from geodata_rows import geodata_row
+
+# Geofilters that context_filter() could evaluate before they were compiled
+BASELINE_GEOFILTERS = [
+    'population:gteq:10000',
+    'population:gt:10000+median_value:lt:300000',
+    'population:lteq:5000:c',
+    'population_density:gt:100:cc',
+    'white_alone:lt:5',
+    'white_alone:lt:600:c',
+    'median_household_income:eq:50000',
+    'median_year_structure_built:gt:1970+per_capita_income:gteq:25000',
+    ]
+
+# Geofilters that use '|' or btw
+GEOFILTERS = [
+    'population:gteq:10000|median_value:lt:300000+per_capita_income:gt:40000',
+    'population:btw:1000~50000',
+    'population:btw:1000~50000:c+median_rent:lt:1000|median_rent:gt:2000',
+    ]
+
+@pytest.fixture(scope='module')
+def profiles():
+    rows = []
+
+    for idx in range(40):
+        rows.append(geodata_row(
+            '860', '86000US350%02d' % idx, 'ZCTA5 350%02d' % idx, state='US',
+            ALAND_SQMI=[0.0, 3.5, 80.0, 400.0][idx % 4],
+            B01003_1=[0, 800, 5000, 10000, 45000, 120000][idx % 6],
+            B02001_2=[0, 300, 600][idx % 3],
+            B19013_1=[None, 50000, 50000, 72000, 31000][idx % 5],
+            B19301_1=[20000, 25000, 41000][idx % 3],
+            B25035_1=[None, 1950, 1970, 1971, 1999][idx % 5],
+            B25058_1=[800, 1000, 1500, 2500][idx % 4],
+            B25077_1=[None, 90000, 300000, 450000][idx % 4]))
+
+    return [DemographicProfile(row) for row in rows]
+
+def context_filter(profiles, geofilter):
+    '''
+    Positions of the profiles that Engine.context_filter() kept for a
+    geofilter before geofilters were compiled.
+    '''
+    instances = list(enumerate(profiles))
+
+    for criterion in geofilter.split('+'):
+        criterion = criterion.split(':')
+        comp, operator, value = criterion[:3]
+        value = gdt(value)
+
+        # As Engine.get_data_types() chooses
+        if len(criterion) == 4:
+            filter_by = 'rc' if criterion[3] == 'c' else 'c'
+        else:
+            filter_by = 'c' if comp in profiles[0].c.keys() else 'rc'
+
+        apply = {
+            'gt': lambda x: x > value,
+            'gteq': lambda x: x >= value,
+            'eq': lambda x: x == value,
+            'lteq': lambda x: x <= value,
+            'lt': lambda x: x < value,
+            }[operator]
+        instances = [x for x in instances
+                     if apply(getattr(x[1], filter_by)[comp])]
+
+    return [idx for idx, _ in instances]
+
+def matches(geofilter, dpi):
+    '''Whether a profile matches a compiled geofilter, one value at a time.'''
+    for group in geofilter.groups:
+        for criterion in group:
+            data_type = criterion.filter_by(criterion.comp in dpi.c)
+            if criterion.apply(getattr(dpi, data_type)[criterion.comp]):
+                break
+        else:
+            return False
+
+    return True
+
+def test_compile():
+    geofilter = GeofilterTools.compile(GEOFILTERS[0])
+
+    assert [[c.comp for c in group] for group in geofilter.groups] \
+        == [['population', 'median_value'], ['per_capita_income']]
+    assert GeofilterTools.compile(GEOFILTERS[1]).groups[0][0].value \
+        == (1000, 50000)
+
+    # Compiled plans are cached.
+    assert GeofilterTools.compile(GEOFILTERS[0]) is geofilter
+
+@pytest.mark.parametrize('bad', ['population:gt', 'population:about:10',
+                                 'population:btw:1~2~3'])
+def test_compile_errors(bad):
+    with pytest.raises(ValueError):
+        GeofilterTools.compile(bad)
+
+@pytest.mark.parametrize('geofilter', BASELINE_GEOFILTERS)
+def test_select_matches_context_filter(profiles, geofilter):
+    columns = ColumnStore.from_demographicprofiles(profiles)
+    expected = context_filter(profiles, geofilter)
+    geofilter = GeofilterTools.compile(geofilter)
+
+    assert geofilter.select(columns, np.arange(len(profiles))).tolist() \
+        == expected
+    assert [idx for idx, dpi in enumerate(profiles)
+            if matches(geofilter, dpi)] == expected
+
+    # Only the ids given are looked at.
+    ids = np.arange(0, len(profiles), 3)
+    assert geofilter.select(columns, ids).tolist() \
+        == [idx for idx in expected if idx % 3 == 0]
+
+@pytest.mark.parametrize('geofilter', GEOFILTERS)
+def test_select_matches_profiles(profiles, geofilter):
+    columns = ColumnStore.from_demographicprofiles(profiles)
+    geofilter = GeofilterTools.compile(geofilter)
+
+    assert geofilter.select(columns, np.arange(len(profiles))).tolist() \
+        == [idx for idx, dpi in enumerate(profiles) if matches(geofilter, dpi)]
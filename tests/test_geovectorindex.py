@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from datainterface.GeoVector import GeoVector
+from datainterface.GeoVectorIndex import GeoVectorIndex
+from datainterface.GeoVectorScorer import GeoVectorScorer
+
+@pytest.fixture(scope='module')
+def geovectors():
+    '''
+    GeoVectors with scores from a few values, so that there are plenty of
+    tied distances.
+    '''
+    rng = np.random.default_rng(0)
+    scores = rng.choice([0, 20, 40, 50, 60, 100],
+                        (300, len(GeoVectorScorer.subcomponents)))
+    geovectors = []
+
+    for idx in range(300):
+        gv = GeoVector.__new__(GeoVector)
+        gv.sumlevel = '160' if idx % 3 else '050'
+        gv.name = 'Geography %s' % idx
+        gv.s = dict(zip(GeoVectorScorer.subcomponents, scores[idx].tolist()))
+        gv.ws = {mode: {sc: gv.s[sc] / weight for sc, weight in weights.items()}
+                 for mode, weights in GeoVectorScorer.weights.items()}
+        geovectors.append(gv)
+
+    return geovectors
+
+def compare_geovectors(geovectors, idx, mode, n, ids=None):
+    '''
+    Positions that Engine.compare_geovectors() returned before the index:
+    GeoVectors of the same summary level (or in ids), sorted by distance.
+    '''
+    comparison_gv = geovectors[idx]
+
+    if ids is None:
+        ids = [x for x, gv in enumerate(geovectors)
+               if gv.sumlevel == comparison_gv.sumlevel]
+
+    ranked = sorted(ids,
+                    key=lambda x: comparison_gv.distance(geovectors[x], mode))
+    return ranked[:n] if n else ranked
+
+def test_from_geovectors(geovectors):
+    index = GeoVectorIndex.from_geovectors(geovectors)
+
+    for mode in GeoVectorIndex.modes:
+        np.testing.assert_array_equal(
+            index.matrices[mode],
+            [list(gv.ws[mode].values()) for gv in geovectors])
+    assert index.sumlevels.tolist() == [gv.sumlevel for gv in geovectors]
+
+@pytest.mark.parametrize('mode', ['std', 'app'])
+def test_nearest_matches_sorted(geovectors, mode):
+    index = GeoVectorIndex.from_geovectors(geovectors)
+
+    for idx in [0, 1, 2, 151, 299]:
+        for n in [1, 10, 40, 0]:
+            assert index.nearest(idx, mode=mode, n=n).tolist() \
+                == compare_geovectors(geovectors, idx, mode, n)
+
+        # Only GeoVectors in a context
+        ids = list(range(0, 300, 7))
+        assert index.nearest(idx, mode=mode, n=10,
+                             ids=np.array(ids)).tolist() \
+            == compare_geovectors(geovectors, idx, mode, 10, ids)
+
+@pytest.mark.parametrize('jobs', [1, 2])
+@pytest.mark.parametrize('context', [False, True])
+def test_all_nearest_matches_sorted(geovectors, jobs, context):
+    index = GeoVectorIndex.from_geovectors(geovectors)
+    ids = np.arange(0, 300, 2) if context else None
+    k = 6
+
+    results = list(index.all_nearest(ids, mode='app', k=k, chunk_size=32,
+                                     jobs=jobs))
+
+    assert [idx for idx, _, _ in results] \
+        == (ids.tolist() if context else
+            index.sumlevel_ids['050'].tolist()
+            + index.sumlevel_ids['160'].tolist())
+
+    for idx, neighbours, distances in results:
+        # The k nearest after the GeoVector itself
+        expected = compare_geovectors(
+            geovectors, idx, 'app', k + 1,
+            None if ids is None else ids.tolist())
+        expected.remove(idx)
+
+        assert neighbours.tolist() == expected[:k]
+        np.testing.assert_allclose(
+            distances, [geovectors[idx].distance(geovectors[x], 'app')
+                        for x in expected[:k]])
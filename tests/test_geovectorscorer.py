@@ -0,0 +1,181 @@
+import numpy as np
+import pytest
+
+from datainterface.GeoVector import GeoVector
+from datainterface.GeoVectorScorer import GeoVectorScorer
+
+from geodata_rows import geodata_row
+
+def reference_scores(row, medians, standard_deviations):
+    '''
+    Scores as GeoVector.__init__() calculated them one row at a time before
+    GeoVectorScorer, or None if the row lacks data.
+    '''
+    columns = GeoVectorScorer.columns
+    if any(row[column] is None for column in columns):
+        return None
+
+    def div(dividend, divisor):
+        return 0 if float(divisor) == 0.0 else dividend / float(divisor)
+
+    def subcomponents(x, asian, year_offset):
+        return {
+            'population_density': div(x['B01003_1'], x['ALAND_SQMI']),
+            'per_capita_income': x['B19301_1'],
+            'white_alone': div(x['B02001_2'], x['B01003_1']) * 100.0,
+            'black_alone': div(x['B02001_3'], x['B01003_1']) * 100.0,
+            'asian_alone': div(x[asian], x['B01003_1']) * 100.0,
+            'hispanic_or_latino': div(x['B03002_12'], x['B01003_1']) * 100.0,
+            'bachelors_degree_or_higher': div(
+                x['B15003_22'] + x['B15003_23'] + x['B15003_24']
+                + x['B15003_25'], x['B15003_1']) * 100.0,
+            'graduate_degree_or_higher': div(
+                x['B15003_23'] + x['B15003_24'] + x['B15003_25'],
+                x['B15003_1']) * 100.0,
+            'median_year_structure_built': x['B25035_1'] - year_offset,
+            }
+
+    rs = subcomponents(row, 'B02001_5', 1939)
+    med = subcomponents(medians, 'B03002_12', 1939)
+    sd = subcomponents(standard_deviations, 'B03002_12', 0)
+    s = dict()
+
+    for sc in rs:
+        if rs[sc] < med[sc]:
+            s[sc] = int(round((rs[sc] / med[sc]) * 50))
+        elif rs[sc] == med[sc]:
+            s[sc] = 50
+        elif rs[sc] > med[sc] and rs[sc] < med[sc] + sd[sc] * 3:
+            s[sc] = int(round(50 + ((rs[sc] - med[sc]) / (sd[sc] * 3)) * 50))
+        else:
+            s[sc] = 100
+
+    return s
+
+@pytest.fixture(scope='module')
+def rows():
+    rng = np.random.default_rng(0)
+    rows = []
+
+    for idx in range(150):
+        population = int(rng.integers(0, 100000))
+
+        def part(total):
+            return int(rng.integers(0, total + 1))
+
+        row = geodata_row(
+            '860', '86000US%05d' % idx, 'ZCTA5 %05d' % idx, state='US',
+            ALAND_SQMI=float(rng.choice([0.0, rng.uniform(0.1, 500)])),
+            B01003_1=population,
+            B02001_2=part(population),
+            B02001_3=part(population),
+            B02001_5=part(population),
+            B03002_12=part(population),
+            B15003_1=part(population),
+            B19301_1=int(rng.integers(5000, 90000)),
+            B25035_1=int(rng.integers(1939, 2015)))
+
+        for column in ['B15003_22', 'B15003_23', 'B15003_24', 'B15003_25']:
+            row[column] = part(row['B15003_1'] // 5)
+
+        # Some geographies are missing data.
+        if idx % 11 == 0:
+            row[GeoVectorScorer.columns[idx % 13]] = None
+
+        rows.append(row)
+
+    return rows
+
+@pytest.fixture(scope='module')
+def stats(rows):
+    arrays = {column: np.array([row[column] for row in rows], dtype=float)
+              for column in GeoVectorScorer.columns}
+    medians = {k: np.nanmedian(v) for k, v in arrays.items()}
+    standard_deviations = {k: np.nanstd(v, ddof=1) for k, v in arrays.items()}
+
+    # One row sits exactly at the medians.
+    at_median = dict(rows[-1], **medians)
+
+    return (arrays, medians, standard_deviations, at_median)
+
+def test_scorer_matches_reference(rows, stats):
+    arrays, medians, standard_deviations, _ = stats
+    scorer = GeoVectorScorer(medians, standard_deviations)
+
+    valid = scorer.valid(arrays)
+    expected = [reference_scores(row, medians, standard_deviations)
+                for row in rows]
+
+    assert valid.tolist() == [x is not None for x in expected]
+
+    scores = scorer.scores(scorer.raw_subcomponents(
+        {k: v[valid] for k, v in arrays.items()}))
+    expected = [x for x in expected if x is not None]
+
+    assert [dict(zip(scorer.subcomponents, x)) for x in scores.tolist()] \
+        == expected
+
+def test_geovector_matches_reference(rows, stats):
+    _, medians, standard_deviations, at_median = stats
+
+    for row in rows + [at_median]:
+        expected = reference_scores(row, medians, standard_deviations)
+
+        if expected is None:
+            with pytest.raises(AttributeError):
+                GeoVector(row, medians, standard_deviations)
+            continue
+
+        gv = GeoVector(row, medians, standard_deviations)
+        assert gv.s == expected
+
+        # Weighted subcomponents
+        assert gv.ws['std']['white_alone'] == expected['white_alone'] / 4
+        assert gv.ws['std']['graduate_degree_or_higher'] \
+            == expected['graduate_degree_or_higher'] / 2
+        assert list(gv.ws['app'].values()) == [
+            expected['population_density'], expected['per_capita_income'],
+            expected['median_year_structure_built']]
+
+def test_from_scores_matches_init(rows, stats):
+    arrays, medians, standard_deviations, _ = stats
+    scorer = GeoVectorScorer(medians, standard_deviations)
+    valid = scorer.valid(arrays)
+    rs = scorer.raw_subcomponents({k: v[valid] for k, v in arrays.items()})
+    scores = scorer.scores(rs)
+    weighted = scorer.weighted(scores)
+
+    valid_rows = [row for row, ok in zip(rows, valid) if ok]
+
+    for idx, row in enumerate(valid_rows):
+        gv = GeoVector.from_scores(
+            row, *scorer.subcomponents_for(idx, rs, scores, weighted))
+        expected = GeoVector(row, medians, standard_deviations)
+
+        assert (gv.s, gv.ws, gv.counties) \
+            == (expected.s, expected.ws, expected.counties)
+
+@pytest.mark.parametrize('year', GeoVectorScorer.missing_years)
+def test_missing_year_scores_100(rows, stats, year):
+    _, medians, standard_deviations, _ = stats
+    row = dict(rows[1], B25035_1=year)
+    expected = reference_scores(rows[1], medians, standard_deviations)
+
+    gv = GeoVector(row, medians, standard_deviations)
+
+    assert gv.s['median_year_structure_built'] == 100
+    assert gv.ws['app']['median_year_structure_built'] == 100
+    assert {k: v for k, v in gv.s.items()
+            if k != 'median_year_structure_built'} \
+        == {k: v for k, v in expected.items()
+            if k != 'median_year_structure_built'}
+
+def test_scores_between_0_and_100(stats):
+    _, medians, standard_deviations, _ = stats
+    scorer = GeoVectorScorer(medians, standard_deviations)
+
+    rs = np.array([[-1e9] * 9, [1e9] * 9, [np.nan] * 9])
+    scores = scorer.scores(rs)
+
+    assert scores.min() >= 0 and scores.max() <= 100
+    assert scores[1:].tolist() == [[100] * 9] * 2
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from datainterface.DemographicProfile import DemographicProfile
+from datainterface.ProfileStore import ProfileStore
+
+from geodata_rows import geodata_row
+
+@pytest.fixture(scope='module')
+def profiles():
+    rows = [
+        geodata_row('040', '04000US01', 'Alabama', B01003_1=4900000),
+        geodata_row('160', '16000US0107000', 'Birmingham city, Alabama',
+                    B01003_1=200000, B19013_1=None),
+        geodata_row('860', '86000US35004', 'ZCTA5 35004', state='US',
+                    INTPTLAT=None, INTPTLONG=None),
+        ]
+    return [DemographicProfile(row) for row in rows]
+
+def same(a, b):
+    assert (a.geoid, a.name, a.sumlevel) == (b.geoid, b.name, b.sumlevel)
+    np.testing.assert_equal(dict(a.rc), dict(b.rc))
+    np.testing.assert_equal(dict(a.c), dict(b.c))
+    assert a.fc == b.fc
+
+def test_save_and_load(profiles, tmp_path):
+    ProfileStore.save(profiles, tmp_path)
+    store = ProfileStore.load(tmp_path)
+
+    assert ProfileStore.exists(tmp_path)
+    assert len(store) == len(profiles)
+
+    # Nothing is unpickled until it is used.
+    assert store.loaded == {}
+
+    same(store[1], profiles[1])
+    assert list(store.loaded) == [1]
+
+    # Each profile is unpickled once.
+    assert store[np.int64(1)] is store[1]
+    assert store[-2] is store[1]
+
+    for a, b in zip(store, profiles):
+        same(a, b)
+
+    assert [x.name for x in store[1:]] == [x.name for x in profiles[1:]]
+
+    with pytest.raises(IndexError):
+        store[len(profiles)]
+
+def test_save_replaces_previous(profiles, tmp_path):
+    ProfileStore.save(profiles, tmp_path)
+    ProfileStore.save(profiles[:1], tmp_path)
+
+    store = ProfileStore.load(tmp_path)
+    assert len(store) == 1
+    same(store[0], profiles[0])
+
+def test_empty(tmp_path):
+    assert not ProfileStore.exists(tmp_path)
+
+    ProfileStore.save([], tmp_path)
+    store = ProfileStore.load(tmp_path)
+
+    assert len(store) == 0
+    assert list(store) == []
@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from datainterface.ColumnStore import ColumnStore
+from datainterface.DemographicProfile import DemographicProfile
+from datainterface.SpatialIndex import SpatialIndex, haversine
+
+from geodata_rows import geodata_row
+
+# Points to search from: Los Angeles, Birmingham, the middle of the country
+# and somewhere far from every geography
+POINTS = [(34.05, -118.24), (33.52, -86.80), (40.0, -100.0), (60.0, 10.0)]
+
+@pytest.fixture(scope='module')
+def profiles():
+    rng = np.random.default_rng(0)
+    rows = []
+
+    for idx in range(200):
+        lat, lon = rng.uniform(25, 49), rng.uniform(-124, -67)
+
+        # Some geographies share a point, and some have none.
+        if idx % 10 == 1:
+            lat, lon = rows[-1]['INTPTLAT'], rows[-1]['INTPTLONG']
+        if idx % 17 == 0:
+            lat = lon = None
+
+        if idx % 2:
+            row = geodata_row('050', '05000US01%03d' % idx,
+                              'County %s, Alabama' % idx)
+        else:
+            row = geodata_row('860', '86000US%05d' % idx, 'ZCTA5 %05d' % idx,
+                              state='US')
+
+        row.update(INTPTLAT=lat, INTPTLONG=lon)
+        rows.append(row)
+
+    return [DemographicProfile(row) for row in rows]
+
+@pytest.fixture(scope='module')
+def columns(profiles):
+    return ColumnStore.from_demographicprofiles(profiles)
+
+@pytest.fixture(scope='module')
+def index(columns):
+    return SpatialIndex.from_columns(columns)
+
+def closest_geographies(profiles, lat, lon, mask=None, kilometers=False):
+    '''
+    Positions of profiles sorted by their distance from (lat, lon), and the
+    distances, as closest_geographies() found them by measuring every
+    profile.
+    '''
+    distances = []
+
+    for idx, dpi in enumerate(profiles):
+        if np.isnan(dpi.rc['latitude']) or (mask is not None and not mask[idx]):
+            continue
+
+        distances.append((idx, float(haversine(
+            lat, lon, dpi.rc['latitude'], dpi.rc['longitude'], kilometers))))
+
+    distances = sorted(distances, key=lambda x: x[1])
+
+    return ([x[0] for x in distances], [x[1] for x in distances])
+
+@pytest.mark.parametrize('point', POINTS)
+def test_nearest_matches_sorted(profiles, columns, index, point):
+    mask = columns.arrays['SUMLEVEL'] == '860'
+
+    for this_mask in [None, mask]:
+        expected_ids, expected_distances = closest_geographies(
+            profiles, *point, mask=this_mask)
+
+        for n in [1, 5, 50, 500]:
+            ids, distances = index.nearest(*point, n=n, mask=this_mask)
+
+            # Geographies tied with the nth are included too.
+            nth = expected_distances[min(n, len(expected_ids)) - 1]
+            count = sum(d <= nth for d in expected_distances)
+
+            assert count >= min(n, len(expected_ids))
+            assert ids.tolist() == expected_ids[:count]
+            np.testing.assert_allclose(distances, expected_distances[:count])
+
+def test_nearest_margin(profiles, index):
+    ids, distances = index.nearest(*POINTS[0], n=3, margin=0.5)
+    expected_ids, expected_distances = closest_geographies(profiles,
+                                                           *POINTS[0])
+    n = sum(d <= expected_distances[2] * 1.5 for d in expected_distances)
+
+    assert n > 3
+    assert ids.tolist() == expected_ids[:n]
+
+@pytest.mark.parametrize('point', POINTS)
+@pytest.mark.parametrize('kilometers', [False, True])
+def test_within_matches_sorted(profiles, columns, index, point, kilometers):
+    mask = columns.arrays['SUMLEVEL'] == '050'
+
+    for this_mask in [None, mask]:
+        expected_ids, expected_distances = closest_geographies(
+            profiles, *point, mask=this_mask, kilometers=kilometers)
+
+        for radius in [0, 200, 1000, 5000]:
+            ids, distances = index.within(*point, radius, mask=this_mask,
+                                          kilometers=kilometers)
+            count = sum(d <= radius for d in expected_distances)
+
+            assert ids.tolist() == expected_ids[:count]
+            np.testing.assert_allclose(distances, expected_distances[:count])
+
+def test_nearest_nothing_to_find(columns, index):
+    for n in [0, -1]:
+        ids, distances = index.nearest(*POINTS[0], n=n)
+        assert ids.tolist() == [] and distances.tolist() == []
+
+    # No positions in the mask
+    ids, distances = index.nearest(*POINTS[0], n=5,
+                                   mask=np.zeros(len(columns), dtype=bool))
+    assert ids.tolist() == [] and distances.tolist() == []
+
+    # No positions with coordinates
+    empty = SpatialIndex.from_columns(ColumnStore.from_demographicprofiles(
+        [DemographicProfile(geodata_row('860', '86000US35004', 'ZCTA5 35004',
+                                        state='US', INTPTLAT=None,
+                                        INTPTLONG=None))]))
+    ids, distances = empty.nearest(*POINTS[0], n=5)
+    assert ids.tolist() == [] and distances.tolist() == []
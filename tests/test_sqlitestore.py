@@ -0,0 +1,115 @@
+import math
+
+import numpy as np
+import pytest
+
+from datainterface.ColumnStore import ColumnStore
+from datainterface.ContextIndex import ContextIndex
+from datainterface.DemographicProfile import DemographicProfile
+from datainterface.SQLiteStore import SQLiteStore
+from tools.GeofilterTools import GeofilterTools
+
+from geodata_rows import geodata_row
+from test_contextindex import CONTEXTS
+from test_geofiltertools import BASELINE_GEOFILTERS, GEOFILTERS
+
+# Columns typed as they are in the build database
+REAL_COLUMNS = {'ALAND_SQMI', 'INTPTLAT', 'INTPTLONG', 'B25018_1'}
+
+@pytest.fixture(scope='module')
+def rows():
+    places = ['0100100', '0100460', '0102116', '0107000', '0107912']
+    rows = [
+        geodata_row('040', '04000US01', 'Alabama', B01003_1=4900000,
+                    ALAND_SQMI=50645.3),
+        geodata_row('040', '04000US06', 'California', state='ca',
+                    B01003_1=39000000, ALAND_SQMI=155779.2),
+        geodata_row('050', '05000US01073', 'Jefferson County, Alabama',
+                    B01003_1=660000, ALAND_SQMI=1111.3),
+        ]
+
+    for idx in range(30):
+        rows.append(geodata_row(
+            '160', '16000US' + places[idx % len(places)],
+            'Place %s, Alabama' % idx,
+            ALAND_SQMI=[0.0, 3.5, 80.0][idx % 3],
+            B01003_1=[0, 800, 5000, 10000, 45000, 120000][idx % 6],
+            B19013_1=[None, 50000, 72000, 31000][idx % 4],
+            B25018_1=[5.5, 6.0, None][idx % 3],
+            B25058_1=[800, 1000, 1500, 2500][idx % 4],
+            B25077_1=[None, 90000, 300000, 450000, 150000][idx % 5]))
+
+    for zcta in ['35004', '35005', '36104', '90210']:
+        rows.append(geodata_row('860', '86000US' + zcta, 'ZCTA5 ' + zcta,
+                                state='US', B01003_1=int(zcta) // 4))
+
+    return rows
+
+@pytest.fixture(scope='module')
+def profiles(rows):
+    return [DemographicProfile(row) for row in rows]
+
+@pytest.fixture(scope='module')
+def columns(profiles):
+    return ColumnStore.from_demographicprofiles(profiles)
+
+@pytest.fixture(scope='module')
+def store(tmp_path_factory, rows, profiles, columns):
+    path = tmp_path_factory.mktemp('sqlite') / 'default.sqlite'
+    keys = list(rows[0])
+
+    def column_def(key):
+        if isinstance(rows[0][key], str):
+            return key + ' TEXT'
+        return key + (' REAL' if key in REAL_COLUMNS else ' INTEGER')
+
+    SQLiteStore.create(path, list(map(column_def, keys)),
+                       ([row[key] for key in keys] for row in rows), columns,
+                       [dpi.counties for dpi in profiles])
+
+    return SQLiteStore(path)
+
+def test_no_wal_files(store):
+    assert store.execute('PRAGMA journal_mode').fetchone()[0] == 'delete'
+    assert [x.name for x in store.path.parent.iterdir()] \
+        == ['default.sqlite']
+
+@pytest.mark.parametrize('context', CONTEXTS)
+@pytest.mark.parametrize('geofilter',
+                         [None] + BASELINE_GEOFILTERS + GEOFILTERS)
+def test_ids_match_columns(store, profiles, columns, context, geofilter):
+    index = ContextIndex.from_demographicprofiles(profiles)
+    ids = index.ids(*context, names=columns.arrays['NAME'])
+
+    if geofilter:
+        geofilter = GeofilterTools.compile(geofilter)
+        ids = geofilter.select(columns, ids)
+
+    assert store.ids(*store.where(*context, geofilter=geofilter)) \
+        == ids.tolist()
+
+def test_get_profiles(store, profiles):
+    ids = [5, 0, len(profiles) - 1, 17, 5]
+
+    for dpi, expected in zip(store.get_profiles(ids),
+                             [profiles[idx] for idx in ids]):
+        assert (dpi.name, dpi.geoid, dpi.counties) \
+            == (expected.name, expected.geoid, expected.counties)
+        assert (dpi.fc, dpi.fcd) == (expected.fc, expected.fcd)
+
+        for key, value in expected.rc.items():
+            if isinstance(value, float) and math.isnan(value):
+                assert math.isnan(dpi.rc[key])
+            else:
+                assert dpi.rc[key] == value
+
+def test_columns(store, columns):
+    rows = store.execute('SELECT * FROM geodata ORDER BY id').fetchall()
+
+    for key in ['rc.population', 'c.population_density', 'rc.latitude',
+                'rc.median_household_income']:
+        values = [np.nan if row[key] is None else row[key] for row in rows]
+        np.testing.assert_array_equal(values, columns.arrays[key])
+
+    assert store.has('population_density', 'c')
+    assert not store.has('population_density', 'rc')